@@ -1,73 +1,77 @@
 #!/usr/bin/env python3
 """
 Clean up duplicate gesture set folders
+
+Usage: python cleanup_duplicates.py [--dry-run]
 """
 
 import os
 import sys
+import time
+import argparse
 
 # Add the services directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'services'))
 
-from gesture_set_drive_service import GestureSetDriveService
+from gesture_set_drive_service import GestureSetDriveService, FOLDER_MIME_TYPE
+from gesture_set_api import notify_daemon
+from drive_maintenance import MaintenancePlan, list_gesture_set_state, execute_plan, print_summary
+
+def plan_cleanup(state):
+    """
+    Plan deleting every gesture set folder that has a newer one with the same name
+
+    Returns:
+        tuple: (MaintenancePlan, list of gesture sets that are kept)
+    """
+    gesture_sets = [{'id': item['id'], 'name': item['name'], 'modified_time': item.get('modifiedTime', ''),
+                     'file': item}
+                    for item in state['gesture_sets'] if item['mimeType'] == FOLDER_MIME_TYPE]
+    kept, duplicates = GestureSetDriveService._split_duplicates(gesture_sets)
+    plan = MaintenancePlan()
+    for gs in duplicates:
+        plan.delete(gs['file'], f"older duplicate of '{gs['name']}' (modified: {gs['modified_time']})")
+    return plan, kept
 
-def cleanup_duplicates():
+def cleanup_duplicates(dry_run=False):
     """Remove duplicate gesture set folders"""
     try:
+        started = time.perf_counter()
         print("🧹 Cleaning up duplicate gesture sets...")
         
         service = GestureSetDriveService()
         
-        # Get all gesture sets
-        gesture_sets = service.list_gesture_sets()
+        # One listing of GestureSets drives the whole plan
+        state = list_gesture_set_state(service)
+        plan, kept = plan_cleanup(state)
+        if plan.is_empty():
+            print("📦 No duplicate gesture sets (OK)")
         
-        # Group by name to find duplicates
-        name_groups = {}
-        for gs in gesture_sets:
-            name = gs['name']
-            if name not in name_groups:
-                name_groups[name] = []
-            name_groups[name].append(gs)
+        report = execute_plan(service.drive_service, plan, dry_run)
+        print_summary(state, plan, report, started)
         
-        # Process duplicates
-        for name, group in name_groups.items():
-            if len(group) > 1:
-                print(f"📦 Found {len(group)} duplicates for '{name}':")
-                
-                # Sort by modified time (keep the newest)
-                group.sort(key=lambda x: x['modified_time'], reverse=True)
-                
-                # Keep the first (newest), delete the rest
-                keep = group[0]
-                delete = group[1:]
-                
-                print(f"  ✅ Keeping: {keep['id']} (modified: {keep['modified_time']})")
-                
-                for gs in delete:
-                    print(f"  🗑️  Deleting: {gs['id']} (modified: {gs['modified_time']})")
-                    
-                    # Delete the folder
-                    try:
-                        service.drive_service.service.files().delete(fileId=gs['id']).execute()
-                        print(f"    ✅ Deleted successfully")
-                    except Exception as e:
-                        print(f"    ❌ Error deleting: {e}")
-            else:
-                print(f"📦 {name}: Only 1 folder (OK)")
+        if report['deleted']:
+            service.invalidate_cache()
+            try:
+                notify_daemon('invalidate_cache')
+            except Exception as e:
+                print(f"⚠️  Could not invalidate gesture_set_api daemon cache: {e}")
         
-        # List final state
-        print("\n📋 Final gesture sets:")
-        final_sets = service.list_gesture_sets()
-        for gs in final_sets:
+        # Final state, derived from the listing and the plan
+        print(f"\n📋 {'Planned' if dry_run else 'Final'} gesture sets:")
+        for gs in kept:
             print(f"  - {gs['name']} (ID: {gs['id']})")
         
-        print(f"\n✅ Cleanup completed! {len(final_sets)} gesture sets remaining")
-        return True
+        print(f"\n✅ Cleanup completed! {len(kept)} gesture sets remaining")
+        return not report['failures']
         
     except Exception as e:
         print(f"❌ Error during cleanup: {e}")
         return False
 
 if __name__ == "__main__":
-    success = cleanup_duplicates()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Delete older duplicate gesture set folders')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the planned deletes')
+    args = parser.parse_args()
+    success = cleanup_duplicates(args.dry_run)
+    sys.exit(0 if success else 1)
@@ -1,64 +1,81 @@
 #!/usr/bin/env python3
 """
 Reset script to move gesture sets back to GestureSets folder for testing
+
+Usage: python reset_gesture_sets.py [--dry-run]
 """
 
 import os
 import sys
+import time
+import argparse
 
 # Add the services directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'services'))
 
-from gesture_set_drive_service import GestureSetDriveService
+from gesture_set_drive_service import GestureSetDriveService, FOLDER_MIME_TYPE, ACTIVE_SET_POINTER_NAME
+from gesture_set_api import notify_daemon
+from drive_maintenance import MaintenancePlan, list_gesture_set_state, execute_plan, print_summary
+
+def plan_reset(state):
+    """
+    Plan moving every active set folder back to GestureSets
 
-def reset_gesture_sets():
+    A pointer file from a publish by reference is deleted, so nothing is active afterwards.
+    """
+    plan = MaintenancePlan()
+    for item in state['active_set']:
+        if item['mimeType'] == FOLDER_MIME_TYPE:
+            plan.move(item, state['gesture_sets_id'], 'back to GestureSets')
+        elif item['name'] == ACTIVE_SET_POINTER_NAME:
+            plan.delete(item, 'active set pointer')
+    return plan
+
+def reset_gesture_sets(dry_run=False):
     """Reset all gesture sets back to GestureSets folder"""
     try:
+        started = time.perf_counter()
         print("🔄 Resetting gesture sets for testing...")
         
         service = GestureSetDriveService()
         
-        # Ensure base folders exist and get their IDs
-        print("📁 Ensuring base folders exist...")
-        folder_ids = service.ensure_base_folders()
-        
-        # Check if there's anything in ActiveSet folder
-        print("🔍 Checking ActiveSet folder...")
-        active_files = service.drive_service.list_files(
-            folder_id=folder_ids['active_set_id']
-        )
-        
-        # Filter for folders only
-        active_folders = [f for f in active_files if f.get('mimeType') == 'application/vnd.google-apps.folder']
-        
-        if active_folders:
-            for folder in active_folders:
-                print(f"📦 Moving {folder['name']} back to GestureSets...")
-                
-                # Move folder back to GestureSets
-                service.drive_service.move_file(
-                    folder['id'], 
-                    folder_ids['gesture_sets_id']
-                )
-                
-                print(f"✅ Moved {folder['name']} back to GestureSets")
-        else:
+        # One listing of GestureSets and ActiveSet drives the whole plan
+        print("🔍 Reading GestureSets and ActiveSet...")
+        state = list_gesture_set_state(service)
+        plan = plan_reset(state)
+        if plan.is_empty():
             print("ℹ️  ActiveSet folder is empty")
         
-        # List current state
-        print("\n📋 Current gesture sets in GestureSets folder:")
-        gesture_sets = service.list_gesture_sets()
+        report = execute_plan(service.drive_service, plan, dry_run)
+        print_summary(state, plan, report, started)
+        
+        if report['moved'] or report['deleted']:
+            # Cached listings (here and in a running gesture_set_api daemon) are stale now
+            service.invalidate_cache()
+            try:
+                notify_daemon('invalidate_cache')
+            except Exception as e:
+                print(f"⚠️  Could not invalidate gesture_set_api daemon cache: {e}")
         
+        # Resulting state, derived from the listing and the plan
+        failed = {failure['id'] for failure in report['failures']}
+        moved = [action['file'] for action in plan.moves if action['file']['id'] not in failed]
+        gesture_sets = [item for item in state['gesture_sets'] if item['mimeType'] == FOLDER_MIME_TYPE]
+        gesture_sets += moved if not dry_run else [action['file'] for action in plan.moves]
+        print(f"\n📋 {'Planned' if dry_run else 'Current'} gesture sets in GestureSets folder:")
         for gs in gesture_sets:
             print(f"  - {gs['name']} (ID: {gs['id']})")
         
         print(f"\n✅ Reset completed! Found {len(gesture_sets)} gesture sets ready for testing")
-        return True
+        return not report['failures']
         
     except Exception as e:
         print(f"❌ Error during reset: {e}")
         return False
 
 if __name__ == "__main__":
-    success = reset_gesture_sets()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Move active gesture sets back to GestureSets')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the planned changes')
+    args = parser.parse_args()
+    success = reset_gesture_sets(args.dry_run)
+    sys.exit(0 if success else 1)
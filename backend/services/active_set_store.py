@@ -0,0 +1,227 @@
+"""
+Local content-addressed store of published gesture sets
+
+Layout under the store root:
+    blobs/<md5[:2]>/<md5>     file contents, one copy per distinct md5
+    incoming/                 downloads in progress (<md5>.<pid>.part files,
+                              one per process so concurrent syncs never
+                              write to the same file)
+    versions/<version>/...    a set's files as hard links to blobs
+    current                   symlink to the active version directory
+    CURRENT                   same information as a file, for platforms
+                              where symlinks are unavailable
+
+Inference processes on one host read <root>/current/... and share one copy
+of every file. Switching versions only replaces the current link, which is
+atomic, so a reader never sees a half-synced set.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+
+DEFAULT_STORE_ROOT = os.environ.get(
+    'GESTURE_SET_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'active_set_store')
+)
+VERSION_INFO_NAME = '.version.json'
+# Unreferenced blobs younger than this may belong to a sync still in progress
+PRUNE_GRACE_SECONDS = 60 * 60
+HASH_BUFFER_SIZE = 1024 * 1024
+
+def file_md5(path):
+    """
+    Compute the md5 hex digest of a local file
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ActiveSetStore:
+    def __init__(self, root=None):
+        """
+        Initialize the store
+
+        Args:
+            root (str): Store directory (default: $GESTURE_SET_STORE or services/active_set_store)
+        """
+        self.root = os.path.abspath(root or DEFAULT_STORE_ROOT)
+        self.blobs_dir = os.path.join(self.root, 'blobs')
+        self.incoming_dir = os.path.join(self.root, 'incoming')
+        self.versions_dir = os.path.join(self.root, 'versions')
+        for directory in (self.blobs_dir, self.incoming_dir, self.versions_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def blob_path(self, md5):
+        return os.path.join(self.blobs_dir, md5[:2], md5)
+
+    def has_blob(self, md5):
+        return os.path.exists(self.blob_path(md5))
+
+    def incoming_name(self, md5):
+        """
+        Returns: file name under incoming/ for this process's download of md5
+        """
+        return f"{md5}.{os.getpid()}"
+
+    def add_blob(self, md5, source_path):
+        """
+        Move a downloaded file into the store after checking its hash
+
+        Args:
+            md5 (str): Expected md5 hex digest
+            source_path (str): Downloaded file (moved, not copied)
+
+        Returns:
+            str: Blob path
+
+        Raises:
+            ValueError: If the file content does not match md5 (the file is removed)
+        """
+        actual = file_md5(source_path)
+        if actual != md5:
+            os.remove(source_path)
+            raise ValueError(f"Checksum mismatch: expected {md5}, got {actual}")
+        target = self.blob_path(md5)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source_path, target)
+        return target
+
+    def version_path(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def materialize(self, version, files, info=None):
+        """
+        Build a version directory of hard links to blobs
+
+        The directory is assembled under a temporary name and renamed into
+        place, so an existing version directory is always complete.
+
+        Args:
+            version (str): Version directory name (e.g. the set's content hash)
+            files (list): Manifest entries with 'path' and 'md5'
+            info (dict): Extra metadata written to .version.json (optional)
+
+        Returns:
+            str: Version directory path
+        """
+        target = self.version_path(version)
+        if os.path.isdir(target):
+            return target
+
+        staging = f"{target}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        for entry in files:
+            link_path = os.path.join(staging, *entry['path'].split('/'))
+            os.makedirs(os.path.dirname(link_path), exist_ok=True)
+            try:
+                os.link(self.blob_path(entry['md5']), link_path)
+            except OSError:
+                # File systems without hard links get a private copy
+                shutil.copy2(self.blob_path(entry['md5']), link_path)
+        os.makedirs(staging, exist_ok=True)
+        with open(os.path.join(staging, VERSION_INFO_NAME), 'w', encoding='utf-8') as fh:
+            json.dump(dict(info or {}, version=version, files=files), fh, indent=2)
+
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another sync built the same version first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+        return target
+
+    def activate(self, version):
+        """
+        Point current at a version directory atomically
+
+        The current symlink is replaced with os.replace; the CURRENT file is
+        written the same way and used when symlinks are not available.
+        """
+        link = os.path.join(self.root, 'current')
+        temp_link = f"{link}.tmp-{os.getpid()}"
+        try:
+            if os.path.lexists(temp_link):
+                os.remove(temp_link)
+            os.symlink(os.path.join('versions', version), temp_link, target_is_directory=True)
+            os.replace(temp_link, link)
+        except (OSError, NotImplementedError) as e:
+            print(f"[WARNING] Could not update current symlink ({e}), using CURRENT file only", file=sys.stderr)
+
+        pointer = os.path.join(self.root, 'CURRENT')
+        with open(f"{pointer}.tmp-{os.getpid()}", 'w', encoding='utf-8') as fh:
+            fh.write(version)
+        os.replace(f"{pointer}.tmp-{os.getpid()}", pointer)
+
+    def current_version(self):
+        """
+        Returns: name of the active version, or None before the first sync
+        """
+        pointer = os.path.join(self.root, 'CURRENT')
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, encoding='utf-8') as fh:
+            return fh.read().strip() or None
+
+    def current_path(self):
+        """
+        Returns: directory of the active version, or None before the first sync
+        """
+        version = self.current_version()
+        return self.version_path(version) if version else None
+
+    def prune(self, keep_versions=3):
+        """
+        Remove old version directories and blobs no remaining version uses
+
+        The active version is always kept.
+
+        Returns:
+            dict: Number of versions and blobs removed
+        """
+        current = self.current_version()
+        versions = sorted(
+            (name for name in os.listdir(self.versions_dir) if '.tmp-' not in name),
+            key=lambda name: os.path.getmtime(self.version_path(name)),
+            reverse=True
+        )
+        kept = [name for name in versions if name == current]
+        kept += [name for name in versions if name != current][:max(keep_versions - len(kept), 0)]
+        removed_versions = 0
+        for name in versions:
+            if name not in kept:
+                shutil.rmtree(self.version_path(name), ignore_errors=True)
+                removed_versions += 1
+
+        referenced = set()
+        for name in kept:
+            try:
+                with open(os.path.join(self.version_path(name), VERSION_INFO_NAME), encoding='utf-8') as fh:
+                    referenced.update(entry['md5'] for entry in json.load(fh)['files'])
+            except (OSError, ValueError, KeyError):
+                return {'versions_removed': removed_versions, 'blobs_removed': 0}  # keep blobs if unsure
+
+        removed_blobs = 0
+        cutoff = time.time() - PRUNE_GRACE_SECONDS
+        for prefix in os.listdir(self.blobs_dir):
+            for md5 in os.listdir(os.path.join(self.blobs_dir, prefix)):
+                path = os.path.join(self.blobs_dir, prefix, md5)
+                if md5 not in referenced and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed_blobs += 1
+
+        # Partial downloads left behind by processes that died mid-sync
+        for name in os.listdir(self.incoming_dir):
+            path = os.path.join(self.incoming_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # finished and moved into blobs/ meanwhile
+        return {'versions_removed': removed_versions, 'blobs_removed': removed_blobs}
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Manifest of the trained artifacts a user's model needs
+
+After training, the user directory holds more than the model: the training
+script, raw_data/, the merged datasets and whatever plots and reports the
+training script writes into training_results/. Only some of it is needed
+to run the model. The artifact manifest lists exactly those files (from an
+allowlist of glob patterns) with their size and md5, and the uploader
+transfers what it lists and nothing else; the rest is left where it is
+for cleanup_user_directory.
+
+The manifest is written by prepare_user_data.run_training when training
+succeeds, next to training_results/ and models/ in the user directory.
+
+The allowlist can be replaced with $GESTURE_ARTIFACT_PATTERNS
+(comma separated glob patterns relative to the user directory).
+
+Usage:
+    python artifact_manifest.py build --user-dir ../hybrid_realtime_pipeline/code/user_123
+    python artifact_manifest.py verify --user-dir ../hybrid_realtime_pipeline/code/user_123
+"""
+
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import datetime
+
+ARTIFACT_MANIFEST_NAME = 'artifact_manifest.json'
+ARTIFACT_MANIFEST_VERSION = 1
+# What gesture_prediction.py and the dashboard read from a trained user model
+DEFAULT_ARTIFACT_PATTERNS = (
+    'models/*.pkl',
+    'models/*.json',
+    'training_results/gesture_data_compact.csv',
+    'training_results/optimal_hyperparameters_per_pose.csv',
+    'training_results/*.json',
+)
+HASH_BUFFER_SIZE = 1024 * 1024
+
+def artifact_patterns():
+    """
+    Returns: allowlist patterns ($GESTURE_ARTIFACT_PATTERNS or DEFAULT_ARTIFACT_PATTERNS)
+    """
+    configured = os.environ.get('GESTURE_ARTIFACT_PATTERNS')
+    if configured:
+        return tuple(pattern.strip() for pattern in configured.split(',') if pattern.strip())
+    return DEFAULT_ARTIFACT_PATTERNS
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def select_artifacts(user_dir, patterns=None):
+    """
+    Find the files of user_dir matching the allowlist
+
+    Args:
+        user_dir (str): User directory
+        patterns (list): Glob patterns relative to user_dir (optional, artifact_patterns())
+
+    Returns:
+        list: Sorted relative paths ('models/motion_svm_model.pkl')
+    """
+    selected = set()
+    for pattern in patterns or artifact_patterns():
+        for path in glob.glob(os.path.join(user_dir, pattern)):
+            if os.path.isfile(path):
+                selected.add(os.path.relpath(path, user_dir).replace(os.sep, '/'))
+    return sorted(selected)
+
+def build_artifact_manifest(user_dir, patterns=None, info=None):
+    """
+    Write the artifact manifest of a trained user directory
+
+    Args:
+        user_dir (str): User directory
+        patterns (list): Allowlist glob patterns (optional, artifact_patterns())
+        info (dict): Extra fields for the manifest (optional)
+
+    Returns:
+        dict: Artifact manifest
+    """
+    patterns = list(patterns or artifact_patterns())
+    files = []
+    for relative_path in select_artifacts(user_dir, patterns):
+        path = os.path.join(user_dir, *relative_path.split('/'))
+        files.append({'path': relative_path, 'size': os.path.getsize(path), 'md5': _file_md5(path)})
+    manifest = dict(info or {}, **{
+        'manifest_version': ARTIFACT_MANIFEST_VERSION,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'patterns': patterns,
+        'total_size': sum(entry['size'] for entry in files),
+        'files': files
+    })
+    with open(os.path.join(user_dir, ARTIFACT_MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+def load_artifact_manifest(user_dir):
+    """
+    Returns: the artifact manifest of user_dir, or None if training did not write one
+    """
+    path = os.path.join(user_dir, ARTIFACT_MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as fh:
+        return json.load(fh)
+
+def verify_artifacts(user_dir, manifest, check_md5=True):
+    """
+    Check the files of user_dir against the manifest
+
+    Args:
+        user_dir (str): User directory
+        manifest (dict): Artifact manifest
+        check_md5 (bool): Also compare md5s (False: sizes only)
+
+    Returns:
+        list: Problems found ('models/x.pkl: missing'); empty if everything matches
+    """
+    problems = []
+    for entry in manifest['files']:
+        path = os.path.join(user_dir, *entry['path'].split('/'))
+        if not os.path.isfile(path):
+            problems.append(f"{entry['path']}: missing")
+        elif os.path.getsize(path) != entry['size']:
+            problems.append(f"{entry['path']}: size {os.path.getsize(path)} != {entry['size']}")
+        elif check_md5 and _file_md5(path) != entry['md5']:
+            problems.append(f"{entry['path']}: md5 mismatch")
+    return problems
+
+def skipped_files(user_dir, manifest, folders):
+    """
+    Files in folders of user_dir that the manifest does not list
+
+    Args:
+        user_dir (str): User directory
+        manifest (dict): Artifact manifest
+        folders (list): Folder names relative to user_dir (e.g. training_results, models)
+
+    Returns:
+        list: (relative path, size) tuples
+    """
+    listed = {entry['path'] for entry in manifest['files']}
+    skipped = []
+    for folder in folders:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(user_dir, folder)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                relative_path = os.path.relpath(path, user_dir).replace(os.sep, '/')
+                if relative_path not in listed:
+                    skipped.append((relative_path, os.path.getsize(path)))
+    return skipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build or verify the artifact manifest of a trained user directory')
+    parser.add_argument('command', choices=['build', 'verify'])
+    parser.add_argument('--user-dir', required=True, help='User directory (user_<id>)')
+    parser.add_argument('--pattern', action='append',
+                        help='build: allowlist glob pattern relative to the user directory (repeatable)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        manifest = build_artifact_manifest(args.user_dir, args.pattern)
+        print(f"[SUCCESS] Listed {len(manifest['files'])} artifacts "
+              f"({manifest['total_size'] / 1024 / 1024:.2f} MB) in {ARTIFACT_MANIFEST_NAME}")
+        sys.exit(0)
+
+    manifest = load_artifact_manifest(args.user_dir)
+    if manifest is None:
+        print(f"[ERROR] {ARTIFACT_MANIFEST_NAME} not found in {args.user_dir}")
+        sys.exit(1)
+    problems = verify_artifacts(args.user_dir, manifest)
+    for problem in problems:
+        print(f"[ERROR] {problem}")
+    if not problems:
+        print(f"[SUCCESS] {len(manifest['files'])} artifacts match {ARTIFACT_MANIFEST_NAME}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of resumable uploads against a local fake endpoint
+
+Runs GoogleDriveOAuthService._upload_resumable, through the real
+googleapiclient HTTP layer, against a local HTTP server that speaks Drive's
+resumable upload protocol (session POST, chunked PUTs answered with 308 and
+a Range header, status queries with "bytes */<size>"). No Google account or
+network access is needed. Each chunk size is uploaded once and the number
+of requests, seconds and MB/s are printed.
+
+--latency-ms adds a delay to every chunk request to stand in for the round
+trip to Drive, which is what makes small chunks slow. --fail-every answers
+every Nth chunk with a 503 to exercise the retry and resume path.
+
+Usage:
+    python benchmark_resumable_upload.py --size-mb 64 --chunk-mb 1 8 32 --latency-ms 50
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import google_drive_oauth_service
+from googleapiclient.http import HttpRequest, build_http
+from googleapiclient.model import JsonModel
+
+UPLOAD_PATH = '/upload/drive/v3/files'
+SESSION_PATH = '/upload/session/'
+
+class _ResumableUploadHandler(BaseHTTPRequestHandler):
+    """
+    Minimal Drive resumable upload endpoint; uploaded bytes are counted and discarded
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        remaining = length
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+        return length
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        metadata = json.loads(body or b'{}')
+        with server.lock:
+            server.requests += 1
+            session_id = str(len(server.sessions) + 1)
+            server.sessions[session_id] = {
+                'name': metadata.get('name', 'upload'),
+                'total': int(self.headers.get('X-Upload-Content-Length') or 0),
+                'received': 0
+            }
+        host, port = server.server_address[:2]
+        self._reply(200, headers={'Location': f"http://{host}:{port}{SESSION_PATH}{session_id}"})
+
+    def do_PUT(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        session = server.sessions.get(self.path[len(SESSION_PATH):])
+        length = self._read_body()
+        if session is None:
+            self._reply(404)
+            return
+
+        # "bytes 0-262143/1048576", or "bytes */1048576" when the client asks for the committed range
+        content_range = self.headers.get('Content-Range', '')
+        spec, _, total = content_range.replace('bytes ', '').partition('/')
+        with server.lock:
+            server.requests += 1
+            chunk = server.requests
+            if total and total != '*':
+                session['total'] = int(total)
+            if spec != '*':
+                if server.fail_every and chunk % server.fail_every == 0:
+                    self._reply(503, b'{"error": {"code": 503, "message": "Injected failure"}}',
+                                {'Content-Type': 'application/json'})
+                    return
+                start = int(spec.split('-')[0])
+                if start == session['received']:
+                    session['received'] += length
+            received, total = session['received'], session['total']
+
+        if received >= total:
+            file = {'id': f"bench{self.path.rsplit('/', 1)[-1]}", 'name': session['name'], 'size': str(total)}
+            self._reply(200, json.dumps(file).encode('utf-8'), {'Content-Type': 'application/json'})
+        else:
+            self._reply(308, headers={'Range': f"bytes=0-{received - 1}"} if received else None)
+
+def start_fake_endpoint(latency=0.0, fail_every=0):
+    """
+    Start the fake upload endpoint on a free local port
+
+    Args:
+        latency (float): Seconds added to every chunk request
+        fail_every (int): Answer every Nth request with a 503 (0: never)
+
+    Returns:
+        ThreadingHTTPServer: Running server (call shutdown() when done)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ResumableUploadHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.sessions = {}
+    server.requests = 0
+    server.latency = latency
+    server.fail_every = fail_every
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class _LocalFiles:
+    """
+    files() resource whose create() sends a resumable upload to the fake endpoint
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.http = build_http()
+
+    def create(self, body=None, media_body=None, fields=None):
+        return HttpRequest(
+            self.http, JsonModel(False).response,
+            f"{self.base_url}{UPLOAD_PATH}?uploadType=resumable&alt=json&fields={fields or ''}",
+            method='POST', body=json.dumps(body or {}),
+            headers={'content-type': 'application/json'},
+            methodId='drive.files.create', resumable=media_body
+        )
+
+class _LocalDrive:
+    def __init__(self, base_url):
+        self._files = _LocalFiles(base_url)
+
+    def files(self):
+        return self._files
+
+def local_drive_service(base_url, work_dir, chunk_size):
+    """
+    GoogleDriveOAuthService whose uploads go to the fake endpoint instead of Drive
+    """
+    google_drive_oauth_service.build = lambda *args, **kwargs: _LocalDrive(base_url)
+
+    class LocalDriveService(google_drive_oauth_service.GoogleDriveOAuthService):
+        def _get_credentials(self):
+            return None
+
+    return LocalDriveService(
+        token_file=os.path.join(work_dir, 'token.json'),
+        upload_chunk_size=chunk_size,
+        max_requests_per_second=100000
+    )
+
+def run_benchmark(size_mb, chunk_sizes_mb, latency_ms=0.0, fail_every=0):
+    """
+    Upload one generated file once per chunk size
+
+    Args:
+        size_mb (float): Size of the generated file in MB
+        chunk_sizes_mb (list): Chunk sizes in MB (rounded down to 256 KiB multiples)
+        latency_ms (float): Delay added to every chunk request
+        fail_every (int): Answer every Nth request with a 503 (0: never)
+
+    Returns:
+        list: One dict per chunk size with chunk_size, requests, retries, seconds and mb_per_s
+    """
+    work_dir = tempfile.mkdtemp(prefix='upload_benchmark_')
+    server = start_fake_endpoint(latency_ms / 1000, fail_every)
+    try:
+        file_path = os.path.join(work_dir, 'payload.bin')
+        size = int(size_mb * 1024 * 1024)
+        block = os.urandom(1024 * 1024)
+        with open(file_path, 'wb') as fh:
+            for offset in range(0, size, len(block)):
+                fh.write(block[:size - offset])
+
+        host, port = server.server_address[:2]
+        results = []
+        for chunk_mb in chunk_sizes_mb:
+            drive_service = local_drive_service(f"http://{host}:{port}", work_dir, int(chunk_mb * 1024 * 1024))
+            chunk_size = drive_service.upload_chunk_size
+            requests_before = server.requests
+            started = time.perf_counter()
+            file = drive_service._upload_resumable(
+                file_path, {'name': 'payload.bin'}, 'application/octet-stream', chunk_size,
+                drive_service._upload_journal_key(file_path, 'payload.bin', None)
+            )
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            if int(file['size']) != size:
+                raise RuntimeError(f"Endpoint received {file['size']} of {size} bytes")
+            results.append({
+                'chunk_size': chunk_size,
+                'requests': server.requests - requests_before,
+                'retries': drive_service.get_metrics()['retries'],
+                'seconds': elapsed,
+                'mb_per_s': size / 1024 / 1024 / elapsed
+            })
+        return results
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark resumable upload throughput against a local fake endpoint')
+    parser.add_argument('--size-mb', type=float, default=64, help='Size of the uploaded file in MB (default 64)')
+    parser.add_argument('--chunk-mb', type=float, nargs='+', default=[0.25, 1, 8, 32],
+                        help='Chunk sizes to compare in MB (default 0.25 1 8 32)')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Delay added to every chunk request, standing in for the round trip to Drive')
+    parser.add_argument('--fail-every', type=int, default=0,
+                        help='Answer every Nth request with a 503 to exercise retries (default: never)')
+    args = parser.parse_args()
+
+    print(f"[INFO] Uploading {args.size_mb:g} MB to a local fake endpoint "
+          f"({args.latency_ms:g} ms per request, fail every {args.fail_every or '-'})")
+    for result in run_benchmark(args.size_mb, args.chunk_mb, args.latency_ms, args.fail_every):
+        print(f"[TIMING] chunk {result['chunk_size'] / 1024 / 1024:6.2f} MB: {result['requests']:5d} requests, "
+              f"{result['retries']:3d} retries, {result['seconds']:7.2f}s, {result['mb_per_s']:8.2f} MB/s")
@@ -1,13 +1,181 @@
 #!/usr/bin/env python3
 """
 Script to check if user data exists in Google Drive UploadGesture folder
+
+Single user (exit code 0 if the user has data):
+    python check_drive_data.py <user_id>
+
+Batch, answered from one paginated listing of UploadGesture (plus one
+listing per folder level below it) or from the local metadata mirror;
+prints JSON with per-user file counts, total bytes and newest modifiedTime:
+    python check_drive_data.py --batch <user_id> [<user_id> ...]
+    python check_drive_data.py --batch              (every user with data)
+    python check_drive_data.py --batch --mirror <user_id> ...
 """
 
 import sys
 import os
+import json
+import argparse
+import contextlib
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from google_drive_oauth_service import GoogleDriveOAuthService
+from google_drive_oauth_service import get_drive_service, FOLDER_MIME_TYPE
+from download_user_data import find_upload_folder, find_user_entries
+
+# Characters that may follow "user_<id>" in the name of a user's file (e.g. user_<id>.csv)
+USER_NAME_SEPARATORS = ('.', '_', '-', ' ')
+# --mirror: sync the mirror first when it is older than this
+DEFAULT_MAX_STALENESS_SECONDS = 60
+
+def user_id_of(name):
+    """
+    Returns: user ID of an UploadGesture entry named user_<id>[<separator>...], or None
+    """
+    if not name.startswith('user_'):
+        return None
+    rest = name[len('user_'):]
+    end = min((rest.find(separator) for separator in USER_NAME_SEPARATORS if separator in rest), default=len(rest))
+    return rest[:end] or None
+
+def group_user_entries(entries, user_ids=None):
+    """
+    Group UploadGesture entries by user
+
+    Like find_user_entries, an entry named exactly user_<id> wins over
+    prefixed names of the same user.
+
+    Args:
+        entries (list): Direct children of UploadGesture
+        user_ids (list): Users to keep (optional, default every user)
+
+    Returns:
+        dict: User ID -> list of entries
+    """
+    wanted = set(user_ids) if user_ids else None
+    groups = {}
+    for entry in entries:
+        user_id = user_id_of(entry['name'])
+        if user_id and (wanted is None or user_id in wanted):
+            groups.setdefault(user_id, []).append(entry)
+    for user_id, user_entries in groups.items():
+        exact = [entry for entry in user_entries if entry['name'] == f"user_{user_id}"]
+        if exact:
+            groups[user_id] = exact
+    return groups
+
+def summarize_user(entries, folder_files):
+    """
+    Count a user's files
+
+    Args:
+        entries (list): The user's entries in UploadGesture
+        folder_files (dict): Folder ID -> every file below that folder
+
+    Returns:
+        dict: has_data, files, bytes and newest_modified (RFC 3339 string or None)
+    """
+    files = [entry for entry in entries if entry['mimeType'] != FOLDER_MIME_TYPE]
+    for entry in entries:
+        if entry['mimeType'] == FOLDER_MIME_TYPE:
+            files.extend(folder_files.get(entry['id'], []))
+    # RFC 3339 timestamps from Drive compare correctly as strings
+    modified = [item['modifiedTime'] for item in files + entries if item.get('modifiedTime')]
+    return {
+        'has_data': bool(files),
+        'files': len(files),
+        'bytes': sum(int(file.get('size') or 0) for file in files),
+        'newest_modified': max(modified) if modified else None
+    }
+
+def check_users_drive(drive_service, user_ids=None):
+    """
+    Summarize many users from one listing of UploadGesture
+
+    The user folders found are then walked level by level with batched
+    parent queries, so the request count depends on the folder depth, not
+    on the number of users.
+
+    Returns:
+        dict: User ID -> summary (see summarize_user)
+    """
+    upload_folder_id = find_upload_folder(drive_service)
+    if not upload_folder_id:
+        raise RuntimeError("UploadGesture folder not found!")
+    groups = group_user_entries(
+        drive_service.search_all_files(f"'{upload_folder_id}' in parents and trashed=false"), user_ids)
+    folder_ids = [entry['id'] for entries in groups.values() for entry in entries
+                  if entry['mimeType'] == FOLDER_MIME_TYPE]
+    trees = drive_service.list_trees(folder_ids) if folder_ids else {}
+    folder_files = {folder_id: [file for _, file in tree] for folder_id, tree in trees.items()}
+    return {user_id: summarize_user(groups.get(user_id, []), folder_files)
+            for user_id in (user_ids or sorted(groups))}
+
+def check_users_mirror(mirror, user_ids=None):
+    """
+    Summarize many users from the local metadata mirror (no Drive requests)
+
+    Returns:
+        dict: User ID -> summary (see summarize_user)
+    """
+    upload_folder_id = mirror.get_root_id('UploadGesture')
+    if not upload_folder_id:
+        raise RuntimeError("UploadGesture is not in the metadata mirror, run: python drive_metadata_mirror.py resync")
+    groups = group_user_entries(mirror.list_children(upload_folder_id), user_ids)
+
+    folder_files = {}
+    for entries in groups.values():
+        for entry in entries:
+            if entry['mimeType'] != FOLDER_MIME_TYPE:
+                continue
+            files, pending = [], [entry['id']]
+            while pending:
+                for child in mirror.list_children(pending.pop()):
+                    if child['mimeType'] == FOLDER_MIME_TYPE:
+                        pending.append(child['id'])
+                    else:
+                        files.append(child)
+            folder_files[entry['id']] = files
+    return {user_id: summarize_user(groups.get(user_id, []), folder_files)
+            for user_id in (user_ids or sorted(groups))}
+
+def check_users_batch(user_ids=None, use_mirror=False, max_staleness=DEFAULT_MAX_STALENESS_SECONDS):
+    """
+    Batch check for the dashboard
+
+    Args:
+        user_ids (list): Users to check (optional, default every user with data)
+        use_mirror (bool): Answer from the local metadata mirror, syncing it first if stale
+        max_staleness (float): Mirror age in seconds that triggers a sync
+
+    Returns:
+        dict: 'users' (user ID -> summary), 'source', 'drive_requests' and for the
+              mirror 'mirror_staleness_seconds'
+    """
+    if use_mirror:
+        from drive_metadata_mirror import open_mirror
+        mirror = open_mirror()
+        try:
+            calls_before = mirror.drive_service.get_metrics()['calls']
+            staleness = mirror.sync_if_stale(max_staleness)
+            users = check_users_mirror(mirror, user_ids)
+            return {
+                'source': 'mirror',
+                'mirror_staleness_seconds': round(staleness, 1),
+                'drive_requests': mirror.drive_service.get_metrics()['calls'] - calls_before,
+                'users': users
+            }
+        finally:
+            mirror.close()
+
+    drive_service = get_drive_service()
+    calls_before = drive_service.get_metrics()['calls']
+    users = check_users_drive(drive_service, user_ids)
+    return {
+        'source': 'drive',
+        'drive_requests': drive_service.get_metrics()['calls'] - calls_before,
+        'users': users
+    }
 
 def check_user_drive_data(user_id):
     """
@@ -18,29 +186,26 @@ def check_user_drive_data(user_id):
     """
     try:
         # Initialize Google Drive service
-        drive_service = GoogleDriveOAuthService()
+        drive_service = get_drive_service()
 
         # Search for UploadGesture folder
         print("Searching for UploadGesture folder...")
-        upload_folders = drive_service.search_files("name='UploadGesture' and mimeType='application/vnd.google-apps.folder'")
-
-        if not upload_folders:
+        upload_folder_id = find_upload_folder(drive_service)
+        if not upload_folder_id:
             print("[ERROR] UploadGesture folder not found!")
             return False
+        print(f"[SUCCESS] Found UploadGesture folder (ID: {upload_folder_id})")
 
-        upload_folder = upload_folders[0]
-        upload_folder_id = upload_folder['id']
-        print(f"[SUCCESS] Found UploadGesture folder: {upload_folder['name']} (ID: {upload_folder_id})")
-
-        # Search for files with user ID in the UploadGesture folder
-        print(f"Searching for files containing user_{user_id} in UploadGesture folder...")
-        user_files_query = f"name contains 'user_{user_id}' and '{upload_folder_id}' in parents and trashed=false"
-        user_files = drive_service.search_files(user_files_query)
+        # Look up user_<id> by exact name (prefixed file names as fallback) and count what is below it
+        print(f"Searching for user_{user_id} in UploadGesture folder...")
+        entries = find_user_entries(drive_service, upload_folder_id, user_id)
+        folder_ids = [entry['id'] for entry in entries if entry['mimeType'] == FOLDER_MIME_TYPE]
+        trees = drive_service.list_trees(folder_ids) if folder_ids else {}
+        summary = summarize_user(entries, {folder_id: [file for _, file in tree] for folder_id, tree in trees.items()})
 
-        if user_files:
-            print(f"[SUCCESS] Found {len(user_files)} file(s) for user {user_id}:")
-            for file in user_files:
-                print(f"  - {file['name']} (ID: {file['id']}, Size: {file.get('size', 'N/A')}, Modified: {file['modifiedTime']})")
+        if summary['has_data']:
+            print(f"[SUCCESS] Found {summary['files']} file(s) for user {user_id}: "
+                  f"{summary['bytes']} bytes, newest modified {summary['newest_modified']}")
             return True
         else:
             print(f"[INFO] No files found for user {user_id} in UploadGesture folder")
@@ -51,13 +216,31 @@ def check_user_drive_data(user_id):
         return False
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description='Check for user data in the UploadGesture folder')
+    parser.add_argument('user_ids', nargs='*', help='User ID(s)')
+    parser.add_argument('--batch', action='store_true', help='Check many users at once and print JSON')
+    parser.add_argument('--mirror', action='store_true', help='Batch: answer from the local metadata mirror')
+    parser.add_argument('--max-staleness', type=float, default=DEFAULT_MAX_STALENESS_SECONDS,
+                        help='Batch with --mirror: sync the mirror first if it is older than this (seconds)')
+    args = parser.parse_args()
+
+    if args.batch:
+        try:
+            # stdout carries only the JSON result
+            with contextlib.redirect_stdout(sys.stderr):
+                result = check_users_batch(args.user_ids or None, args.mirror, args.max_staleness)
+        except Exception as e:
+            print(json.dumps({'error': str(e)}))
+            sys.exit(1)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    if len(args.user_ids) != 1:
         print("Usage: python check_drive_data.py <user_id>")
         sys.exit(1)
-    
-    user_id = sys.argv[1]
+
+    user_id = args.user_ids[0]
     print(f"Checking Google Drive data for user: {user_id}")
     has_data = check_user_drive_data(user_id)
     print(f"\nResult: User has data on Google Drive: {has_data}")
-    sys.exit(0 if has_data else 1)
\ No newline at end of file
+    sys.exit(0 if has_data else 1)
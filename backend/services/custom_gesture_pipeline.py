@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Custom gesture training pipeline in one process
+
+Runs the stages the admin approval used to spawn as separate scripts
+(check_drive_data -> download_user_data -> prepare_user_data -> training ->
+upload_trained_model -> cleanup_user_directory) with one Drive client and
+one cache of folder IDs, passing state between stages in memory.
+
+Independent work overlaps:
+    - the CustomGesture destination is looked up while the model trains
+    - the trained artifacts (see artifact_manifest.py) upload in parallel
+
+Every stage is timed and its byte count recorded; the report is printed at
+the end and can be written as JSON with --report-json.
+
+Batch mode (--user-ids) trains several users in one run: the reference data
+is parsed once and shared, downloads and uploads run concurrently, and the
+training scripts run in parallel, one per core.
+
+Usage:
+    python custom_gesture_pipeline.py --user-id 123
+    python custom_gesture_pipeline.py --user-id 123 --from-drive --bundle --report-json report.json
+    python custom_gesture_pipeline.py --user-ids 123 456 789 --train-workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# Import from current directory first
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google_drive_oauth_service import get_drive_service, FOLDER_MIME_TYPE
+from download_user_data import (find_user_entries, plan_folder_download, download_files, fetch_user_csvs,
+                                is_raw_gesture_csv)
+from upload_trained_model import TRANSFER_FOLDERS, plan_artifact_upload, upload_artifacts, upload_bundle
+from workspace_manager import WorkspaceManager, directory_size
+
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+# services -> backend -> dashboard_web -> project root
+DEFAULT_CODE_DIR = os.environ.get(
+    'GESTURE_PIPELINE_CODE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(SERVICES_DIR))), 'hybrid_realtime_pipeline', 'code')
+)
+TRAIN_SCRIPT_NAME = 'train_motion_svm_all_models.py'
+BASE_COMPACT_PATH = os.path.join('training_results', 'gesture_data_compact.csv')
+ORIGINAL_DATA_NAME = 'gesture_data_09_10_2025.csv'
+CUSTOM_DATASET_NAME = 'gesture_data_custom_full.csv'
+# Batch mode: users downloaded or uploaded at the same time
+MAX_PARALLEL_USERS = 4
+
+class DriveFolders:
+    """Top-level Drive folders, looked up once per pipeline run"""
+
+    def __init__(self, drive_service):
+        self.drive_service = drive_service
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Returns: ID of the top-level folder with this name
+
+        Raises:
+            RuntimeError: If the folder does not exist
+        """
+        with self._lock:
+            if name not in self._ids:
+                folders = self.drive_service.search_files(
+                    f"name='{name}' and mimeType='{FOLDER_MIME_TYPE}' and trashed=false")
+                if not folders:
+                    raise RuntimeError(f"{name} folder not found!")
+                self._ids[name] = folders[0]['id']
+            return self._ids[name]
+
+class StageReport:
+    """Timing and byte counts of the pipeline stages"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def run(self, name, func, *args, **kwargs):
+        """
+        Run one stage and record it
+
+        Args:
+            name (str): Stage name
+            func: Callable returning (result, bytes handled)
+
+        Returns:
+            The stage result; exceptions mark the stage failed and propagate
+        """
+        record = {'stage': name, 'start': round(time.perf_counter() - self.started, 3), 'bytes': 0}
+        stage_started = time.perf_counter()
+        print(f"[STAGE] {name}...")
+        try:
+            result, record['bytes'] = func(*args, **kwargs)
+            record['ok'] = True
+            return result
+        except Exception as e:
+            record['ok'] = False
+            record['error'] = str(e)
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - stage_started, 3)
+            with self._lock:
+                self.stages.append(record)
+            print(f"[TIMING] {name}: {record['seconds']:.2f}s, {record['bytes'] / 1024 / 1024:.2f} MB"
+                  f"{'' if record['ok'] else ' (failed)'}")
+
+    def to_dict(self, **extra):
+        return dict(extra, total_seconds=round(time.perf_counter() - self.started, 3),
+                    stages=sorted(self.stages, key=lambda record: record['start']))
+
+    def print_table(self):
+        print("\n[REPORT] Stage                  start   seconds        MB")
+        for record in sorted(self.stages, key=lambda record: record['start']):
+            status = '' if record['ok'] else '  FAILED'
+            print(f"[REPORT] {record['stage']:<20} {record['start']:7.2f} {record['seconds']:9.2f} "
+                  f"{record['bytes'] / 1024 / 1024:9.2f}{status}")
+        print(f"[REPORT] total {time.perf_counter() - self.started:.2f}s")
+
+class CustomGesturePipeline:
+    def __init__(self, user_id, code_dir=None, from_drive=False, bundle=False, keep_local=False,
+                 drive_service=None, folders=None, reference=None, log_prefix='', workspace=None):
+        """
+        Initialize the pipeline
+
+        Args:
+            user_id (str): User ID
+            code_dir (str): hybrid_realtime_pipeline/code directory with the train script and reference data
+            from_drive (bool): Merge the raw CSVs from memory instead of downloading the user folder
+            bundle (bool): Upload the results as one compressed archive (see model_bundle.py)
+            keep_local (bool): Keep the local user directory after the upload
+            drive_service: Shared GoogleDriveOAuthService (optional)
+            folders (DriveFolders): Shared folder ID cache (optional)
+            reference (dict): Reference data from prepare_user_data.load_reference_data (optional)
+            log_prefix (str): Prefix for training log lines
+            workspace (WorkspaceManager): Where the user_<id> work directory lives
+                (default: DEFAULT_WORKSPACE_ROOT, shared with upload_trained_model and cleanup_user_directory)
+        """
+        self.user_id = str(user_id)
+        self.code_dir = os.path.abspath(code_dir or DEFAULT_CODE_DIR)
+        self.workspace = workspace or WorkspaceManager()
+        self.user_dir = self.workspace.path(self.user_id)
+        self.from_drive = from_drive
+        self.bundle = bundle
+        self.keep_local = keep_local
+        self.drive_service = drive_service or get_drive_service()
+        self.folders = folders or DriveFolders(self.drive_service)
+        self.reference = reference
+        self.log_prefix = log_prefix
+        self.report = StageReport()
+        self.drive_calls = 0
+        self.skipped_bytes = 0
+
+    def check(self):
+        entries = find_user_entries(self.drive_service, self.folders.get('UploadGesture'), self.user_id)
+        if not entries:
+            raise RuntimeError(f"No data found for user {self.user_id} in UploadGesture")
+        print(f"[SUCCESS] Found {len(entries)} UploadGesture entries for user {self.user_id}")
+
+        # The user folders are listed once here; download reuses the listing
+        folders = {}
+        folder_ids = [entry['id'] for entry in entries if entry['mimeType'] == FOLDER_MIME_TYPE]
+        trees = self.drive_service.list_trees(folder_ids, folders) if folder_ids else {}
+        files = [(relative_path, file) for tree in trees.values() for relative_path, file in tree]
+        if self.from_drive:
+            # Only the raw CSVs are fetched, and they are merged into the work directory
+            expected = sum(int(file.get('size') or 0) for relative_path, file in files
+                           if is_raw_gesture_csv(relative_path))
+        else:
+            loose_files = [entry for entry in entries if entry['mimeType'] != FOLDER_MIME_TYPE]
+            expected = sum(int(file.get('size') or 0) for file in [file for _, file in files] + loose_files)
+        # Fails early if the download would not fit the workspace quota
+        self.workspace.allocate(self.user_id, expected)
+        return (entries, trees, folders), 0
+
+    def download(self, listing):
+        entries, trees, folders = listing
+        if self.from_drive:
+            sources = fetch_user_csvs(self.user_id, drive_service=self.drive_service, user_entries=entries,
+                                      trees=trees)
+            size = 0
+            for _, buffer in sources:
+                buffer.seek(0, os.SEEK_END)
+                size += buffer.tell()
+                buffer.seek(0)
+            return sources, size
+
+        downloads = plan_folder_download(self.drive_service, list(trees), self.user_dir, trees, folders) if trees else []
+        downloads += [(os.path.join(self.user_dir, entry['name']), entry)
+                      for entry in entries if entry['mimeType'] != FOLDER_MIME_TYPE]
+        if not download_files(self.drive_service, downloads):
+            raise RuntimeError("Download of the user data failed")
+        return None, sum(int(file.get('size') or 0) for _, file in downloads)
+
+    def prepare(self, sources):
+        # pandas/numpy are only needed from here on
+        import prepare_user_data
+
+        args = prepare_user_data.build_parser().parse_args([
+            '--user-dir', self.user_dir,
+            '--base-compact', os.path.join(self.code_dir, BASE_COMPACT_PATH),
+            '--original-data', os.path.join(self.code_dir, ORIGINAL_DATA_NAME),
+        ])
+        if not prepare_user_data.prepare_user_training(args, sources=sources, reference=self.reference):
+            raise RuntimeError("Preparing the training dataset failed")
+        return None, os.path.getsize(os.path.join(self.user_dir, CUSTOM_DATASET_NAME))
+
+    def train(self):
+        import prepare_user_data
+        from pathlib import Path
+
+        if not prepare_user_data.run_training(Path(self.user_dir) / CUSTOM_DATASET_NAME, Path(self.user_dir),
+                                              False, Path(self.code_dir) / TRAIN_SCRIPT_NAME, self.log_prefix):
+            raise RuntimeError("Training failed")
+        return None, sum(directory_size(os.path.join(self.user_dir, folder)) for folder in TRANSFER_FOLDERS)
+
+    def find_destination(self):
+        custom_folder_id = self.folders.get('CustomGesture')
+        existing = self.drive_service.search_files(
+            f"name='user_{self.user_id}' and '{custom_folder_id}' in parents "
+            f"and mimeType='{FOLDER_MIME_TYPE}' and trashed=false")
+        return (custom_folder_id, [folder['id'] for folder in existing]), 0
+
+    def upload(self, destination):
+        custom_folder_id, existing_ids = destination
+        # Checked before the previous model is deleted
+        manifest, skipped = plan_artifact_upload(self.user_dir, self.user_id)
+        self.skipped_bytes = sum(size for _, size in skipped)
+        # The previous model is only replaced once the new one has trained
+        for folder_id in existing_ids:
+            if self.drive_service.delete_file(folder_id):
+                print(f"[CLEANUP] Deleted existing user folder user_{self.user_id}")
+        user_folder = self.drive_service.create_folder(f"user_{self.user_id}", custom_folder_id)
+        if not user_folder:
+            raise RuntimeError(f"Failed to create user folder user_{self.user_id}")
+
+        if self.bundle:
+            if not upload_bundle(self.drive_service, self.user_dir, user_folder['id'], self.user_id, manifest):
+                raise RuntimeError("Bundle upload failed")
+        elif not upload_artifacts(self.drive_service, self.user_dir, user_folder['id'], self.user_id, manifest):
+            raise RuntimeError("Upload of the trained model failed")
+        return None, manifest['total_size']
+
+    def cleanup(self):
+        size = directory_size(self.user_dir)
+        # Renamed aside at once; a detached janitor deletes it
+        self.workspace.release(self.user_id)
+        print(f"[SUCCESS] Released local user directory: {self.user_dir}")
+        return None, size
+
+    def run(self):
+        """
+        Run all stages
+
+        Returns:
+            bool: True if every stage succeeded
+        """
+        calls_before = self.drive_service.get_metrics()['calls']
+        success = False
+        sources = None
+        try:
+            with ThreadPoolExecutor(max_workers=1) as background:
+                listing = self.report.run('check', self.check)
+                sources = self.report.run('download', self.download, listing)
+                destination = background.submit(self.report.run, 'find_destination', self.find_destination)
+                self.report.run('prepare', self.prepare, sources)
+                self.report.run('train', self.train)
+                self.report.run('upload', self.upload, destination.result())
+            success = True
+        except Exception as e:
+            print(f"[ERROR] Pipeline failed for user {self.user_id}: {e}")
+        finally:
+            # prepare_user_training closes the buffers too; closing twice is harmless
+            for _, buffer in sources or []:
+                buffer.close()
+            if success and not self.keep_local:
+                try:
+                    self.report.run('cleanup', self.cleanup)
+                except Exception as e:
+                    print(f"[WARNING] Cleanup failed: {e}")
+
+        self.report.print_table()
+        self.drive_calls = self.drive_service.get_metrics()['calls'] - calls_before
+        print(f"[INFO] Drive requests: {self.drive_calls} calls")
+        return success
+
+    def report_dict(self, success):
+        return self.report.to_dict(user_id=self.user_id, success=success, mode='bundle' if self.bundle else 'files',
+                                   from_drive=self.from_drive, drive_calls=self.drive_calls,
+                                   upload_skipped_bytes=self.skipped_bytes)
+
+    def summary(self):
+        """
+        Returns: per-user totals for the batch summary table
+        """
+        stages = {record['stage']: record for record in self.report.stages}
+        failed = [record['stage'] for record in self.report.stages if not record['ok']]
+        # find_destination runs in the background, so it does not add to the user's time
+        seconds = sum(record['seconds'] for record in self.report.stages if record['stage'] != 'find_destination')
+        moved = sum(stages[name]['bytes'] for name in ('download', 'upload') if name in stages)
+        return {
+            'user_id': self.user_id,
+            'status': f"failed ({failed[0]})" if failed else ('ok' if 'upload' in stages else 'incomplete'),
+            'seconds': {name: stages[name]['seconds'] for name in ('download', 'prepare', 'train', 'upload')
+                        if name in stages},
+            'total_seconds': round(seconds, 3),
+            'bytes_moved': moved,
+            'mb_per_second': round(moved / 1024 / 1024 / seconds, 3) if seconds else 0.0
+        }
+
+def run_batch(user_ids, code_dir=None, from_drive=False, bundle=False, keep_local=False, train_workers=None,
+              workspace_root=None):
+    """
+    Train several users in one run
+
+    Downloads and uploads run MAX_PARALLEL_USERS at a time with one shared
+    Drive client and folder cache. Datasets are prepared in this process
+    from reference data parsed once. The training scripts run in parallel,
+    train_workers at a time, and each user uploads as soon as it finishes.
+    A failing user does not stop the others.
+
+    Args:
+        user_ids (list): User IDs
+        train_workers (int): Trainings run at the same time (default: number of cores)
+        workspace_root (str): Root for the user_<id> work directories (default: DEFAULT_WORKSPACE_ROOT)
+
+    Returns:
+        dict: Batch report with one summary per user
+    """
+    # pandas/numpy are only needed from here on
+    import prepare_user_data
+    from pathlib import Path
+
+    started = time.perf_counter()
+    code_dir = os.path.abspath(code_dir or DEFAULT_CODE_DIR)
+    drive_service = get_drive_service()
+    folders = DriveFolders(drive_service)
+    workspace = WorkspaceManager(workspace_root)
+    reference_started = time.perf_counter()
+    reference = prepare_user_data.load_reference_data(Path(code_dir) / BASE_COMPACT_PATH,
+                                                      Path(code_dir) / ORIGINAL_DATA_NAME)
+    reference_seconds = time.perf_counter() - reference_started
+    print(f"[TIMING] reference data: {reference_seconds:.2f}s (loaded once for {len(user_ids)} users)")
+
+    pipelines = [CustomGesturePipeline(user_id, code_dir, from_drive, bundle, keep_local, drive_service=drive_service,
+                                       folders=folders, reference=reference, log_prefix=f"[user_{user_id}] ",
+                                       workspace=workspace)
+                 for user_id in dict.fromkeys(str(user_id) for user_id in user_ids)]
+    errors = {}
+    train_workers = train_workers or os.cpu_count() or 1
+
+    def fetch(pipeline):
+        listing = pipeline.report.run('check', pipeline.check)
+        return pipeline.report.run('download', pipeline.download, listing)
+
+    def upload_and_cleanup(pipeline, destination):
+        pipeline.report.run('upload', pipeline.upload, destination.result())
+        if not pipeline.keep_local:
+            pipeline.report.run('cleanup', pipeline.cleanup)
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_USERS) as io_pool:
+        fetched = {pipeline.user_id: io_pool.submit(fetch, pipeline) for pipeline in pipelines}
+        destinations = {pipeline.user_id: io_pool.submit(pipeline.report.run, 'find_destination',
+                                                         pipeline.find_destination) for pipeline in pipelines}
+
+        # Datasets are prepared here, one at a time, all from the same reference frames
+        prepared = []
+        for pipeline in pipelines:
+            sources = None
+            try:
+                sources = fetched[pipeline.user_id].result()
+                pipeline.report.run('prepare', pipeline.prepare, sources)
+                prepared.append(pipeline)
+            except Exception as e:
+                errors[pipeline.user_id] = str(e)
+            finally:
+                for _, buffer in sources or []:
+                    buffer.close()
+
+        uploads = {}
+        with ThreadPoolExecutor(max_workers=min(train_workers, max(len(prepared), 1))) as train_pool:
+            trainings = {train_pool.submit(pipeline.report.run, 'train', pipeline.train): pipeline
+                         for pipeline in prepared}
+            for future in as_completed(trainings):
+                pipeline = trainings[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[pipeline.user_id] = str(e)
+                    continue
+                uploads[pipeline.user_id] = io_pool.submit(upload_and_cleanup, pipeline,
+                                                           destinations[pipeline.user_id])
+
+        for user_id, future in uploads.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors[user_id] = str(e)
+
+    elapsed = time.perf_counter() - started
+    summaries = [pipeline.summary() for pipeline in pipelines]
+    succeeded = sum(1 for summary in summaries if summary['status'] == 'ok')
+    print(f"\n[SUMMARY] {'user':<28} {'status':<18} {'download':>9} {'prepare':>8} {'train':>8} "
+          f"{'upload':>8} {'total':>8} {'MB/s':>7}")
+    for summary in summaries:
+        seconds = summary['seconds']
+        print(f"[SUMMARY] {'user_' + summary['user_id']:<28} {summary['status']:<18} "
+              + ' '.join(f"{seconds.get(name, 0):{width}.2f}" for name, width in
+                         (('download', 9), ('prepare', 8), ('train', 8), ('upload', 8)))
+              + f" {summary['total_seconds']:8.2f} {summary['mb_per_second']:7.2f}")
+    print(f"[SUMMARY] {succeeded}/{len(summaries)} users trained in {elapsed:.2f}s "
+          f"({succeeded / elapsed * 3600:.1f} users/hour, {train_workers} training workers)")
+    for user_id, error in errors.items():
+        print(f"[ERROR] user_{user_id}: {error}")
+
+    return {
+        'success': succeeded == len(summaries),
+        'total_seconds': round(elapsed, 3),
+        'reference_seconds': round(reference_seconds, 3),
+        'train_workers': train_workers,
+        'drive_calls': drive_service.get_metrics()['calls'],
+        'users': [dict(summary, stages=pipeline.report.to_dict()['stages'], error=errors.get(pipeline.user_id))
+                  for summary, pipeline in zip(summaries, pipelines)]
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the custom gesture training pipeline in one process')
+    users = parser.add_mutually_exclusive_group(required=True)
+    users.add_argument('--user-id', help='User ID')
+    users.add_argument('--user-ids', nargs='+', help='Train several users in one batch')
+    parser.add_argument('--train-workers', type=int,
+                        help='Batch mode: trainings run at the same time (default: number of cores)')
+    parser.add_argument('--code-dir', help='hybrid_realtime_pipeline/code directory (default: next to the web app)')
+    parser.add_argument('--from-drive', action='store_true',
+                        help='Merge the raw CSVs from memory instead of downloading the user folder')
+    parser.add_argument('--bundle', action='store_true', help='Upload the results as one compressed archive')
+    parser.add_argument('--keep-local', action='store_true', help='Keep the local user directory after the upload')
+    parser.add_argument('--workspace-root',
+                        help='Root for the user_<id> work directories, e.g. a tmpfs mount '
+                             '(default: $GESTURE_WORKSPACE_ROOT or hybrid_realtime_pipeline/code)')
+    parser.add_argument('--report-json', help='Write the stage report to this file')
+    args = parser.parse_args()
+
+    if args.user_ids:
+        report = run_batch(args.user_ids, args.code_dir, from_drive=args.from_drive, bundle=args.bundle,
+                           keep_local=args.keep_local, train_workers=args.train_workers,
+                           workspace_root=args.workspace_root)
+        success = report['success']
+    else:
+        pipeline = CustomGesturePipeline(args.user_id, args.code_dir, from_drive=args.from_drive,
+                                         bundle=args.bundle, keep_local=args.keep_local,
+                                         workspace=WorkspaceManager(args.workspace_root))
+        success = pipeline.run()
+        report = pipeline.report_dict(success)
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+    print(f"[REPORT] {json.dumps(report)}")
+    sys.exit(0 if success else 1)
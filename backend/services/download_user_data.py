@@ -5,16 +5,86 @@ Download user data from Google Drive UploadGesture folder
 
 import sys
 import os
+import time
+import tempfile
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 # Import from current directory first
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from google_drive_oauth_service import GoogleDriveOAuthService
+from google_drive_oauth_service import get_drive_service
+from workspace_manager import WorkspaceManager
+
+# Files downloaded at the same time
+MAX_PARALLEL_DOWNLOADS = 8
+
+# In-memory fetch: each raw CSV stays in memory up to this size, larger ones spill to a temp file
+DEFAULT_SPILL_THRESHOLD = 64 * 1024 * 1024
+
+def download_files(drive_service, downloads):
+    """
+    Download files concurrently, largest first
+
+    Args:
+        drive_service: GoogleDriveOAuthService instance
+        downloads (list): (local file path, Drive file metadata with id, name and size)
+
+    Returns:
+        bool: True if every file was downloaded
+    """
+    started = time.perf_counter()
+    # Start the big files first so one large file does not finish alone at the end
+    downloads = sorted(downloads, key=lambda download: int(download[1].get('size') or 0), reverse=True)
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+        futures = [(executor.submit(drive_service.download_file, file['id'],
+                                    os.path.dirname(local_file), os.path.basename(local_file),
+                                    metadata=file), local_file)
+                   for local_file, file in downloads]
+        failed = [local_file for future, local_file in futures if not future.result()]
+    for local_file in failed:
+        print(f"[ERROR] Failed to download {local_file}")
+
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(int(file.get('size') or 0) for _, file in downloads)
+    print(f"[INFO] Downloaded {len(downloads) - len(failed)}/{len(downloads)} files, "
+          f"{total_bytes / (1024 * 1024):.1f} MB in {elapsed:.1f}s "
+          f"({total_bytes / (1024 * 1024) / elapsed if elapsed else 0:.1f} MB/s)")
+    return not failed
+
+def plan_folder_download(drive_service, folder_ids, local_path, trees=None, folders=None):
+    """
+    List whole folder trees up front and plan where every file goes
+
+    The trees are walked breadth first, one batched parent query per level,
+    and the local directories are created.
+
+    Args:
+        trees (dict): Result of drive_service.list_trees(folder_ids, folders) if the
+            caller already listed them (optional, together with folders)
+        folders (dict): The folders filled in by that list_trees call
+
+    Returns:
+        list: (local file path, Drive file metadata) for every file
+    """
+    if trees is None:
+        folders = {}
+        trees = drive_service.list_trees(folder_ids, folders)
+    downloads = []
+    for folder_id, tree in trees.items():
+        for relative_dir in folders[folder_id]:
+            os.makedirs(os.path.join(local_path, *relative_dir.split('/')) if relative_dir else local_path,
+                        exist_ok=True)
+        downloads.extend((os.path.join(local_path, *relative_path.split('/')), file)
+                         for relative_path, file in tree)
+    return downloads
 
 def download_folder_recursive(drive_service, folder_id, local_path):
     """
     Recursively download a folder and all its contents
     
+    The whole tree is listed first (see plan_folder_download), then files
+    are downloaded concurrently with their names and sizes already known.
+
     Args:
         drive_service: GoogleDriveOAuthService instance
         folder_id (str): ID of the folder to download
@@ -24,98 +94,155 @@ def download_folder_recursive(drive_service, folder_id, local_path):
         bool: True if successful, False otherwise
     """
     try:
-        # Create local directory
-        os.makedirs(local_path, exist_ok=True)
-        
-        # Get all items in the folder
-        items = drive_service.search_files(f"'{folder_id}' in parents and trashed=false")
-        
-        for item in items:
-            item_path = os.path.join(local_path, item['name'])
-            
-            if item['mimeType'] == 'application/vnd.google-apps.folder':
-                # Recursively download subfolder
-                success = download_folder_recursive(drive_service, item['id'], item_path)
-                if not success:
-                    return False
-            else:
-                # Download file - ensure parent directory exists
-                os.makedirs(os.path.dirname(item_path), exist_ok=True)
-                success = drive_service.download_file(item['id'], os.path.dirname(item_path), item['name'])
-                if not success:
-                    return False
-        
-        return True
+        return download_files(drive_service, plan_folder_download(drive_service, [folder_id], local_path))
     except Exception as e:
         print(f"[ERROR] Failed to download folder {folder_id}: {e}")
         return False
 
-def download_user_data(user_id):
+def find_user_entries(drive_service, upload_folder_id, user_id):
+    """
+    Find the user's data in UploadGesture
+
+    Looks up "user_<id>" by exact name and parent first, which Drive answers
+    from its index no matter how many users there are. Only if that finds
+    nothing, names starting with "user_<id>" followed by a separator
+    (e.g. "user_<id>.csv") are matched.
+
+    Returns:
+        list: Matching folders/files
+    """
+    user_prefix = f"user_{user_id}"
+    entries = drive_service.search_all_files(
+        f"name='{user_prefix}' and '{upload_folder_id}' in parents and trashed=false")
+    if entries:
+        return entries
+    candidates = drive_service.search_all_files(
+        f"name contains '{user_prefix}' and '{upload_folder_id}' in parents and trashed=false")
+    return [entry for entry in candidates
+            if entry['name'].startswith(user_prefix) and entry['name'][len(user_prefix):][:1] in ('.', '_', '-', ' ')]
+
+def find_upload_folder(drive_service):
+    """
+    Returns: ID of the UploadGesture folder, or None if it does not exist
+    """
+    upload_folders = drive_service.search_files("name='UploadGesture' and mimeType='application/vnd.google-apps.folder' and trashed=false")
+    return upload_folders[0]['id'] if upload_folders else None
+
+def is_raw_gesture_csv(relative_path):
+    """
+    Check for raw_data/<gesture>/gesture_data_custom_*.csv, the files prepare_user_data merges
+    """
+    parts = relative_path.split('/')
+    return (len(parts) == 3 and parts[0] == 'raw_data'
+            and parts[2].startswith('gesture_data_custom_') and parts[2].endswith('.csv'))
+
+def fetch_user_csvs(user_id, spill_threshold=DEFAULT_SPILL_THRESHOLD, drive_service=None, user_entries=None,
+                    trees=None):
+    """
+    Fetch a user's raw gesture CSVs from UploadGesture without writing them to the user directory
+
+    Each file is downloaded into a SpooledTemporaryFile that stays in memory
+    up to spill_threshold bytes and moves to a temporary file beyond that.
+
+    Args:
+        user_id (str): User ID
+        spill_threshold (int): Bytes per file kept in memory
+        drive_service: GoogleDriveOAuthService instance (optional)
+        user_entries (list): The user's entries in UploadGesture, if already looked up (optional)
+        trees (dict): list_trees result for the user's folders, if already listed (optional)
+
+    Returns:
+        list: (relative path, file object at position 0) sorted by path; the caller closes them
+
+    Raises:
+        RuntimeError: If the user's data cannot be found or a download fails
+    """
+    drive_service = drive_service or get_drive_service()
+    started = time.perf_counter()
+    if user_entries is None:
+        upload_folder_id = find_upload_folder(drive_service)
+        if not upload_folder_id:
+            raise RuntimeError("UploadGesture folder not found!")
+        user_entries = find_user_entries(drive_service, upload_folder_id, user_id)
+    folder_ids = [entry['id'] for entry in user_entries
+                  if entry['mimeType'] == 'application/vnd.google-apps.folder']
+    if not folder_ids:
+        raise RuntimeError(f"No data folder found for user {user_id}")
+
+    if trees is None:
+        trees = drive_service.list_trees(folder_ids)
+    wanted = [(relative_path, file)
+              for tree in trees.values()
+              for relative_path, file in tree if is_raw_gesture_csv(relative_path)]
+
+    def fetch(file):
+        buffer = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+        if drive_service.download_file_to_memory(file['id'], buffer) is None:
+            buffer.close()
+            raise RuntimeError(f"Download of {file['name']} failed")
+        return buffer
+
+    fetched = []
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+            futures = [(relative_path, executor.submit(fetch, file)) for relative_path, file in wanted]
+            for relative_path, future in futures:
+                fetched.append((relative_path, future.result()))
+    except Exception:
+        for _, buffer in fetched:
+            buffer.close()
+        raise
+
+    total_bytes = sum(int(file.get('size') or 0) for _, file in wanted)
+    print(f"[INFO] Fetched {len(fetched)} CSV files ({total_bytes / (1024 * 1024):.1f} MB) into memory "
+          f"in {time.perf_counter() - started:.1f}s")
+    return sorted(fetched, key=lambda entry: entry[0])
+
+def download_user_data(user_id, workspace_root=None):
     """
     Download user data from Google Drive UploadGesture folder
 
     Args:
         user_id (str): User ID
+        workspace_root (str): Root of the user_<id> work directories (default: DEFAULT_WORKSPACE_ROOT)
     """
     try:
-        drive_service = GoogleDriveOAuthService()
+        drive_service = get_drive_service()
+        calls_before = drive_service.get_metrics()['calls']
 
         # Find UploadGesture folder
-        upload_folders = drive_service.search_files("name='UploadGesture' and mimeType='application/vnd.google-apps.folder' and trashed=false")
-        if not upload_folders:
+        upload_folder_id = find_upload_folder(drive_service)
+        if not upload_folder_id:
             print("[ERROR] UploadGesture folder not found!")
             return False
-        upload_folder_id = upload_folders[0]['id']
 
-        # Find user data file
-        user_files = drive_service.search_files(f"name contains '{user_id}' and '{upload_folder_id}' in parents and trashed=false")
-        if not user_files:
+        # Find the user's folder (or files) by name instead of listing every user
+        user_entries = find_user_entries(drive_service, upload_folder_id, user_id)
+        if not user_entries:
             print(f"[ERROR] No data files found for user {user_id}")
             return False
 
-        # User directory
-        user_dir = os.path.join("..", "..", "..", "hybrid_realtime_pipeline", "code", f"user_{user_id}")
-        os.makedirs(user_dir, exist_ok=True)
-
-        # Download all contents of user folder directly to user_dir
-        folder_files = drive_service.search_files(f"'{upload_folder_id}' in parents and trashed=false")
-        print(f"[DEBUG] Found {len(folder_files)} items in UploadGesture folder")
-        
-        for folder_file in folder_files:
-            print(f"[DEBUG] Processing item: {folder_file['name']} (type: {folder_file['mimeType']})")
-            if folder_file['name'].startswith(f'user_{user_id}'):
-                if folder_file['mimeType'] == 'application/vnd.google-apps.folder':
-                    # Download entire user folder contents directly to user_dir
-                    user_folder_id = folder_file['id']
-                    user_folder_files = drive_service.search_files(f"'{user_folder_id}' in parents and trashed=false")
-                    
-                    for item in user_folder_files:
-                        if item['mimeType'] == 'application/vnd.google-apps.folder':
-                            # Download subfolder
-                            subfolder_path = os.path.join(user_dir, item['name'])
-                            success = download_folder_recursive(drive_service, item['id'], subfolder_path)
-                            if success:
-                                print(f"[SUCCESS] Downloaded folder {item['name']}")
-                            else:
-                                print(f"[ERROR] Failed to download folder {item['name']}")
-                                return False
-                        else:
-                            # Download file directly to user_dir
-                            success = drive_service.download_file(item['id'], user_dir, item['name'])
-                            if success:
-                                print(f"[SUCCESS] Downloaded {item['name']}")
-                            else:
-                                print(f"[ERROR] Failed to download {item['name']}")
-                                return False
-                else:
-                    # If user data is a file, download directly
-                    success = drive_service.download_file(folder_file['id'], user_dir, folder_file['name'])
-                    if success:
-                        print(f"[SUCCESS] Downloaded {folder_file['name']}")
-                    else:
-                        print(f"[ERROR] Failed to download {folder_file['name']}")
-                        return False
+        folder_ids = [entry['id'] for entry in user_entries
+                      if entry['mimeType'] == 'application/vnd.google-apps.folder']
+        folders = {}
+        trees = drive_service.list_trees(folder_ids, folders) if folder_ids else {}
+        expected = sum(int(file.get('size') or 0) for tree in trees.values() for _, file in tree)
+        expected += sum(int(entry.get('size') or 0) for entry in user_entries
+                        if entry['mimeType'] != 'application/vnd.google-apps.folder')
+
+        # User directory, allocated in the shared workspace root (checks the quota)
+        user_dir = WorkspaceManager(workspace_root).allocate(user_id, expected)
+
+        # Folder contents go directly to user_dir, single files next to them
+        downloads = plan_folder_download(drive_service, folder_ids, user_dir, trees, folders) if folder_ids else []
+        downloads += [(os.path.join(user_dir, entry['name']), entry)
+                      for entry in user_entries if entry['mimeType'] != 'application/vnd.google-apps.folder']
+        print(f"[INFO] Found {len(downloads)} files for user {user_id}")
+        if not download_files(drive_service, downloads):
+            return False
 
+        metrics = drive_service.get_metrics()
+        print(f"[INFO] Drive round trips: {metrics['calls'] - calls_before}")
         print(f"[SUCCESS] Downloaded all data for user {user_id}")
         return True
 
@@ -126,7 +253,10 @@ def download_user_data(user_id):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Download user data from Google Drive')
     parser.add_argument('--user-id', required=True, help='User ID')
+    parser.add_argument('--workspace-root',
+                        help='Root of the user_<id> work directories (default: $GESTURE_WORKSPACE_ROOT or '
+                             'hybrid_realtime_pipeline/code)')
     args = parser.parse_args()
 
-    success = download_user_data(args.user_id)
+    success = download_user_data(args.user_id, args.workspace_root)
     sys.exit(0 if success else 1)
\ No newline at end of file
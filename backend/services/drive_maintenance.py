@@ -0,0 +1,148 @@
+"""
+Plan/execute engine for bulk Drive maintenance
+
+Maintenance scripts (reset_gesture_sets.py, cleanup_duplicates.py) work in
+two steps:
+    1. plan: read the gesture set state with one listing pass and record
+       every move and delete that is needed (no writes)
+    2. execute: send all actions as batched Drive requests, several batches
+       in parallel, or only print the plan with --dry-run
+
+Moves use the parents already known from the listing, so they take a single
+update request each instead of a get followed by an update.
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google_drive_oauth_service import LISTING_FIELDS, MAX_BATCH_SIZE
+
+# Batches sent at the same time (each holds up to MAX_BATCH_SIZE requests)
+MAX_PARALLEL_BATCHES = 4
+
+def list_gesture_set_state(service):
+    """
+    Read GestureSets and ActiveSet with one listing query
+
+    Args:
+        service: GestureSetDriveService
+
+    Returns:
+        dict: Base folder IDs and the children of both folders
+              ('gesture_sets', 'active_set'), plus 'list_ms'
+    """
+    started = time.perf_counter()
+    folders = service.ensure_base_folders()
+    if not folders:
+        raise RuntimeError("Could not resolve the GestureSets/ActiveSet folders")
+    children = service.drive_service.list_children(
+        [folders['gesture_sets_id'], folders['active_set_id']], fields=f"{LISTING_FIELDS}, properties")
+    return {
+        'gesture_sets_id': folders['gesture_sets_id'],
+        'active_set_id': folders['active_set_id'],
+        'gesture_sets': children[folders['gesture_sets_id']],
+        'active_set': children[folders['active_set_id']],
+        'list_ms': round((time.perf_counter() - started) * 1000)
+    }
+
+class MaintenancePlan:
+    """
+    Ordered list of Drive actions computed from a listing
+
+    Moves run before deletes, so a plan may move items out of a folder and
+    then delete the folder.
+    """
+
+    def __init__(self):
+        self.moves = []
+        self.deletes = []
+
+    def move(self, file, new_parent_id, reason=''):
+        """
+        Plan moving a file (metadata from the listing, including 'parents')
+        """
+        self.moves.append({'file': file, 'new_parent_id': new_parent_id, 'reason': reason})
+
+    def delete(self, file, reason=''):
+        """
+        Plan permanently deleting a file or folder
+        """
+        self.deletes.append({'file': file, 'reason': reason})
+
+    def is_empty(self):
+        return not (self.moves or self.deletes)
+
+    def describe(self):
+        """
+        Returns: list of human readable lines, one per action
+        """
+        lines = [f"move   {action['file']['name']} ({action['file']['id']})"
+                 f"{' - ' + action['reason'] if action['reason'] else ''}" for action in self.moves]
+        lines += [f"delete {action['file']['name']} ({action['file']['id']})"
+                  f"{' - ' + action['reason'] if action['reason'] else ''}" for action in self.deletes]
+        return lines
+
+def _run_batches(drive_service, requests, operation):
+    chunks = [requests[i:i + MAX_BATCH_SIZE] for i in range(0, len(requests), MAX_BATCH_SIZE)]
+    if len(chunks) <= 1:
+        return drive_service.execute_batch(requests, operation) if requests else []
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_BATCHES, len(chunks))) as executor:
+        results = executor.map(lambda chunk: drive_service.execute_batch(chunk, operation), chunks)
+        return [result for chunk_results in results for result in chunk_results]
+
+def execute_plan(drive_service, plan, dry_run=False):
+    """
+    Execute a maintenance plan with batched requests
+
+    Args:
+        drive_service: GoogleDriveOAuthService
+        plan (MaintenancePlan): Actions to run
+        dry_run (bool): Only report what would be done
+
+    Returns:
+        dict: Counts of moved/deleted items, failures and 'execute_ms'
+    """
+    report = {'dry_run': dry_run, 'planned_moves': len(plan.moves), 'planned_deletes': len(plan.deletes),
+              'moved': 0, 'deleted': 0, 'failures': [], 'execute_ms': 0}
+    if dry_run or plan.is_empty():
+        return report
+
+    started = time.perf_counter()
+    files = drive_service.service.files()
+    move_requests = [files.update(
+        fileId=action['file']['id'],
+        addParents=action['new_parent_id'],
+        removeParents=','.join(action['file'].get('parents', [])),
+        fields='id, parents'
+    ) for action in plan.moves]
+    for action, result in zip(plan.moves, _run_batches(drive_service, move_requests, 'write')):
+        if isinstance(result, Exception):
+            report['failures'].append({'action': 'move', 'id': action['file']['id'], 'error': str(result)})
+        else:
+            report['moved'] += 1
+
+    delete_requests = [files.delete(fileId=action['file']['id']) for action in plan.deletes]
+    for action, result in zip(plan.deletes, _run_batches(drive_service, delete_requests, 'delete')):
+        if isinstance(result, Exception):
+            report['failures'].append({'action': 'delete', 'id': action['file']['id'], 'error': str(result)})
+        else:
+            report['deleted'] += 1
+
+    report['execute_ms'] = round((time.perf_counter() - started) * 1000)
+    return report
+
+def print_summary(state, plan, report, started):
+    """
+    Print the plan, its outcome and a timing summary
+    """
+    for line in plan.describe():
+        print(f"  {'[dry-run] ' if report['dry_run'] else ''}{line}")
+    for failure in report['failures']:
+        print(f"  ❌ {failure['action']} {failure['id']} failed: {failure['error']}", file=sys.stderr)
+    if report['dry_run']:
+        print(f"\n📝 Dry run: {report['planned_moves']} moves and {report['planned_deletes']} deletes planned")
+    else:
+        print(f"\n📝 {report['moved']}/{report['planned_moves']} moved, "
+              f"{report['deleted']}/{report['planned_deletes']} deleted, {len(report['failures'])} failed")
+    total_ms = round((time.perf_counter() - started) * 1000)
+    print(f"⏱️  list {state['list_ms']} ms, execute {report['execute_ms']} ms, total {total_ms} ms")
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of the gesture related Google Drive folders
+Keeps GestureSets, ActiveSet, UploadGesture and CustomGesture metadata in sync
+through the Drive Changes API so listings, counts and existence checks can be
+answered locally.
+Usage: python drive_metadata_mirror.py <sync|resync|status>
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google_drive_oauth_service import get_drive_service
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+MIRRORED_ROOTS = ['GestureSets', 'ActiveSet', 'UploadGesture', 'CustomGesture']
+FILE_FIELDS = 'id, name, mimeType, size, md5Checksum, modifiedTime, parents, trashed, properties'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    size INTEGER,
+    md5 TEXT,
+    modified_time TEXT,
+    parent_id TEXT,
+    properties TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_parent_name ON files (parent_id, name);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files (name);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class DriveMetadataMirror:
+    def __init__(self, drive_service, db_file=None, roots=None):
+        """
+        Initialize the metadata mirror
+
+        Args:
+            drive_service: GoogleDriveOAuthService instance
+            db_file (str): Path to the SQLite database (optional)
+            roots (list): Names of the top level folders to mirror (optional)
+        """
+        if db_file is None:
+            db_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drive_mirror.db')
+
+        self.drive_service = drive_service
+        self.db_file = db_file
+        self.roots = roots or MIRRORED_ROOTS
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(files)")}
+        if 'properties' not in columns:
+            # Mirrors created before folder properties were stored: the next sync resyncs
+            with self._conn:
+                self._conn.execute("ALTER TABLE files ADD COLUMN properties TEXT")
+                self._conn.execute("DELETE FROM meta WHERE key = 'page_token'")
+
+    # ------------------------------------------------------------------
+    # Synchronisation
+    # ------------------------------------------------------------------
+
+    def resync(self):
+        """
+        Rebuild the mirror from scratch with a full walk of the mirrored roots
+
+        Returns:
+            int: Number of items stored in the mirror
+        """
+        started = time.time()
+
+        # Take the start token before walking so no change made during the walk is lost
+        page_token = self.drive_service.execute(self.drive_service.service.changes().getStartPageToken())['startPageToken']
+
+        items = []
+        root_ids = {}
+        for root_name in self.roots:
+            root = self._find_remote_root(root_name)
+            if root:
+                root_ids[root_name] = root['id']
+                items.append(root)
+        items.extend(self._walk_remote(list(root_ids.values())))
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files")
+            for item in items:
+                self._upsert(item)
+            self._set_meta('page_token', page_token)
+            self._set_meta('root_ids', json.dumps(root_ids))
+            self._set_meta('last_sync', str(time.time()))
+            self._set_meta('last_resync', str(time.time()))
+
+        print(f"[MIRROR] Full resync stored {len(items)} items in {time.time() - started:.2f}s")
+        return len(items)
+
+    def sync(self):
+        """
+        Apply pending Drive changes since the saved page token
+
+        Falls back to a full resync when no page token has been saved yet.
+
+        Returns:
+            int: Number of changes applied to the mirror
+        """
+        page_token = self._get_meta('page_token')
+        if not page_token:
+            print("[MIRROR] No saved page token, running full resync")
+            self.resync()
+            return 0
+
+        started = time.time()
+        changes = []
+        new_start_token = None
+        while page_token:
+            response = self.drive_service.execute(self.drive_service.service.changes().list(
+                pageToken=page_token,
+                pageSize=1000,
+                spaces='drive',
+                includeRemoved=True,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))"
+            ))
+            changes.extend(response.get('changes', []))
+            page_token = response.get('nextPageToken')
+            new_start_token = response.get('newStartPageToken', new_start_token)
+
+        with self._lock, self._conn:
+            applied = self._apply_changes(changes)
+            if new_start_token:
+                self._set_meta('page_token', new_start_token)
+            self._set_meta('last_sync', str(time.time()))
+
+        print(f"[MIRROR] Applied {applied}/{len(changes)} changes in {time.time() - started:.2f}s")
+        return applied
+
+    def sync_if_stale(self, max_staleness, force=False):
+        """
+        Sync the mirror when it is older than max_staleness seconds or was never synced
+
+        Args:
+            max_staleness (float): Mirror age in seconds that triggers a sync
+            force (bool): Sync regardless of the age
+
+        Returns:
+            float: Seconds since the last sync after the check
+        """
+        staleness = self.staleness()
+        if force or staleness is None or staleness > max_staleness:
+            self.sync()
+            staleness = self.staleness()
+        return staleness
+
+    def _apply_changes(self, changes):
+        """
+        Apply a list of Changes API entries to the local tables
+
+        Folders can show up after their children in the same change list, so
+        entries are retried until no further entry can be attached to the tree.
+        """
+        # Only the latest change per item matters
+        latest = {}
+        for change in changes:
+            latest.pop(change['fileId'], None)
+            latest[change['fileId']] = change
+
+        applied = 0
+        pending = []
+        for change in latest.values():
+            file = change.get('file') or {}
+            if change.get('removed') or file.get('trashed'):
+                if self._get_row(change['fileId']):
+                    self._delete_subtree(change['fileId'])
+                    applied += 1
+            else:
+                pending.append(file)
+
+        progress = True
+        while pending and progress:
+            progress = False
+            remaining = []
+            for file in pending:
+                parent_id = (file.get('parents') or [None])[0]
+                is_root = self._is_root(file['id'])
+                if is_root or (parent_id and self._get_row(parent_id)):
+                    is_new = self._get_row(file['id']) is None
+                    self._upsert(file)
+                    if is_new and not is_root and file['mimeType'] == FOLDER_MIME_TYPE:
+                        # Folder moved into the mirrored tree: pull in what it already contains
+                        for item in self._walk_remote([file['id']]):
+                            self._upsert(item)
+                    applied += 1
+                    progress = True
+                else:
+                    remaining.append(file)
+            pending = remaining
+
+        # Still pending: outside the mirrored tree, drop it if it used to be inside
+        for file in pending:
+            if self._get_row(file['id']):
+                self._delete_subtree(file['id'])
+                applied += 1
+
+        return applied
+
+    def _find_remote_root(self, root_name):
+        results = self.drive_service.execute(self.drive_service.service.files().list(
+            q=f"name='{root_name}' and mimeType='{FOLDER_MIME_TYPE}' and trashed=false",
+            pageSize=1,
+            fields=f"files({FILE_FIELDS})"
+        ))
+        files = results.get('files', [])
+        return files[0] if files else None
+
+    def _walk_remote(self, folder_ids):
+        """
+        Breadth-first listing of everything below the given folders
+
+        Each level is fetched with batched parent queries instead of one query per folder.
+        """
+        items = []
+        level = list(folder_ids)
+        while level:
+            children = self.drive_service.list_children(level, fields=FILE_FIELDS)
+            level = []
+            for files in children.values():
+                for item in files:
+                    items.append(item)
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        level.append(item['id'])
+        return items
+
+    # ------------------------------------------------------------------
+    # Local queries
+    # ------------------------------------------------------------------
+
+    def get_root_id(self, root_name):
+        """
+        Get the Drive ID of a mirrored root folder (e.g. 'GestureSets')
+        """
+        root_ids = json.loads(self._get_meta('root_ids') or '{}')
+        return root_ids.get(root_name)
+
+    def get_file(self, file_id):
+        """
+        Get a mirrored item by ID
+
+        Returns:
+            dict: Item metadata in Drive API shape, None if not mirrored
+        """
+        with self._lock:
+            row = self._get_row(file_id)
+        return self._row_to_file(row) if row else None
+
+    def list_children(self, folder_id, folders_only=False):
+        """
+        List the direct children of a mirrored folder
+
+        Args:
+            folder_id (str): Parent folder ID
+            folders_only (bool): Only return subfolders
+
+        Returns:
+            list: Items in Drive API shape
+        """
+        query = "SELECT * FROM files WHERE parent_id = ?"
+        params = [folder_id]
+        if folders_only:
+            query += " AND mime_type = ?"
+            params.append(FOLDER_MIME_TYPE)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY name", params).fetchall()
+        return [self._row_to_file(row) for row in rows]
+
+    def find_folder(self, folder_name, parent_id=None):
+        """
+        Find a mirrored folder by exact name, optionally under a given parent
+        """
+        query = "SELECT * FROM files WHERE name = ? AND mime_type = ?"
+        params = [folder_name, FOLDER_MIME_TYPE]
+        if parent_id:
+            query += " AND parent_id = ?"
+            params.append(parent_id)
+        with self._lock:
+            row = self._conn.execute(query + " LIMIT 1", params).fetchone()
+        return self._row_to_file(row) if row else None
+
+    def count_children(self, folder_id, name_patterns=('.pkl', '.json')):
+        """
+        Count files in a folder whose name contains any of the given patterns
+        """
+        clause = " OR ".join("instr(name, ?) > 0" for _ in name_patterns)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COUNT(*) FROM files WHERE parent_id = ? AND mime_type != ? AND ({clause})",
+                [folder_id, FOLDER_MIME_TYPE, *name_patterns]
+            ).fetchone()
+        return row[0]
+
+    def exists(self, name, parent_id=None):
+        """
+        Check whether an item with the given name exists (optionally under a parent)
+        """
+        query = "SELECT 1 FROM files WHERE name = ?"
+        params = [name]
+        if parent_id:
+            query += " AND parent_id = ?"
+            params.append(parent_id)
+        with self._lock:
+            return self._conn.execute(query + " LIMIT 1", params).fetchone() is not None
+
+    def staleness(self):
+        """
+        Seconds since the mirror was last synchronised, None if never synced
+        """
+        last_sync = self._get_meta('last_sync')
+        return time.time() - float(last_sync) if last_sync else None
+
+    def status(self):
+        """
+        Summary of the mirror state for reporting
+        """
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            folders = self._conn.execute(
+                "SELECT COUNT(*) FROM files WHERE mime_type = ?", [FOLDER_MIME_TYPE]
+            ).fetchone()[0]
+        staleness = self.staleness()
+        last_resync = self._get_meta('last_resync')
+        return {
+            'db_file': self.db_file,
+            'items': total,
+            'folders': folders,
+            'roots': json.loads(self._get_meta('root_ids') or '{}'),
+            'has_page_token': bool(self._get_meta('page_token')),
+            'staleness_seconds': round(staleness, 1) if staleness is not None else None,
+            'last_resync': float(last_resync) if last_resync else None
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------------
+
+    def _is_root(self, file_id):
+        return file_id in json.loads(self._get_meta('root_ids') or '{}').values()
+
+    def _get_row(self, file_id):
+        return self._conn.execute("SELECT * FROM files WHERE id = ?", [file_id]).fetchone()
+
+    def _upsert(self, file):
+        # Drive items have a single parent since the 2020 single-parent model
+        parent_id = (file.get('parents') or [None])[0]
+        size = file.get('size')
+        properties = file.get('properties')
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (id, name, mime_type, size, md5, modified_time, parent_id, properties) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [file['id'], file['name'], file['mimeType'], int(size) if size is not None else None,
+             file.get('md5Checksum'), file.get('modifiedTime'), parent_id,
+             json.dumps(properties) if properties else None]
+        )
+
+    def _delete_subtree(self, file_id):
+        to_delete = [file_id]
+        while to_delete:
+            current = to_delete.pop()
+            children = self._conn.execute("SELECT id FROM files WHERE parent_id = ?", [current]).fetchall()
+            to_delete.extend(child['id'] for child in children)
+            self._conn.execute("DELETE FROM files WHERE id = ?", [current])
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", [key]).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [key, value])
+
+    @staticmethod
+    def _row_to_file(row):
+        file = {
+            'id': row['id'],
+            'name': row['name'],
+            'mimeType': row['mime_type'],
+            'modifiedTime': row['modified_time'],
+            'parents': [row['parent_id']] if row['parent_id'] else []
+        }
+        if row['size'] is not None:
+            file['size'] = str(row['size'])
+        if row['md5']:
+            file['md5Checksum'] = row['md5']
+        if row['properties']:
+            file['properties'] = json.loads(row['properties'])
+        return file
+
+
+def open_mirror(db_file=None):
+    """
+    Create a mirror backed by the service credentials next to this script
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    drive_service = get_drive_service(
+        credentials_file=os.path.join(current_dir, 'credentials.json'),
+        token_file=os.path.join(current_dir, 'token.json')
+    )
+    return DriveMetadataMirror(drive_service, db_file=db_file)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('sync', 'resync', 'status'):
+        print("Usage: python drive_metadata_mirror.py <sync|resync|status>")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    mirror = open_mirror()
+    try:
+        if command == 'resync':
+            mirror.resync()
+        elif command == 'sync':
+            mirror.sync()
+        print(json.dumps(mirror.status()))
+    finally:
+        mirror.close()
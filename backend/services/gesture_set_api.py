@@ -2,101 +2,421 @@
 """
 API script to interact with GestureSetDriveService
 Usage: python gesture_set_api.py <command> [args...]
+       python gesture_set_api.py publish_gesture_set <id> <name> [--by-reference | --incremental] [--version <label>]
+       python gesture_set_api.py serve [--socket [PATH]] [--workers N] [--maintenance-interval SECONDS] [--mirror]
+       python gesture_set_api.py get_manifest <id> | write_manifest <id> [--version <label>]
+       python gesture_set_api.py diff_gesture_sets <old_id> <new_id> | refresh_manifests | cleanup_duplicates
+       python gesture_set_api.py sync_active_set [<store_dir>]
+       python gesture_set_api.py cache_stats | invalidate_cache   (running daemon only)
+
+In serve mode the script stays running with a warm GestureSetDriveService and
+answers newline-delimited JSON-RPC 2.0 requests, e.g.
+    {"jsonrpc": "2.0", "id": 1, "method": "list_gesture_sets", "params": {}}
+over stdin/stdout, or over a Unix socket with --socket. One-shot commands
+are forwarded to a running socket daemon when there is one and run
+in-process otherwise.
 """
 
 import sys
 import json
 import os
+import socket
+import stat
+import time
+import threading
+import contextlib
+import inspect
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
 from gesture_set_drive_service import GestureSetDriveService
 
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_NAME = 'gesture_set_api.sock'
+
+def _default_socket_dir():
+    """
+    Directory only the current user can enter
+
+    $XDG_RUNTIME_DIR is per user with mode 0700; otherwise a 0700 directory
+    next to token.json, whose Drive credentials the daemon acts with.
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return runtime_dir
+    return os.path.join(SERVICES_DIR, '.gesture_set_api')
+
+DEFAULT_SOCKET_PATH = os.environ.get('GESTURE_SET_API_SOCKET') or os.path.join(_default_socket_dir(), SOCKET_NAME)
+DEFAULT_WORKERS = 4
+DAEMON_CONNECT_TIMEOUT = 0.5
+# Seconds between duplicate cleanup passes of a running server (0 disables)
+DEFAULT_MAINTENANCE_INTERVAL = 15 * 60
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service(background_cleanup=False, use_mirror=None):
+    """
+    Get the process-wide GestureSetDriveService, creating it on first use
+
+    Args:
+        background_cleanup (bool): Used when the service is created; see GestureSetDriveService
+        use_mirror (bool): Used when the service is created; see GestureSetDriveService
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = GestureSetDriveService(background_cleanup=background_cleanup, use_mirror=use_mirror)
+        return _service
+
+def _handle_list_gesture_sets(service):
+    return service.list_gesture_sets()
+
+def _handle_get_active_set(service):
+    return service.get_current_active_set()
+
+def _handle_publish_gesture_set(service, gesture_set_id, gesture_set_name, mode='copy', version=None):
+    result = service.publish_gesture_set(gesture_set_id, gesture_set_name, mode, version)
+
+    # Add gesture count to result
+    if result['success']:
+        try:
+            # Get gesture count of newly active set
+            active_set = service.get_current_active_set()
+            result['gesture_count'] = active_set['gesture_count'] if active_set else 0
+        except Exception:
+            result['gesture_count'] = 0
+    return result
+
+def _handle_ensure_folders(service):
+    return service.ensure_base_folders()
+
+def _handle_invalidate_cache(service, keys=None):
+    service.invalidate_cache(*(keys or []))
+    return {'success': True}
+
+def _handle_cache_stats(service):
+    return service.cache_stats()
+
+def _handle_cleanup_duplicates(service):
+    return service.cleanup_duplicates()
+
+def _handle_get_manifest(service, gesture_set_id):
+    return service.get_manifest(gesture_set_id)
+
+def _handle_write_manifest(service, gesture_set_id, model_version=None):
+    return service.write_manifest(gesture_set_id, model_version)
+
+def _handle_refresh_manifests(service):
+    return service.refresh_manifests()
+
+def _handle_diff_gesture_sets(service, old_set_id, new_set_id):
+    return service.diff_gesture_sets(old_set_id, new_set_id)
+
+def _handle_sync_active_set(service, store_root=None, keep_versions=3):
+    return service.sync_active_set(store_root, keep_versions)
+
+COMMANDS = {
+    'list_gesture_sets': _handle_list_gesture_sets,
+    'get_active_set': _handle_get_active_set,
+    'publish_gesture_set': _handle_publish_gesture_set,
+    'ensure_folders': _handle_ensure_folders,
+    'invalidate_cache': _handle_invalidate_cache,
+    'cache_stats': _handle_cache_stats,
+    'cleanup_duplicates': _handle_cleanup_duplicates,
+    'get_manifest': _handle_get_manifest,
+    'write_manifest': _handle_write_manifest,
+    'refresh_manifests': _handle_refresh_manifests,
+    'diff_gesture_sets': _handle_diff_gesture_sets,
+    'sync_active_set': _handle_sync_active_set
+}
+
+def run_command(method, params=None):
+    """
+    Run a command against the warm in-process service
+
+    Args:
+        method (str): Command name (key of COMMANDS)
+        params (dict): Keyword arguments of the command
+
+    Returns:
+        Command result (JSON serialisable)
+    """
+    return COMMANDS[method](get_service(), **(params or {}))
+
+# ----------------------------------------------------------------------
+# JSON-RPC server
+# ----------------------------------------------------------------------
+
+def _rpc_error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+def _accepts_params(method, params):
+    try:
+        inspect.signature(COMMANDS[method]).bind(None, **params)
+        return True
+    except TypeError:
+        return False
+
+def handle_rpc_line(line):
+    """
+    Handle one JSON-RPC request line
+
+    Returns:
+        dict: JSON-RPC response, None for notifications (requests without id)
+    """
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return _rpc_error(None, PARSE_ERROR, f'Parse error: {e}')
+
+    if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+        return _rpc_error(request.get('id') if isinstance(request, dict) else None,
+                          INVALID_REQUEST, 'Invalid request')
+
+    request_id = request.get('id')
+    method = request['method']
+    params = request.get('params') or {}
+
+    if method not in COMMANDS:
+        response = _rpc_error(request_id, METHOD_NOT_FOUND, f'Unknown command: {method}')
+    elif not isinstance(params, dict):
+        response = _rpc_error(request_id, INVALID_PARAMS, 'params must be an object')
+    elif not _accepts_params(method, params):
+        response = _rpc_error(request_id, INVALID_PARAMS, f'Invalid params for {method}: {sorted(params)}')
+    else:
+        try:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': run_command(method, params)}
+        except Exception as e:
+            print(f"[ERROR] {method} failed: {e}", file=sys.stderr)
+            response = _rpc_error(request_id, INTERNAL_ERROR, str(e))
+
+    return response if 'id' in request else None
+
+def serve_stream(rfile, wfile, executor):
+    """
+    Serve newline-delimited JSON-RPC requests from rfile, answering on wfile
+
+    Requests run concurrently on the executor; responses are written as they
+    complete, so clients must match them by id.
+    """
+    write_lock = threading.Lock()
+    pending = []
+
+    def respond(line):
+        response = handle_rpc_line(line)
+        if response is not None:
+            with write_lock:
+                wfile.write(json.dumps(response) + '\n')
+                wfile.flush()
+
+    for line in rfile:
+        if line.strip():
+            pending.append(executor.submit(respond, line))
+    for future in pending:
+        future.result()
+
+def _maintenance_loop(interval):
+    """Periodically delete duplicate gesture sets and refresh manifests off the request path"""
+    while True:
+        time.sleep(interval)
+        try:
+            result = get_service().cleanup_duplicates()
+            if result['deleted']:
+                print(f"[CLEANUP] Maintenance removed {result['deleted']} duplicate gesture sets", file=sys.stderr)
+            result = get_service().refresh_manifests()
+            if result['written']:
+                print(f"[INFO] Maintenance wrote {result['written']} gesture set manifests", file=sys.stderr)
+        except Exception as e:
+            print(f"[ERROR] Maintenance pass failed: {e}", file=sys.stderr)
+
+def serve(socket_path=None, workers=DEFAULT_WORKERS, maintenance_interval=DEFAULT_MAINTENANCE_INTERVAL,
+          use_mirror=None):
+    """
+    Run the long-lived JSON-RPC server
+
+    Args:
+        socket_path (str): Unix socket to listen on (None serves stdin/stdout)
+        workers (int): Number of requests handled concurrently
+        maintenance_interval (int): Seconds between duplicate cleanup passes (0 disables)
+        use_mirror (bool): List gesture sets from the local metadata mirror
+            (default: $GESTURE_SET_USE_MIRROR)
+    """
+    # Library code prints progress to stdout; keep the protocol stream clean
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    # Warm up: credentials, Drive client and base folder IDs. The server
+    # outlives its requests, so duplicates can be deleted in the background.
+    get_service(background_cleanup=True, use_mirror=use_mirror).ensure_base_folders()
+    print("[INFO] gesture_set_api server ready", file=sys.stderr)
+    if maintenance_interval:
+        threading.Thread(target=_maintenance_loop, args=(maintenance_interval,),
+                         name='gesture-set-maintenance', daemon=True).start()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if socket_path is None:
+            serve_stream(sys.stdin, protocol_out, executor)
+            return
+        _serve_unix_socket(socket_path, executor)
+
+def _serve_unix_socket(socket_path, executor):
+    if not hasattr(socket, 'AF_UNIX'):
+        raise RuntimeError('Unix sockets are not supported on this platform, use stdin/stdout mode')
+
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, mode=0o700)
+    if os.path.lexists(socket_path):
+        if not _is_own_socket(socket_path):
+            raise RuntimeError(f'{socket_path} exists and is not a socket owned by this user')
+        if _connect_daemon(socket_path):
+            raise RuntimeError(f'A server is already listening on {socket_path}')
+        os.unlink(socket_path)  # stale socket from a crashed server
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only the current user may connect
+    previous_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(previous_umask)
+    server.listen()
+    print(f"[INFO] Listening on {socket_path}", file=sys.stderr)
+
+    def handle_connection(conn):
+        with conn, conn.makefile('r', encoding='utf-8') as rfile, conn.makefile('w', encoding='utf-8') as wfile:
+            serve_stream(rfile, wfile, executor)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle_connection, args=(conn,), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        with contextlib.suppress(OSError):
+            os.unlink(socket_path)
+
+# ----------------------------------------------------------------------
+# One-shot CLI (thin client)
+# ----------------------------------------------------------------------
+
+def _is_own_socket(socket_path):
+    """
+    Check that socket_path is a socket created by the current user
+
+    Another local user could otherwise bind the path first, answer with
+    forged results or capture publish/reset commands.
+    """
+    try:
+        info = os.lstat(socket_path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and (not hasattr(os, 'getuid') or info.st_uid == os.getuid())
+
+def _connect_daemon(socket_path):
+    if not hasattr(socket, 'AF_UNIX') or not os.path.lexists(socket_path):
+        return None
+    if not _is_own_socket(socket_path):
+        print(f"[WARNING] Ignoring {socket_path}: not a socket owned by this user", file=sys.stderr)
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(DAEMON_CONNECT_TIMEOUT)
+    try:
+        conn.connect(socket_path)
+    except OSError:
+        conn.close()
+        return None
+    conn.settimeout(None)
+    return conn
+
+def _call_daemon(conn, method, params):
+    with conn, conn.makefile('r', encoding='utf-8') as rfile:
+        request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+        conn.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        conn.shutdown(socket.SHUT_WR)
+        response = json.loads(rfile.readline())
+    if 'error' in response:
+        raise RuntimeError(response['error']['message'])
+    return response['result']
+
+def notify_daemon(method, params=None, socket_path=DEFAULT_SOCKET_PATH):
+    """
+    Send a command to the socket daemon only if one is running
+
+    Used by scripts that change Drive behind the daemon's back (e.g.
+    reset_gesture_sets.py sends invalidate_cache).
+
+    Returns:
+        Command result, or None when no daemon is running
+    """
+    conn = _connect_daemon(socket_path)
+    if conn is None:
+        return None
+    return _call_daemon(conn, method, params)
+
+def call_command(method, params=None, socket_path=DEFAULT_SOCKET_PATH):
+    """
+    Run a command on the socket daemon if one is running, in-process otherwise
+
+    Returns:
+        Command result (JSON serialisable)
+    """
+    conn = _connect_daemon(socket_path)
+    if conn is not None:
+        return _call_daemon(conn, method, params)
+
+    # Keep stdout for the JSON result only
+    with contextlib.redirect_stdout(sys.stderr):
+        return run_command(method, params)
+
 def list_gesture_sets():
     """List all available gesture sets"""
     try:
-        import sys
-        import io
-        import os
-        
-        # Suppress all output during execution
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-        
-        # Redirect both stdout and stderr to devnull
-        devnull = open(os.devnull, 'w')
-        sys.stdout = devnull
-        sys.stderr = devnull
-        
-        try:
-            service = GestureSetDriveService()
-            gesture_sets = service.list_gesture_sets()
-        finally:
-            # Always restore stdout and stderr
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
-            devnull.close()
-        
-        # Print only the JSON result
-        print(json.dumps(gesture_sets))
-        
+        print(json.dumps(call_command('list_gesture_sets')))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
 
 def get_current_active_set():
     """Get current active gesture set"""
     try:
-        service = GestureSetDriveService()
-        active_set = service.get_current_active_set()
-        print(json.dumps(active_set))
+        print(json.dumps(call_command('get_active_set')))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
 
-def publish_gesture_set(gesture_set_id, gesture_set_name):
+def publish_gesture_set(gesture_set_id, gesture_set_name, mode='copy', version=None):
     """Publish a gesture set"""
     try:
-        import sys
-        import io
-        import os
-        
-        # Suppress all output during execution
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-        
-        # Redirect both stdout and stderr to devnull
-        devnull = open(os.devnull, 'w')
-        sys.stdout = devnull
-        sys.stderr = devnull
-        
-        try:
-            service = GestureSetDriveService()
-            result = service.publish_gesture_set(gesture_set_id, gesture_set_name)
-            
-            # Add gesture count to result
-            if result['success']:
-                try:
-                    # Get gesture count of newly active set
-                    active_set = service.get_current_active_set()
-                    result['gesture_count'] = active_set['gesture_count'] if active_set else 0
-                except:
-                    result['gesture_count'] = 0
-        finally:
-            # Always restore stdout and stderr
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
-            devnull.close()
-        
-        # Print only the JSON result
-        print(json.dumps(result))
-        
+        params = {
+            'gesture_set_id': gesture_set_id,
+            'gesture_set_name': gesture_set_name,
+            'mode': mode,
+            'version': version
+        }
+        print(json.dumps(call_command('publish_gesture_set', params)))
     except Exception as e:
         print(json.dumps({'success': False, 'error': str(e)}))
 
 def ensure_base_folders():
     """Ensure base folders exist"""
     try:
-        service = GestureSetDriveService()
-        folders = service.ensure_base_folders()
-        print(json.dumps(folders))
+        print(json.dumps(call_command('ensure_folders')))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+
+def run_and_print(method, params=None):
+    """Run any command and print its result as JSON"""
+    try:
+        print(json.dumps(call_command(method, params)))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
 
@@ -104,9 +424,9 @@ if __name__ == "__main__":
     if len(sys.argv) < 2:
         print(json.dumps({'error': 'No command specified'}))
         sys.exit(1)
-    
+
     command = sys.argv[1]
-    
+
     if command == 'list_gesture_sets':
         list_gesture_sets()
     elif command == 'get_active_set':
@@ -115,9 +435,42 @@ if __name__ == "__main__":
         if len(sys.argv) < 4:
             print(json.dumps({'success': False, 'error': 'Missing arguments: gesture_set_id and gesture_set_name'}))
         else:
-            publish_gesture_set(sys.argv[2], sys.argv[3])
+            options = sys.argv[4:]
+            mode = 'reference' if '--by-reference' in options else (
+                'incremental' if '--incremental' in options else 'copy')
+            version = options[options.index('--version') + 1] if '--version' in options[:-1] else None
+            publish_gesture_set(sys.argv[2], sys.argv[3], mode, version)
     elif command == 'ensure_folders':
         ensure_base_folders()
+    elif command in ('get_manifest', 'write_manifest') and len(sys.argv) >= 3:
+        params = {'gesture_set_id': sys.argv[2]}
+        if command == 'write_manifest' and '--version' in sys.argv[3:-1]:
+            params['model_version'] = sys.argv[sys.argv.index('--version') + 1]
+        run_and_print(command, params)
+    elif command == 'diff_gesture_sets' and len(sys.argv) >= 4:
+        run_and_print(command, {'old_set_id': sys.argv[2], 'new_set_id': sys.argv[3]})
+    elif command == 'sync_active_set':
+        run_and_print(command, {'store_root': sys.argv[2]} if len(sys.argv) >= 3 else None)
+    elif command in ('refresh_manifests', 'cleanup_duplicates'):
+        run_and_print(command)
+    elif command in ('invalidate_cache', 'cache_stats'):
+        try:
+            result = notify_daemon(command)
+            print(json.dumps(result if result is not None else {'error': 'No gesture_set_api daemon is running'}))
+        except Exception as e:
+            print(json.dumps({'error': str(e)}))
+    elif command == 'serve':
+        import argparse
+        parser = argparse.ArgumentParser(description='Serve gesture set commands as JSON-RPC')
+        parser.add_argument('--socket', nargs='?', const=DEFAULT_SOCKET_PATH,
+                            help=f'Listen on a Unix socket (default {DEFAULT_SOCKET_PATH}) instead of stdin/stdout')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent requests')
+        parser.add_argument('--maintenance-interval', type=int, default=DEFAULT_MAINTENANCE_INTERVAL,
+                            help='Seconds between duplicate cleanup passes (0 disables)')
+        parser.add_argument('--mirror', action='store_true', default=None,
+                            help='List gesture sets from the local metadata mirror (drive_metadata_mirror.py)')
+        args = parser.parse_args(sys.argv[2:])
+        serve(args.socket, args.workers, args.maintenance_interval, args.mirror)
     else:
         print(json.dumps({'error': f'Unknown command: {command}'}))
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,11 +1,152 @@
 import os
 import sys
-from google_drive_oauth_service import GoogleDriveOAuthService
+import json
+import time
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from google_drive_oauth_service import get_drive_service, LISTING_FIELDS
+from gesture_set_manifest import (MANIFEST_NAME, build_manifest, content_hash, diff_manifests, file_entry,
+                                  folder_properties, gesture_summary, is_gesture_file, validate_tree)
+from active_set_store import ActiveSetStore
+from drive_metadata_mirror import DriveMetadataMirror
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Files counted as gestures inside a gesture set folder
+GESTURE_FILE_QUERY = f"(name contains '.pkl' or name contains '.json') and name != '{MANIFEST_NAME}'"
+
+# Concurrent Drive copy/create calls while publishing a gesture set
+MAX_PARALLEL_COPIES = 8
+
+# Concurrent downloads when syncing the active set to a local store
+MAX_PARALLEL_DOWNLOADS = 4
+
+# Pointer file written to ActiveSet when a set is published by reference
+ACTIVE_SET_POINTER_NAME = 'active_set.json'
+PUBLISH_MODES = ('copy', 'reference', 'incremental')
+
+# Read-through cache of list_gesture_sets / get_current_active_set. Entries
+# younger than CACHE_TTL_SECONDS are served as is; older ones (up to
+# CACHE_MAX_STALE_SECONDS) are served immediately while a background refresh runs.
+CACHE_TTL_SECONDS = 30
+CACHE_MAX_STALE_SECONDS = 600
+
+# Opt-in ($GESTURE_SET_USE_MIRROR=1): list gesture sets from the local metadata
+# mirror (drive_metadata_mirror.py), syncing it first when it is older than this
+MIRROR_MAX_STALENESS_SECONDS = 60
+
+class _ReadCache:
+    """
+    TTL cache with explicit invalidation and stale-while-revalidate
+
+    Loader errors are raised to the caller and never cached. A value loaded
+    while an invalidation happened is returned but not stored, so a refresh
+    racing a publish cannot resurrect the pre-publish state.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_stale=CACHE_MAX_STALE_SECONDS):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = {}       # key -> (value, loaded_at)
+        self._generation = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0,
+                       'refreshes': 0, 'refresh_errors': 0, 'invalidations': 0}
+
+    def get(self, key, loader):
+        """
+        Return the cached value of key, loading it with loader() when needed
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if entry and age < self.ttl:
+                self._stats['hits'] += 1
+                return entry[0]
+            if entry and age < self.max_stale:
+                self._stats['stale_hits'] += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                return entry[0]
+            self._stats['misses'] += 1
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # One synchronous load per key; concurrent callers wait and reuse it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and time.monotonic() - entry[1] < self.ttl:
+                    return entry[0]
+            return self._load(key, loader)
+
+    def _load(self, key, loader):
+        with self._lock:
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (value, time.monotonic())
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            self._load(key, loader)
+            with self._lock:
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats['refresh_errors'] += 1
+            print(f"[WARNING] Background refresh of {key} failed: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def put(self, key, value):
+        """Store a value computed elsewhere (e.g. right after a write)"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, *keys):
+        """Drop the given keys (all keys when called without arguments)"""
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            if keys:
+                for key in keys:
+                    self._entries.pop(key, None)
+            else:
+                self._entries.clear()
+
+    @property
+    def generation(self):
+        """Changes every time invalidate() runs"""
+        with self._lock:
+            return self._generation
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        reads = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / reads, 4) if reads else 0.0
+        return stats
 
 class GestureSetDriveService:
-    def __init__(self):
+    def __init__(self, background_cleanup=False, use_mirror=None):
         """
         Initialize Gesture Set Drive Service
+
+        Args:
+            background_cleanup (bool): Delete duplicate gesture sets found while
+                listing in a background thread. Only for long-lived processes
+                (gesture_set_api serve); one-shot runs just hide them and leave
+                the deletes to the maintenance pass (cleanup_duplicates).
+            use_mirror (bool): List and count gesture sets from the local metadata
+                mirror instead of Drive (default: $GESTURE_SET_USE_MIRROR)
         """
         # Get the directory where this script is located
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,22 +156,46 @@ class GestureSetDriveService:
         # Temporarily suppress all output from GoogleDriveOAuthService
         import contextlib
         with contextlib.redirect_stdout(sys.stderr):
-            self.drive_service = GoogleDriveOAuthService(
+            self.drive_service = get_drive_service(
                 credentials_file=credentials_file,
                 token_file=token_file
             )
         self.gesture_sets_folder = "GestureSets"
         self.active_set_folder = "ActiveSet"
+        # Base folder IDs never change once resolved; a long-lived process
+        # (gesture_set_api serve) resolves them once
+        self._base_folders = None
+        self._base_folders_lock = threading.Lock()
+        self._cache = _ReadCache()
+        self.background_cleanup = background_cleanup
+        # Duplicate folders whose background delete is queued or running
+        self._cleanup_pending = set()
+        self._cleanup_lock = threading.Lock()
+        if use_mirror is None:
+            use_mirror = os.environ.get('GESTURE_SET_USE_MIRROR', '').lower() in ('1', 'true', 'yes')
+        self.mirror = DriveMetadataMirror(self.drive_service) if use_mirror else None
+        # Cache generation the mirror was last synced for; an invalidation means
+        # this process changed Drive and the mirror must catch up first
+        self._mirror_generation = None
         
     def ensure_base_folders(self):
         """
         Ensure GestureSets and ActiveSet folders exist
         Returns: dict with folder IDs
         """
+        with self._base_folders_lock:
+            if self._base_folders is None:
+                self._base_folders = self._resolve_base_folders()
+            return self._base_folders
+
+    def _resolve_base_folders(self):
         try:
-            # Search for existing folders
-            gesture_sets_folder = self._find_folder_by_name(self.gesture_sets_folder)
-            active_set_folder = self._find_folder_by_name(self.active_set_folder)
+            # Search for existing folders (both lookups in parallel)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                gesture_sets_lookup = executor.submit(self._find_folder_by_name, self.gesture_sets_folder)
+                active_set_lookup = executor.submit(self._find_folder_by_name, self.active_set_folder)
+                gesture_sets_folder = gesture_sets_lookup.result()
+                active_set_folder = active_set_lookup.result()
             
             # Create if not exist
             if not gesture_sets_folder:
@@ -53,119 +218,490 @@ class GestureSetDriveService:
     def _find_folder_by_name(self, folder_name, parent_id=None):
         """
         Find folder by name
+
+        Errors are raised rather than reported as "not found", otherwise
+        ensure_base_folders would create a duplicate folder after a failed lookup.
         """
-        try:
-            query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder'"
-            if parent_id:
-                query += f" and '{parent_id}' in parents"
-                
-            files = self.drive_service.search_files(query)
-            return files[0] if files else None
+        query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder'"
+        if parent_id:
+            query += f" and '{parent_id}' in parents"
             
-        except Exception as e:
-            print(f"[ERROR] Error finding folder: {e}")
-            return None
+        files = self.drive_service.search_files(query, raise_errors=True)
+        return files[0] if files else None
     
     def list_gesture_sets(self):
         """
         List all gesture sets in GestureSets folder
+
+        Served from the read-through cache; see invalidate_cache.
+
         Returns: list of gesture set folders with metadata
         """
         try:
-            # Suppress all output during operation
-            import contextlib
-            with contextlib.redirect_stdout(sys.stderr):
-                folders = self.ensure_base_folders()
-                if not folders:
-                    return []
-                    
-                gesture_sets_id = folders['gesture_sets_id']
-                
-                # Search for folders in GestureSets
-                query = f"'{gesture_sets_id}' in parents and mimeType='application/vnd.google-apps.folder'"
-                gesture_set_folders = self.drive_service.search_files(query)
-                
-                # Get gesture count for each set
-                gesture_sets = []
-                for folder in gesture_set_folders:
-                    gesture_count = self._count_gestures_in_folder(folder['id'])
-                    gesture_sets.append({
-                        'id': folder['id'],
-                        'name': folder['name'],
-                        'modified_time': folder.get('modifiedTime', ''),
-                        'gesture_count': gesture_count,
-                        'drive_folder': f"/GestureSets/{folder['name']}/"
-                    })
-                
-                # Auto-cleanup duplicates before returning
-                gesture_sets = self._cleanup_duplicates(gesture_sets)
-                    
-                print(f"[INFO] Found {len(gesture_sets)} gesture sets", file=sys.stderr)
-                return gesture_sets
-            
+            return self._cache.get('gesture_sets', self._load_gesture_sets)
         except Exception as e:
             print(f"[ERROR] Error listing gesture sets: {e}", file=sys.stderr)
             return []
+
+    def _load_gesture_sets(self):
+        """
+        List gesture sets from Drive or the metadata mirror (raises on errors so they are never cached)
+        """
+        # Suppress all output during operation
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            listing = None
+            if self.mirror is not None:
+                try:
+                    listing = self._mirror_gesture_set_listing()
+                except Exception as e:
+                    print(f"[WARNING] Metadata mirror unavailable, listing from Drive: {e}", file=sys.stderr)
+            if listing is None:
+                folders = self.ensure_base_folders()
+                if not folders:
+                    raise RuntimeError("Base folders are not available")
+                listing = self._drive_gesture_set_listing(folders['gesture_sets_id'])
+            gesture_set_folders, summaries = listing
+            gesture_sets = []
+            for folder in gesture_set_folders:
+                properties = folder.get('properties', {})
+                summary = summaries.get(folder['id'])
+                if summary is None:
+                    # Listing failed: fall back to the manifest summary
+                    gesture_count = int(properties.get('gesture_count') or 0)
+                    manifest_stale = False
+                else:
+                    gesture_count = summary['gesture_count']
+                    manifest_stale = ('manifest_file_id' in properties
+                                      and properties.get('gesture_hash') != summary['gesture_hash'])
+                gesture_sets.append({
+                    'id': folder['id'],
+                    'name': folder['name'],
+                    'modified_time': folder.get('modifiedTime', ''),
+                    'gesture_count': gesture_count,
+                    'model_version': properties.get('model_version') or None,
+                    'has_manifest': 'manifest_file_id' in properties,
+                    # Rewritten by the maintenance pass (refresh_manifests) or the next publish
+                    'manifest_stale': manifest_stale,
+                    'drive_folder': f"/GestureSets/{folder['name']}/"
+                })
+            
+            # Auto-cleanup duplicates before returning
+            gesture_sets = self._cleanup_duplicates(gesture_sets)
+                
+            print(f"[INFO] Found {len(gesture_sets)} gesture sets", file=sys.stderr)
+            return gesture_sets
+
+    def _drive_gesture_set_listing(self, gesture_sets_id):
+        """
+        Gesture set folders and their gesture summaries, listed from Drive
+
+        Returns:
+            tuple: (folders with their manifest summary properties, folder ID -> gesture summary)
+        """
+        query = f"'{gesture_sets_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        gesture_set_folders = self.drive_service.search_all_files(query, fields=f"{LISTING_FIELDS}, properties")
+
+        # Count every set's gestures with batched queries instead of one per
+        # set, so sets changed in the Drive UI after their manifest was
+        # written still show the right count
+        return gesture_set_folders, self._gesture_summaries([folder['id'] for folder in gesture_set_folders])
+
+    def _mirror_gesture_set_listing(self):
+        """
+        Gesture set folders and their gesture summaries, read from the metadata mirror
+
+        The mirror is synced first (one changes request when nothing changed)
+        if it is older than MIRROR_MAX_STALENESS_SECONDS or the cache was
+        invalidated since the last sync.
+
+        Returns:
+            tuple: Same as _drive_gesture_set_listing
+        """
+        generation = self._cache.generation
+        staleness = self.mirror.sync_if_stale(MIRROR_MAX_STALENESS_SECONDS,
+                                              force=generation != self._mirror_generation)
+        self._mirror_generation = generation
+
+        gesture_sets_id = self.mirror.get_root_id(self.gesture_sets_folder)
+        if not gesture_sets_id:
+            raise RuntimeError("GestureSets is not in the metadata mirror, run: python drive_metadata_mirror.py resync")
+        gesture_set_folders = self.mirror.list_children(gesture_sets_id, folders_only=True)
+        summaries = {}
+        for folder in gesture_set_folders:
+            files = [file for file in self.mirror.list_children(folder['id'])
+                     if file['mimeType'] != FOLDER_MIME_TYPE and is_gesture_file(file['name'])]
+            summaries[folder['id']] = gesture_summary([file_entry(file['name'], file) for file in files])
+        print(f"[INFO] Listed gesture sets from the metadata mirror ({staleness:.0f}s old)", file=sys.stderr)
+        return gesture_set_folders, summaries
+
+    def invalidate_cache(self, *keys):
+        """
+        Drop cached reads after a change made outside this service
+
+        Args:
+            keys: 'gesture_sets' and/or 'active_set' (all when omitted)
+        """
+        self._cache.invalidate(*keys)
+
+    def cache_stats(self):
+        """
+        Returns: dict with cache hit/miss/refresh counters and hit rate
+        """
+        return self._cache.stats()
     
-    def _count_gestures_in_folder(self, folder_id):
+    def _gesture_summaries(self, folder_ids):
         """
-        Count gesture files (.pkl or .json) in a folder
+        Count and hash the gesture files (.pkl or .json) of many folders at once
+
+        Children of all folders are fetched with a few combined parent queries
+        and grouped client-side.
+
+        Returns:
+            dict: Folder ID -> gesture_summary() result (empty if listing fails)
         """
+        if not folder_ids:
+            return {}
         try:
             import contextlib
             with contextlib.redirect_stdout(sys.stderr):
-                query = f"'{folder_id}' in parents and (name contains '.pkl' or name contains '.json')"
-                files = self.drive_service.search_files(query)
-                return len(files)
-        except:
-            return 0
+                children = self.drive_service.list_children(folder_ids, GESTURE_FILE_QUERY)
+                return {folder_id: gesture_summary([file_entry(file['name'], file) for file in files])
+                        for folder_id, files in children.items()}
+        except Exception as e:
+            print(f"[ERROR] Error counting gestures: {e}", file=sys.stderr)
+            return {}
     
     def get_current_active_set(self):
         """
         Get current active gesture set info
+
+        A pointer file in ActiveSet (publish by reference) takes precedence over
+        a copied set folder.
+
+        Served from the read-through cache; see invalidate_cache.
+
         Returns: dict with active set info or None
         """
         try:
-            folders = self.ensure_base_folders()
-            if not folders:
-                return None
-                
-            active_set_id = folders['active_set_id']
-            
-            # Search for folders in ActiveSet (should be only 1)
-            query = f"'{active_set_id}' in parents and mimeType='application/vnd.google-apps.folder'"
-            active_folders = self.drive_service.search_files(query)
-            
-            if not active_folders:
-                return None
-                
-            active_folder = active_folders[0]  # Should be only 1
-            gesture_count = self._count_gestures_in_folder(active_folder['id'])
-            
-            return {
-                'id': active_folder['id'],
-                'name': active_folder['name'],
-                'modified_time': active_folder.get('modifiedTime', ''),
-                'gesture_count': gesture_count,
-                'drive_folder': f"/ActiveSet/{active_folder['name']}/"
-            }
-            
+            return self._cache.get('active_set', self._load_active_set)
         except Exception as e:
             print(f"[ERROR] Error getting active set: {e}")
             return None
+
+    def _load_active_set(self):
+        """
+        Resolve the active set from Drive (raises on errors so they are never cached)
+        """
+        folders = self.ensure_base_folders()
+        if not folders:
+            raise RuntimeError("Base folders are not available")
+            
+        active_folders, pointer_file = self._list_active_entries(folders['active_set_id'])
+
+        if pointer_file:
+            pointer = self._read_active_pointer(pointer_file['id'])
+            if pointer:
+                return {
+                    'id': pointer['gesture_set_id'],
+                    'name': pointer['gesture_set_name'],
+                    'modified_time': pointer_file.get('modifiedTime', ''),
+                    'gesture_count': sum(1 for entry in pointer['files']
+                                         if '/' not in entry['path'] and self._is_gesture_file(entry['path'])),
+                    'drive_folder': pointer['drive_folder'],
+                    'version': pointer.get('version'),
+                    'mode': 'reference'
+                }
+        
+        if not active_folders:
+            return None
+            
+        active_folder = active_folders[0]  # Should be only 1
+        properties = active_folder.get('properties', {})
+        # Counted live (one query): the folder may have changed since its manifest was written
+        summary = self._gesture_summaries([active_folder['id']]).get(active_folder['id'])
+        gesture_count = summary['gesture_count'] if summary else int(properties.get('gesture_count') or 0)
+        
+        return {
+            'id': active_folder['id'],
+            'name': active_folder['name'],
+            'modified_time': active_folder.get('modifiedTime', ''),
+            'gesture_count': gesture_count,
+            'drive_folder': f"/ActiveSet/{active_folder['name']}/",
+            'mode': 'copy'
+        }
+
+    def _list_active_entries(self, active_set_id):
+        """
+        List ActiveSet in one query
+
+        Returns:
+            tuple: (list of set folders, pointer file metadata or None)
+        """
+        entries = self.drive_service.list_children([active_set_id], fields=f"{LISTING_FIELDS}, properties")[active_set_id]
+        active_folders = [entry for entry in entries if entry['mimeType'] == FOLDER_MIME_TYPE]
+        pointer_file = next((entry for entry in entries if entry['name'] == ACTIVE_SET_POINTER_NAME), None)
+        return active_folders, pointer_file
+
+    def _read_active_pointer(self, pointer_file_id):
+        buffer = self.drive_service.download_file_to_memory(pointer_file_id)
+        return json.loads(buffer.read().decode('utf-8')) if buffer else None
+
+    @staticmethod
+    def _is_gesture_file(name):
+        return is_gesture_file(name)
+
+    def _list_tree(self, folder_id, folders=None):
+        """
+        List every file below a folder, one batched query per folder level
+
+        Args:
+            folder_id (str): Root folder
+            folders (dict): If given, filled with relative folder path -> folder ID
+                ('' is the root)
+
+        Returns:
+            list: (relative path, file metadata) for each file
+        """
+        return self.drive_service.list_tree(folder_id, folders)
     
+    def get_manifest(self, gesture_set_id):
+        """
+        Read the manifest of a gesture set
+
+        Returns: manifest dict, or None if the set has no manifest
+        """
+        folder = self.drive_service.execute(self.drive_service.service.files().get(
+            fileId=gesture_set_id, fields='id, name, properties'))
+        manifest_file_id = folder.get('properties', {}).get('manifest_file_id')
+        if not manifest_file_id:
+            found = self.drive_service.list_children([gesture_set_id], f"name='{MANIFEST_NAME}'")[gesture_set_id]
+            if not found:
+                return None
+            manifest_file_id = found[0]['id']
+        buffer = self.drive_service.download_file_to_memory(manifest_file_id)
+        return json.loads(buffer.read().decode('utf-8')) if buffer else None
+
+    def write_manifest(self, gesture_set_id, model_version=None, tree=None, gesture_set_name=None):
+        """
+        Generate the manifest of a gesture set and store it in the set folder
+
+        Writes manifest.json (updated in place when it exists) and the summary
+        folder properties used by list_gesture_sets.
+
+        Args:
+            gesture_set_id (str): Set folder ID
+            model_version (str): Model version label (default: keep the current one)
+            tree (list): Listing from _list_tree if the caller already has it;
+                its manifest.json entry is updated to the written file
+            gesture_set_name (str): Set name if the caller already has it
+
+        Returns: the written manifest
+        """
+        if gesture_set_name is None:
+            gesture_set_name = self.drive_service.execute(self.drive_service.service.files().get(
+                fileId=gesture_set_id, fields='name'))['name']
+        tree = self._list_tree(gesture_set_id) if tree is None else tree
+        existing = next((file for relative_path, file in tree if relative_path == MANIFEST_NAME), None)
+        if model_version is None and existing:
+            previous = self.get_manifest(gesture_set_id)
+            model_version = previous.get('model_version') if previous else None
+
+        manifest = build_manifest(gesture_set_name, tree, model_version)
+        written = self.drive_service.upload_bytes(
+            json.dumps(manifest, indent=2).encode('utf-8'),
+            MANIFEST_NAME,
+            folder_id=gesture_set_id,
+            mime_type='application/json',
+            file_id=existing['id'] if existing else None
+        )
+        if not written:
+            raise RuntimeError(f"Failed to write manifest of {gesture_set_name}")
+        tree[:] = [entry for entry in tree if entry[0] != MANIFEST_NAME] + [(MANIFEST_NAME, written)]
+        self.drive_service.execute(self.drive_service.service.files().update(
+            fileId=gesture_set_id,
+            body={'properties': folder_properties(manifest, written['id'])},
+            fields='id'
+        ), 'write')
+        self._cache.invalidate('gesture_sets')
+        print(f"[INFO] Wrote manifest of {gesture_set_name}: {manifest['gesture_count']} gestures", file=sys.stderr)
+        return manifest
+
+    def _current_manifest(self, gesture_set_id, gesture_set_name, model_version=None):
+        """
+        Return an up-to-date manifest and the set's file listing, rewriting a missing or stale manifest
+
+        Returns:
+            tuple: (manifest, [(relative path, file)])
+        """
+        folder = self.drive_service.execute(self.drive_service.service.files().get(
+            fileId=gesture_set_id, fields='id, properties'))
+        properties = folder.get('properties', {})
+        tree = self._list_tree(gesture_set_id)
+        manifest = build_manifest(gesture_set_name, tree, model_version or properties.get('model_version') or None)
+
+        stored_hash = properties.get('content_hash')
+        if (stored_hash != manifest['content_hash'] or properties.get('gesture_hash') != manifest['gesture_hash']
+                or (model_version and model_version != properties.get('model_version'))):
+            if stored_hash:
+                print(f"[WARNING] Manifest of {gesture_set_name} was out of date, regenerating", file=sys.stderr)
+            manifest = self.write_manifest(gesture_set_id, manifest['model_version'], tree, gesture_set_name)
+        return manifest, tree
+
+    def diff_gesture_sets(self, old_set_id, new_set_id):
+        """
+        Compare the contents of two gesture sets by their manifests
+
+        Sets without a stored manifest are compared by a manifest built from
+        their current listing (nothing is written).
+
+        Returns: dict with added/removed/changed/unchanged paths and 'identical'
+        """
+        manifests = []
+        for gesture_set_id in (old_set_id, new_set_id):
+            manifest = self.get_manifest(gesture_set_id)
+            if manifest is None:
+                manifest = build_manifest(gesture_set_id, self._list_tree(gesture_set_id))
+            manifests.append(manifest)
+        return diff_manifests(*manifests)
+
+    def refresh_manifests(self):
+        """
+        Maintenance pass: write manifests for sets that have none or whose content changed
+
+        Returns: dict with the number of sets checked and manifests written
+        """
+        folders = self.ensure_base_folders()
+        if not folders:
+            raise RuntimeError("Base folders are not available")
+        query = f"'{folders['gesture_sets_id']}' in parents and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+        gesture_sets = self.drive_service.search_all_files(query, fields=f"{LISTING_FIELDS}, properties")
+
+        # List every set's tree level by level with batched queries
+        trees = self.drive_service.list_trees([folder['id'] for folder in gesture_sets])
+
+        written = 0
+        for folder in gesture_sets:
+            properties = folder.get('properties', {})
+            manifest = build_manifest(folder['name'], trees[folder['id']])
+            # Manifests written before gesture_hash existed are rewritten once
+            if (properties.get('content_hash') != manifest['content_hash']
+                    or properties.get('gesture_hash') != manifest['gesture_hash']):
+                self.write_manifest(folder['id'], properties.get('model_version') or None,
+                                    trees[folder['id']], folder['name'])
+                written += 1
+        return {'checked': len(gesture_sets), 'written': written}
+
+    def _active_set_files(self):
+        """
+        Resolve the active set and its files
+
+        Returns:
+            tuple: (set name, content hash, manifest file entries), or None if no set is active
+        """
+        folders = self.ensure_base_folders()
+        if not folders:
+            raise RuntimeError("Base folders are not available")
+        active_folders, pointer_file = self._list_active_entries(folders['active_set_id'])
+        if pointer_file:
+            pointer = self._read_active_pointer(pointer_file['id'])
+            if pointer:
+                files = pointer['files']
+                return pointer['gesture_set_name'], pointer.get('content_hash') or content_hash(files), files
+        if not active_folders:
+            return None
+        manifest = build_manifest(active_folders[0]['name'], self._list_tree(active_folders[0]['id']))
+        return manifest['gesture_set_name'], manifest['content_hash'], manifest['files']
+
+    def sync_active_set(self, store_root=None, keep_versions=3):
+        """
+        Bring a local content-addressed copy of the active set up to date
+
+        Only files whose md5 is not in the local store yet are downloaded;
+        each download is verified before it enters the store. The set is then
+        hard-linked into a version directory and <store>/current is switched
+        to it atomically (see active_set_store).
+
+        Args:
+            store_root (str): Local store directory (default: ActiveSetStore default)
+            keep_versions (int): Version directories kept after pruning
+
+        Returns: dict with the synced version and transfer statistics
+        """
+        started = time.perf_counter()
+        active = self._active_set_files()
+        if active is None:
+            return {'success': False, 'error': 'No active gesture set'}
+        name, version, files = active
+        store = ActiveSetStore(store_root)
+
+        unaddressable = [entry['path'] for entry in files if not entry.get('md5')]
+        for path in unaddressable:
+            print(f"[WARNING] Skipping {path}: Drive has no checksum for it", file=sys.stderr)
+        files = [entry for entry in files if entry.get('md5')]
+
+        # One download per missing distinct blob
+        missing = {}
+        for entry in files:
+            if not store.has_blob(entry['md5']):
+                missing.setdefault(entry['md5'], entry)
+
+        def fetch(entry):
+            downloaded = self.drive_service.download_file(
+                entry['id'], store.incoming_dir, store.incoming_name(entry['md5']),
+                metadata={'md5Checksum': entry['md5'], 'size': entry['size']})
+            if not downloaded:
+                raise RuntimeError(f"Download of {entry['path']} failed")
+            store.add_blob(entry['md5'], downloaded)
+            return entry['size'] or 0
+
+        failures = []
+        bytes_downloaded = 0
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+            futures = {executor.submit(fetch, entry): entry for entry in missing.values()}
+            for future, entry in futures.items():
+                try:
+                    bytes_downloaded += future.result()
+                except Exception as e:
+                    print(f"[ERROR] Could not fetch {entry['path']}: {e}", file=sys.stderr)
+                    failures.append(entry['path'])
+        if failures:
+            return {'success': False, 'error': f"Failed to fetch: {', '.join(sorted(failures))}",
+                    'current_version': store.current_version()}
+
+        path = store.materialize(version, files, {'gesture_set_name': name})
+        changed = store.current_version() != version
+        if changed:
+            store.activate(version)
+        pruned = store.prune(keep_versions)
+        print(f"[INFO] Active set {name} synced to {path}", file=sys.stderr)
+        return {
+            'success': True,
+            'gesture_set_name': name,
+            'version': version,
+            'path': os.path.join(store.root, 'current'),
+            'switched': changed,
+            'files': len(files),
+            'downloaded': len(missing),
+            'reused': len(files) - sum(1 for entry in files if entry['md5'] in missing),
+            'bytes_downloaded': bytes_downloaded,
+            'skipped': unaddressable,
+            'pruned': pruned,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000)
+        }
+
     def move_folder(self, folder_id, new_parent_id, old_parent_id):
         """
         Move a folder from one parent to another
         """
         try:
             # Remove from old parent and add to new parent
-            file = self.drive_service.service.files().update(
+            file = self.drive_service.execute(self.drive_service.service.files().update(
                 fileId=folder_id,
                 addParents=new_parent_id,
                 removeParents=old_parent_id,
                 fields='id, parents'
-            ).execute()
+            ), 'write')
             
             print(f"[INFO] Folder moved successfully: {folder_id}", file=sys.stderr)
             return file
@@ -176,113 +712,506 @@ class GestureSetDriveService:
     
     def copy_folder(self, source_folder_id, target_parent_id, new_name):
         """
-        Copy a folder and all its contents to a new parent folder
+        Copy a folder and all its contents (including subfolders) to a new parent folder
         """
         try:
-            # Create new folder in target parent
-            folder_metadata = {
-                'name': new_name,
-                'parents': [target_parent_id],
-                'mimeType': 'application/vnd.google-apps.folder'
-            }
-            
-            new_folder = self.drive_service.service.files().create(
-                body=folder_metadata,
-                fields='id'
-            ).execute()
-            
-            new_folder_id = new_folder['id']
-            print(f"[INFO] Created new folder: {new_name} (ID: {new_folder_id})", file=sys.stderr)
-            
-            # Copy all files from source folder to new folder
-            query = f"'{source_folder_id}' in parents"
-            source_files = self.drive_service.search_files(query)
-            
-            for file in source_files:
-                try:
-                    # Copy each file
-                    copy_metadata = {
-                        'name': file['name'],
-                        'parents': [new_folder_id]
-                    }
-                    
-                    copied_file = self.drive_service.service.files().copy(
-                        fileId=file['id'],
-                        body=copy_metadata,
-                        fields='id'
-                    ).execute()
-                    
-                    print(f"[INFO] Copied file: {file['name']}", file=sys.stderr)
-                    
-                except Exception as e:
-                    print(f"[WARNING] Could not copy file {file['name']}: {e}", file=sys.stderr)
-            
+            new_folder, _, _, failures = self._copy_tree(source_folder_id, target_parent_id, new_name)
+            for relative_path in failures:
+                print(f"[WARNING] Could not copy {relative_path}", file=sys.stderr)
             return new_folder
             
         except Exception as e:
             print(f"[ERROR] Error copying folder: {e}", file=sys.stderr)
             return None
+
+    def _copy_tree(self, source_folder_id, target_parent_id, new_name):
+        """
+        Copy a folder tree level by level with concurrent server-side copies
+
+        Each level is listed with one batched query, then its subfolders are
+        created and its files copied in parallel.
+
+        Args:
+            source_folder_id (str): Folder to copy
+            target_parent_id (str): Parent of the new folder (None for My Drive root)
+            new_name (str): Name of the new folder
+
+        Returns:
+            tuple: (new folder metadata, [(relative path, source file)],
+                    [(relative path, copied file)], [failed relative paths])
+        """
+        new_folder = self._create_copy_folder(target_parent_id, new_name)
+        return (new_folder,) + self._copy_into(source_folder_id, new_folder['id'])
+
+    def _create_copy_folder(self, target_parent_id, new_name):
+        folder_metadata = {
+            'name': new_name,
+            'mimeType': FOLDER_MIME_TYPE
+        }
+        if target_parent_id:
+            folder_metadata['parents'] = [target_parent_id]
+
+        new_folder = self.drive_service.execute(self.drive_service.service.files().create(
+            body=folder_metadata,
+            fields='id, name, parents'
+        ), 'write')
+        print(f"[INFO] Created new folder: {new_name} (ID: {new_folder['id']})", file=sys.stderr)
+        return new_folder
+
+    def _copy_into(self, source_folder_id, new_folder_id):
+        """
+        Copy the contents of a folder tree into an existing folder (see _copy_tree)
+
+        Returns:
+            tuple: ([(relative path, source file)], [(relative path, copied file)], [failed relative paths])
+        """
+        sources, copies, failures = [], [], []
+        level = [(source_folder_id, new_folder_id, '')]
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_COPIES) as executor:
+            while level:
+                children = self.drive_service.list_children([source_id for source_id, _, _ in level])
+                folder_jobs, file_jobs = [], []
+                for source_id, target_id, prefix in level:
+                    for item in children[source_id]:
+                        relative_path = f"{prefix}{item['name']}"
+                        if item['mimeType'] == FOLDER_MIME_TYPE:
+                            folder_jobs.append((item, executor.submit(
+                                self.drive_service.create_folder, item['name'], target_id), relative_path))
+                        else:
+                            sources.append((relative_path, item))
+                            file_jobs.append((executor.submit(self._copy_file, item, target_id), relative_path))
+
+                level = []
+                for item, future, relative_path in folder_jobs:
+                    created = future.result()
+                    if created:
+                        level.append((item['id'], created['id'], f"{relative_path}/"))
+                    else:
+                        failures.append(f"{relative_path}/")
+                for future, relative_path in file_jobs:
+                    try:
+                        copies.append((relative_path, future.result()))
+                        print(f"[INFO] Copied file: {relative_path}", file=sys.stderr)
+                    except Exception as e:
+                        print(f"[WARNING] Could not copy file {relative_path}: {e}", file=sys.stderr)
+                        failures.append(relative_path)
+
+        return sources, copies, failures
+
+    def _copy_file(self, file, target_folder_id):
+        return self.drive_service.execute(self.drive_service.service.files().copy(
+            fileId=file['id'],
+            body={'name': file['name'], 'parents': [target_folder_id]},
+            fields='id, name, size, md5Checksum'
+        ), 'write')
+
+    @staticmethod
+    def _verify_copy(manifest, copies):
+        """
+        Check that a copied set matches the source manifest
+
+        Files are matched by relative path and md5 (size for files without a
+        checksum, e.g. Google native documents).
+
+        Returns:
+            list: Relative paths that are missing, extra or differ in the copy
+        """
+        return validate_tree(manifest, copies)
+
+    def _delete_in_background(self, file_ids, daemon=True):
+        """
+        Permanently delete Drive items without blocking the caller
+
+        Args:
+            file_ids (list): Items to delete (batched, rate-limited deletes)
+            daemon (bool): True for items that are already trashed, so nothing
+                visible is left if the process exits before the deletes finish.
+                False keeps the process alive until they are done.
+        """
+        threading.Thread(target=self._delete_files, args=(list(file_ids),),
+                         name='drive-background-delete', daemon=daemon).start()
+
+    def _delete_files(self, file_ids):
+        """
+        Delete Drive items with batched requests
+
+        Returns:
+            list: IDs that were deleted
+        """
+        requests = [self.drive_service.service.files().delete(fileId=file_id) for file_id in file_ids]
+        deleted = []
+        for file_id, result in zip(file_ids, self.drive_service.execute_batch(requests, 'delete')):
+            if isinstance(result, Exception):
+                print(f"[CLEANUP] Error deleting {file_id}: {result}", file=sys.stderr)
+            else:
+                deleted.append(file_id)
+        if deleted:
+            print(f"[CLEANUP] Deleted {len(deleted)} items", file=sys.stderr)
+        return deleted
     
-    def publish_gesture_set(self, gesture_set_id, gesture_set_name):
+    def publish_gesture_set(self, gesture_set_id, gesture_set_name, mode='copy', version=None):
         """
-        Publish a gesture set: move current active to GestureSets, move selected to ActiveSet
+        Publish a gesture set as the active set
         
         Args:
             gesture_set_id: ID of gesture set to publish
             gesture_set_name: Name of gesture set to publish
+            mode: 'copy' duplicates the set into ActiveSet, 'reference' only writes
+                a pointer file to ActiveSet that names the set in GestureSets,
+                'incremental' updates the copied active set with only the files
+                that differ (falls back to 'copy' when there is no copied set)
+            version: Version label recorded in the pointer file (optional)
             
         Returns: dict with operation results
         """
+        if mode not in PUBLISH_MODES:
+            return {'success': False, 'error': f"Unknown publish mode: {mode}"}
         try:
+            if mode == 'reference':
+                return self._publish_by_reference(gesture_set_id, gesture_set_name, version)
+            if mode == 'incremental':
+                return self._publish_incremental(gesture_set_id, gesture_set_name)
+            return self._publish_by_copy(gesture_set_id, gesture_set_name)
+        finally:
+            # Even a failed publish may have touched ActiveSet
+            self._cache.invalidate('active_set')
+
+    def _publish_by_copy(self, gesture_set_id, gesture_set_name):
+        """
+        Copy the gesture set into ActiveSet, replacing the current active set
+
+        The set is first copied into a staging folder outside ActiveSet and
+        verified (file count and checksums). Only then is the old active set
+        trashed and the staging folder moved and renamed into ActiveSet, so
+        ActiveSet is only empty for those two metadata calls. A failed copy
+        leaves the current active set untouched.
+        """
+        try:
+            started = time.perf_counter()
             folders = self.ensure_base_folders()
             if not folders:
                 return {'success': False, 'error': 'Could not ensure base folders'}
                 
-            gesture_sets_id = folders['gesture_sets_id']
             active_set_id = folders['active_set_id']
+
+            # The manifest travels with the copy and is what the copy is verified against
+            manifest, _ = self._current_manifest(gesture_set_id, gesture_set_name)
             
             result = {
                 'success': True,
+                'mode': 'copy',
                 'old_set_moved': False,
                 'new_set_moved': False,
                 'old_set_name': None,
-                'new_set_name': gesture_set_name
+                'new_set_name': gesture_set_name,
+                'gesture_count': manifest['gesture_count'],
+                'content_hash': manifest['content_hash'],
+                'timings': {}
             }
             
-            # Step 1: Delete current active set (if exists) 
-            current_active = self.get_current_active_set()
-            if current_active:
+            # Step 1: Copy selected gesture set into a staging folder in My Drive root
+            staging_name = f"{gesture_set_name}.staging-{int(time.time())}"
+            staging = None
+            swapped = False
+            try:
+                copy_started = time.perf_counter()
+                staging = self._create_copy_folder(None, staging_name)
+                _, copies, failures = self._copy_into(gesture_set_id, staging['id'])
+                result['files_copied'] = len(copies)
+                result['timings']['copy_ms'] = round((time.perf_counter() - copy_started) * 1000)
+
+                # Step 2: Verify the staged copy before touching ActiveSet
+                mismatches = self._verify_copy(manifest, copies) + failures
+                if mismatches:
+                    result['success'] = False
+                    result['error'] = f"Staged copy failed verification: {', '.join(sorted(set(mismatches)))}"
+                    return result
+
+                # Step 3: Swap - trash the old active set folder(s), move the staged copy in
+                active_folders, pointer_file = self._list_active_entries(active_set_id)
+                copied_manifest = next((file for relative_path, file in copies if relative_path == MANIFEST_NAME), None)
+                properties = folder_properties(manifest, copied_manifest['id'] if copied_manifest else '')
+                swap_started = time.perf_counter()
                 try:
-                    self.drive_service.service.files().delete(fileId=current_active['id']).execute()
+                    for folder in active_folders:
+                        self._set_trashed(folder['id'], True)
+                    self.drive_service.execute(self.drive_service.service.files().update(
+                        fileId=staging['id'],
+                        addParents=active_set_id,
+                        removeParents=','.join(staging.get('parents', [])),
+                        body={'name': gesture_set_name, 'properties': properties},
+                        fields='id, parents'
+                    ), 'write')
+                except Exception:
+                    # Put the previous active set back rather than leave ActiveSet empty
+                    for folder in active_folders:
+                        self._set_trashed(folder['id'], False)
+                    raise
+                swapped = True
+                if active_folders:
                     result['old_set_moved'] = True
-                    result['old_set_name'] = current_active['name']
-                    print(f"[INFO] Deleted old active set: {current_active['name']}", file=sys.stderr)
-                except Exception as e:
-                    print(f"[WARNING] Could not delete old active set: {e}", file=sys.stderr)
-            
-            # Step 2: Copy selected gesture set to ActiveSet (instead of move)
-            copy_result = self.copy_folder(
-                gesture_set_id,
-                active_set_id,
-                gesture_set_name
-            )
-            
-            if copy_result:
-                result['new_set_moved'] = True
-                print(f"[INFO] Copied new gesture set to ActiveSet: {gesture_set_name}", file=sys.stderr)
-            else:
-                result['success'] = False
-                result['error'] = 'Failed to copy new gesture set to ActiveSet'
-                
+                    result['old_set_name'] = active_folders[0]['name']
+            finally:
+                # Whatever went wrong before the swap, no half-copied staging folder is left behind
+                if staging and not swapped:
+                    self._discard_staging(staging)
+            result['timings']['active_missing_ms'] = round((time.perf_counter() - swap_started) * 1000)
+            result['new_set_moved'] = True
+
+            # A pointer from an earlier publish by reference would shadow the copied folder
+            if pointer_file:
+                self._set_trashed(pointer_file['id'], True)
+                result['old_set_moved'] = True
+            print(f"[INFO] Published gesture set to ActiveSet: {gesture_set_name}", file=sys.stderr)
+
+            # Step 4: Permanently delete the old active set off the request path
+            self._delete_in_background([folder['id'] for folder in active_folders] +
+                                       ([pointer_file['id']] if pointer_file else []))
+
+            result['timings']['publish_ms'] = round((time.perf_counter() - started) * 1000)
             return result
             
         except Exception as e:
             print(f"[ERROR] Error publishing gesture set: {e}")
             return {'success': False, 'error': str(e)}
+
+    def _discard_staging(self, staging):
+        try:
+            if self.drive_service.delete_file(staging['id']):
+                print(f"[CLEANUP] Deleted staging folder {staging['name']}", file=sys.stderr)
+            else:
+                print(f"[WARNING] Could not delete staging folder {staging['name']}", file=sys.stderr)
+        except Exception as e:
+            print(f"[WARNING] Could not delete staging folder {staging['name']}: {e}", file=sys.stderr)
+
+    def _publish_by_reference(self, gesture_set_id, gesture_set_name, version=None):
+        """
+        Make a gesture set active by writing a pointer file to ActiveSet
+
+        The pointer names the set in GestureSets and lists its files with sizes
+        and checksums; no gesture files are copied, so the cost does not depend
+        on the size of the set.
+        """
+        try:
+            started = time.perf_counter()
+            folders = self.ensure_base_folders()
+            if not folders:
+                return {'success': False, 'error': 'Could not ensure base folders'}
+
+            active_set_id = folders['active_set_id']
+            active_folders, pointer_file = self._list_active_entries(active_set_id)
+            previous = self._read_active_pointer(pointer_file['id']) if pointer_file else None
+            manifest, _ = self._current_manifest(gesture_set_id, gesture_set_name, version)
+
+            pointer = {
+                'mode': 'reference',
+                'gesture_set_id': gesture_set_id,
+                'gesture_set_name': gesture_set_name,
+                'version': manifest['model_version'],
+                'published_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'drive_folder': f"/GestureSets/{gesture_set_name}/",
+                'content_hash': manifest['content_hash'],
+                'files': manifest['files']
+            }
+
+            # Overwrite the existing pointer in place so there is never a moment without one
+            written = self.drive_service.upload_bytes(
+                json.dumps(pointer, indent=2).encode('utf-8'),
+                ACTIVE_SET_POINTER_NAME,
+                folder_id=active_set_id,
+                mime_type='application/json',
+                file_id=pointer_file['id'] if pointer_file else None
+            )
+            if not written:
+                return {'success': False, 'error': 'Failed to write active set pointer'}
+
+            # Copied folders from earlier publishes by copy are no longer active
+            for folder in active_folders:
+                self._set_trashed(folder['id'], True)
+            self._delete_in_background([folder['id'] for folder in active_folders])
+
+            old_set_name = previous['gesture_set_name'] if previous else (
+                active_folders[0]['name'] if active_folders else None)
+            return {
+                'success': True,
+                'mode': 'reference',
+                'old_set_moved': old_set_name is not None,
+                'new_set_moved': True,
+                'old_set_name': old_set_name,
+                'new_set_name': gesture_set_name,
+                'files_referenced': len(pointer['files']),
+                'gesture_count': manifest['gesture_count'],
+                'content_hash': manifest['content_hash'],
+                'timings': {'publish_ms': round((time.perf_counter() - started) * 1000)}
+            }
+
+        except Exception as e:
+            print(f"[ERROR] Error publishing gesture set by reference: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def _publish_incremental(self, gesture_set_id, gesture_set_name):
+        """
+        Update the copied active set in place with only the files that changed
+
+        The source set's manifest is diffed against the active folder by path
+        and checksum. New files are copied in, changed files are replaced
+        (new copy first, then the old file is deleted) and files missing from
+        the source are deleted. The result is verified against the manifest;
+        if it does not match, the set is republished with a full copy.
+
+        Unlike a full copy publish the change is not a single swap: readers
+        may briefly see a mix of old and new files while it is applied.
+        """
+        try:
+            started = time.perf_counter()
+            folders = self.ensure_base_folders()
+            if not folders:
+                return {'success': False, 'error': 'Could not ensure base folders'}
+
+            active_folders, pointer_file = self._list_active_entries(folders['active_set_id'])
+            if pointer_file or len(active_folders) != 1:
+                print("[INFO] No single copied active set, publishing a full copy", file=sys.stderr)
+                result = self._publish_by_copy(gesture_set_id, gesture_set_name)
+                result['fallback'] = 'copy'
+                return result
+            active_folder = active_folders[0]
+
+            manifest, source_tree = self._current_manifest(gesture_set_id, gesture_set_name)
+            source_files = dict(source_tree)
+            active_dirs = {}
+            active_tree = self._list_tree(active_folder['id'], active_dirs)
+            active_files = dict(active_tree)
+            diff = diff_manifests(build_manifest(active_folder['name'], active_tree), manifest)
+            diff_ms = round((time.perf_counter() - started) * 1000)
+
+            # The copied manifest.json always follows the source manifest
+            source_manifest = source_files.get(MANIFEST_NAME)
+            active_manifest = active_files.get(MANIFEST_NAME)
+            manifest_changed = bool(source_manifest) and (
+                not active_manifest or active_manifest.get('md5Checksum') != source_manifest.get('md5Checksum'))
+            to_copy = diff['added'] + diff['changed'] + ([MANIFEST_NAME] if manifest_changed else [])
+            to_delete = [active_files[path]['id'] for path in diff['removed'] + diff['changed']]
+            if manifest_changed and active_manifest:
+                to_delete.append(active_manifest['id'])
+
+            apply_started = time.perf_counter()
+            # Create missing subfolders, parents before children
+            needed_dirs = {path.rsplit('/', 1)[0] for path in to_copy if '/' in path}
+            for directory in sorted({'/'.join(d.split('/')[:i + 1]) for d in needed_dirs for i in range(d.count('/') + 1)},
+                                    key=lambda d: d.count('/')):
+                if directory not in active_dirs:
+                    parent = active_dirs[directory.rsplit('/', 1)[0] if '/' in directory else '']
+                    created = self.drive_service.create_folder(directory.rsplit('/', 1)[-1], parent)
+                    if not created:
+                        raise RuntimeError(f"Could not create folder {directory}")
+                    active_dirs[directory] = created['id']
+
+            copies = {}
+            failures = []
+            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_COPIES) as executor:
+                futures = {path: executor.submit(self._copy_file, source_files[path],
+                                                 active_dirs[path.rsplit('/', 1)[0] if '/' in path else ''])
+                           for path in to_copy}
+                for path, future in futures.items():
+                    try:
+                        copies[path] = future.result()
+                    except Exception as e:
+                        print(f"[WARNING] Could not copy file {path}: {e}", file=sys.stderr)
+                        failures.append(path)
+            if failures:
+                # Old versions are still in place; remove the partial new copies
+                self._delete_files([copy['id'] for copy in copies.values()])
+                return {'success': False, 'error': f"Could not copy: {', '.join(sorted(failures))}"}
+
+            deleted = self._delete_files(to_delete) if to_delete else []
+
+            # Rename the folder and refresh its manifest summary
+            manifest_copy = copies.get(MANIFEST_NAME) or active_manifest
+            self.drive_service.execute(self.drive_service.service.files().update(
+                fileId=active_folder['id'],
+                body={'name': gesture_set_name,
+                      'properties': folder_properties(manifest, manifest_copy['id'] if manifest_copy else '')},
+                fields='id'
+            ), 'write')
+            apply_ms = round((time.perf_counter() - apply_started) * 1000)
+
+            mismatches = self._verify_copy(manifest, self._list_tree(active_folder['id']))
+            if mismatches:
+                print(f"[WARNING] Incremental publish left differences ({', '.join(mismatches)}), "
+                      f"republishing a full copy", file=sys.stderr)
+                result = self._publish_by_copy(gesture_set_id, gesture_set_name)
+                result['fallback'] = 'copy'
+                return result
+
+            print(f"[INFO] Incrementally published {gesture_set_name}: {len(diff['added'])} added, "
+                  f"{len(diff['changed'])} replaced, {len(diff['removed'])} removed", file=sys.stderr)
+            return {
+                'success': True,
+                'mode': 'incremental',
+                'old_set_moved': active_folder['name'] != gesture_set_name,
+                'new_set_moved': True,
+                'old_set_name': active_folder['name'],
+                'new_set_name': gesture_set_name,
+                'gesture_count': manifest['gesture_count'],
+                'content_hash': manifest['content_hash'],
+                'changes': {
+                    'added': diff['added'],
+                    'replaced': diff['changed'],
+                    'removed': diff['removed'],
+                    'unchanged': len(diff['unchanged']),
+                    'files_copied': len(copies),
+                    'files_deleted': len(deleted)
+                },
+                'timings': {
+                    'diff_ms': diff_ms,
+                    'apply_ms': apply_ms,
+                    'publish_ms': round((time.perf_counter() - started) * 1000)
+                }
+            }
+
+        except Exception as e:
+            print(f"[ERROR] Error publishing gesture set incrementally: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def _set_trashed(self, file_id, trashed):
+        self.drive_service.execute(self.drive_service.service.files().update(
+            fileId=file_id, body={'trashed': trashed}), 'write')
     
+    @staticmethod
+    def _split_duplicates(gesture_sets):
+        """
+        Separate duplicate gesture sets (same name) from the ones to keep
+
+        Args:
+            gesture_sets (list): List of gesture set dictionaries
+
+        Returns:
+            tuple: (list keeping the newest set per name, list of older duplicates)
+        """
+        # Group by name to find duplicates
+        name_groups = {}
+        for gs in gesture_sets:
+            name_groups.setdefault(gs['name'], []).append(gs)
+
+        kept = []
+        duplicates = []
+        for name, group in name_groups.items():
+            if len(group) > 1:
+                # Sort by modified time (keep the newest)
+                group.sort(key=lambda x: x['modified_time'], reverse=True)
+                print(f"[CLEANUP] Found {len(group)} duplicates for '{name}', keeping newest", file=sys.stderr)
+                duplicates.extend(group[1:])
+            kept.append(group[0])
+        return kept, duplicates
+
     def _cleanup_duplicates(self, gesture_sets):
         """
-        Remove duplicate gesture set folders (keep the newest)
+        Hide duplicate gesture set folders
+
+        Duplicates are filtered out of the returned list right away, so a
+        listing never waits for the deletes. A long-lived process deletes
+        them in a background thread; a one-shot process exits right away and
+        leaves them to the maintenance pass (cleanup_duplicates).
         
         Args:
             gesture_sets (list): List of gesture set dictionaries
@@ -291,45 +1220,56 @@ class GestureSetDriveService:
             list: Cleaned list without duplicates
         """
         try:
-            # Group by name to find duplicates
-            name_groups = {}
-            for gs in gesture_sets:
-                name = gs['name']
-                if name not in name_groups:
-                    name_groups[name] = []
-                name_groups[name].append(gs)
-            
-            # Process duplicates
-            cleaned_sets = []
-            for name, group in name_groups.items():
-                if len(group) > 1:
-                    # Sort by modified time (keep the newest)
-                    group.sort(key=lambda x: x['modified_time'], reverse=True)
-                    
-                    # Keep the first (newest), delete the rest
-                    keep = group[0]
-                    delete = group[1:]
-                    
-                    print(f"[CLEANUP] Found {len(group)} duplicates for '{name}', keeping newest", file=sys.stderr)
-                    
-                    for gs in delete:
-                        try:
-                            # Delete the duplicate folder
-                            self.drive_service.service.files().delete(fileId=gs['id']).execute()
-                            print(f"[CLEANUP] Deleted duplicate: {gs['id']}", file=sys.stderr)
-                        except Exception as e:
-                            print(f"[CLEANUP] Error deleting {gs['id']}: {e}", file=sys.stderr)
-                    
-                    cleaned_sets.append(keep)
-                else:
-                    cleaned_sets.append(group[0])
-            
-            return cleaned_sets
+            kept, duplicates = self._split_duplicates(gesture_sets)
+            if not self.background_cleanup:
+                if duplicates:
+                    print(f"[CLEANUP] Hiding {len(duplicates)} duplicate gesture sets until the maintenance pass "
+                          f"deletes them (gesture_set_api.py cleanup_duplicates)", file=sys.stderr)
+                return kept
+            with self._cleanup_lock:
+                to_delete = [gs['id'] for gs in duplicates if gs['id'] not in self._cleanup_pending]
+                self._cleanup_pending.update(to_delete)
+            if to_delete:
+                # Whatever an exit interrupts is found again by the next listing or maintenance pass
+                threading.Thread(target=self._delete_pending_duplicates, args=(to_delete,),
+                                 name='duplicate-cleanup', daemon=True).start()
+            return kept
             
         except Exception as e:
             print(f"[ERROR] Error during cleanup: {e}", file=sys.stderr)
             return gesture_sets  # Return original list if cleanup fails
 
+    def _delete_pending_duplicates(self, folder_ids):
+        try:
+            return self._delete_files(folder_ids)
+        except Exception as e:
+            print(f"[CLEANUP] Duplicate cleanup failed: {e}", file=sys.stderr)
+            return []
+        finally:
+            with self._cleanup_lock:
+                self._cleanup_pending.difference_update(folder_ids)
+
+    def cleanup_duplicates(self):
+        """
+        Maintenance pass: find duplicate gesture sets on Drive and delete them now
+
+        Returns: dict with the number of duplicates found and deleted
+        """
+        folders = self.ensure_base_folders()
+        if not folders:
+            raise RuntimeError("Base folders are not available")
+        query = f"'{folders['gesture_sets_id']}' in parents and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+        gesture_sets = [{'id': folder['id'], 'name': folder['name'], 'modified_time': folder.get('modifiedTime', '')}
+                        for folder in self.drive_service.search_all_files(query)]
+        _, duplicates = self._split_duplicates(gesture_sets)
+        with self._cleanup_lock:
+            to_delete = [gs['id'] for gs in duplicates if gs['id'] not in self._cleanup_pending]
+            self._cleanup_pending.update(to_delete)
+        deleted = self._delete_pending_duplicates(to_delete) if to_delete else []
+        if deleted:
+            self._cache.invalidate('gesture_sets')
+        return {'duplicates': len(duplicates), 'deleted': len(deleted)}
+
 # Example usage
 if __name__ == "__main__":
     service = GestureSetDriveService()
@@ -0,0 +1,162 @@
+"""
+Gesture set manifests
+
+Every gesture set folder carries a manifest.json listing its files with
+Drive IDs, sizes and md5 checksums, the gesture names and the model version.
+A short summary (gesture count, model version, content hash, manifest file
+ID) is also stored in the set folder's Drive properties, so listing sets
+needs no extra request per set.
+
+These helpers only build and compare manifests; reading and writing them on
+Drive is done by GestureSetDriveService.
+"""
+
+import datetime
+import hashlib
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT_VERSION = 1
+
+# Bookkeeping files that live next to gestures but are not gestures
+RESERVED_NAMES = (MANIFEST_NAME, 'active_set.json')
+GESTURE_EXTENSIONS = ('.pkl', '.json')
+
+def is_gesture_file(path):
+    """
+    Check whether a file of a gesture set counts as a gesture
+
+    Args:
+        path (str): File name or path relative to the set folder
+
+    Returns:
+        bool: True for .pkl/.json files that are not reserved names
+    """
+    name = path.rsplit('/', 1)[-1]
+    return name not in RESERVED_NAMES and any(extension in name for extension in GESTURE_EXTENSIONS)
+
+def file_entry(relative_path, file):
+    """
+    Manifest entry of a Drive file
+
+    Args:
+        relative_path (str): Path relative to the set folder
+        file (dict): Drive file metadata (id, size, md5Checksum)
+    """
+    return {
+        'path': relative_path,
+        'id': file['id'],
+        'size': int(file['size']) if file.get('size') else None,
+        'md5': file.get('md5Checksum')
+    }
+
+def content_hash(files):
+    """
+    Hash of a set's content (paths and checksums), independent of Drive IDs
+
+    Two sets with the same content hash contain the same files.
+    """
+    digest = hashlib.sha256()
+    for entry in sorted(files, key=lambda entry: entry['path']):
+        digest.update(f"{entry['path']}\0{entry['md5'] or entry['size'] or ''}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def gesture_summary(files):
+    """
+    Count and hash of a set's gestures (top-level gesture files)
+
+    Works on manifest entries as well as on a plain listing of the set
+    folder, so a stored summary can be checked against Drive with one
+    batched children query.
+
+    Args:
+        files (list): File entries (see file_entry)
+
+    Returns:
+        dict: 'gesture_count' and 'gesture_hash'
+    """
+    gestures = [entry for entry in files if '/' not in entry['path'] and is_gesture_file(entry['path'])]
+    return {'gesture_count': len(gestures), 'gesture_hash': content_hash(gestures)}
+
+def build_manifest(gesture_set_name, tree, model_version=None):
+    """
+    Build the manifest of a gesture set from its file listing
+
+    Args:
+        gesture_set_name (str): Name of the set
+        tree (list): (relative path, Drive file metadata) for every file of the set
+        model_version (str): Version label of the model the set belongs to (optional)
+
+    Returns:
+        dict: Manifest
+    """
+    files = [file_entry(relative_path, file)
+             for relative_path, file in sorted(tree, key=lambda entry: entry[0])
+             if relative_path != MANIFEST_NAME]
+    gestures = [entry for entry in files if '/' not in entry['path'] and is_gesture_file(entry['path'])]
+    return {
+        'manifest_version': MANIFEST_FORMAT_VERSION,
+        'gesture_set_name': gesture_set_name,
+        'model_version': model_version,
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'gesture_count': len(gestures),
+        'gesture_hash': gesture_summary(files)['gesture_hash'],
+        'gestures': sorted({entry['path'].rsplit('.', 1)[0] for entry in gestures}),
+        'total_size': sum(entry['size'] or 0 for entry in files),
+        'content_hash': content_hash(files),
+        'files': files
+    }
+
+def diff_manifests(old, new):
+    """
+    Compare two manifests file by file
+
+    Files are matched by relative path and compared by md5 (by size for
+    files without a checksum).
+
+    Returns:
+        dict: Sorted path lists 'added', 'removed', 'changed', 'unchanged'
+              and 'identical' (bool)
+    """
+    old_files = {entry['path']: entry for entry in old['files']}
+    new_files = {entry['path']: entry for entry in new['files']}
+    changed, unchanged = [], []
+    for path in sorted(old_files.keys() & new_files.keys()):
+        old_entry, new_entry = old_files[path], new_files[path]
+        if (old_entry['md5'], old_entry['size']) == (new_entry['md5'], new_entry['size']):
+            unchanged.append(path)
+        else:
+            changed.append(path)
+    added = sorted(new_files.keys() - old_files.keys())
+    removed = sorted(old_files.keys() - new_files.keys())
+    return {
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'unchanged': unchanged,
+        'identical': not (added or removed or changed)
+    }
+
+def validate_tree(manifest, tree):
+    """
+    Check a file listing (e.g. a freshly copied set) against a manifest
+
+    Returns:
+        list: Relative paths that are missing, extra or differ from the manifest
+    """
+    actual = build_manifest(manifest['gesture_set_name'], tree)
+    diff = diff_manifests(manifest, actual)
+    return sorted(diff['added'] + diff['removed'] + diff['changed'])
+
+def folder_properties(manifest, manifest_file_id):
+    """
+    Manifest summary stored as Drive properties of the set folder
+
+    Drive properties are strings of at most 124 bytes per key and value.
+    """
+    return {
+        'manifest_file_id': manifest_file_id,
+        'gesture_count': str(manifest['gesture_count']),
+        'gesture_hash': manifest.get('gesture_hash', ''),
+        'content_hash': manifest['content_hash'],
+        'model_version': (manifest.get('model_version') or '')[:64]
+    }
@@ -1,14 +1,141 @@
 import os
 import io
+import sys
+import ssl
+import json
+import time
+import random
+import hashlib
+import socket
+import tempfile
+import datetime
+import threading
+import contextlib
+import http.client
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
+# Resumable upload chunk size, must be a multiple of 256 KiB
+DEFAULT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_CHUNK_ALIGNMENT = 256 * 1024
+
+# Download chunk size: one ranged request per chunk, and the resume granularity of .part files
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Drive keeps resumable upload sessions for about a week
+UPLOAD_SESSION_MAX_AGE = 6 * 24 * 60 * 60
+
+# Read size when hashing a finished download
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Retries allowed per kind of Drive operation (after the first attempt)
+RETRY_BUDGETS = {
+    'read': 5,
+    'write': 3,
+    'delete': 3,
+    'upload': 5,
+    'download': 5
+}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, socket.timeout, ssl.SSLError, http.client.HTTPException)
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+LISTING_FIELDS = 'id, name, mimeType, size, md5Checksum, modifiedTime, parents'
+
+# Parent IDs combined into one "'a' in parents or 'b' in parents" query, and how
+# many of those queries run at once
+PARENTS_PER_QUERY = 40
+MAX_PARALLEL_QUERIES = 8
+
+# Refresh the access token in the background this long before it expires
+TOKEN_REFRESH_MARGIN_SECONDS = 5 * 60
+
+# Client-side request rate (requests per second and burst size)
+DEFAULT_MAX_REQUESTS_PER_SECOND = 10
+DEFAULT_REQUEST_BURST = 20
+
+# Requests per HTTP batch (Drive accepts at most 100)
+MAX_BATCH_SIZE = 100
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket used to pace Drive requests
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Take tokens, sleeping until they are available
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the tokens even when the bucket is empty so waiters queue up in order
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+@contextlib.contextmanager
+def _token_file_lock(token_file):
+    """
+    Exclusive inter-process lock around reading, refreshing and writing token_file
+
+    Parallel scripts share one token.json; without the lock two refreshes can
+    interleave their writes and leave a truncated file behind.
+    """
+    with open(f"{token_file}.lock", 'a+') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 seconds, keep waiting
+                    time.sleep(0.1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 class GoogleDriveOAuthService:
-    def __init__(self, credentials_file='credentials.json', token_file='token.json', scopes=None):
+    def __init__(self, credentials_file='credentials.json', token_file='token.json', scopes=None,
+                 upload_chunk_size=None, upload_journal_file=None, download_chunk_size=None,
+                 max_requests_per_second=None):
         """
         Initialize Google Drive service with OAuth 2.0 credentials
 
@@ -16,52 +143,303 @@ class GoogleDriveOAuthService:
             credentials_file (str): Path to OAuth 2.0 client secrets JSON file
             token_file (str): Path to token file for storing access tokens
             scopes (list): List of scopes for authentication
+            upload_chunk_size (int): Resumable upload chunk size in bytes (optional,
+                defaults to DRIVE_UPLOAD_CHUNK_SIZE env var or 8 MiB)
+            upload_journal_file (str): Path to the journal of open upload sessions (optional)
+            download_chunk_size (int): Download chunk size in bytes (optional,
+                defaults to DRIVE_DOWNLOAD_CHUNK_SIZE env var or 32 MiB)
+            max_requests_per_second (float): Client-side request rate limit (optional,
+                defaults to DRIVE_MAX_REQUESTS_PER_SECOND env var or 10)
         """
         if scopes is None:
             scopes = ['https://www.googleapis.com/auth/drive']
 
+        if upload_chunk_size is None:
+            upload_chunk_size = int(os.environ.get('DRIVE_UPLOAD_CHUNK_SIZE', DEFAULT_UPLOAD_CHUNK_SIZE))
+        if download_chunk_size is None:
+            download_chunk_size = int(os.environ.get('DRIVE_DOWNLOAD_CHUNK_SIZE', DEFAULT_DOWNLOAD_CHUNK_SIZE))
+        if max_requests_per_second is None:
+            max_requests_per_second = float(os.environ.get('DRIVE_MAX_REQUESTS_PER_SECOND', DEFAULT_MAX_REQUESTS_PER_SECOND))
+        if upload_journal_file is None:
+            upload_journal_file = os.path.join(os.path.dirname(os.path.abspath(token_file)), 'upload_journal.json')
+
         self.credentials_file = credentials_file
         self.token_file = token_file
         self.scopes = scopes
         self.creds = None
+        self.upload_chunk_size = self._align_chunk_size(upload_chunk_size)
+        self.upload_journal_file = upload_journal_file
+        self.download_chunk_size = download_chunk_size
+        self._journal_lock = threading.Lock()
+        self._rate_limiter = _TokenBucket(max_requests_per_second, DEFAULT_REQUEST_BURST)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {'calls': 0, 'retries': 0, 'throttled': 0, 'throttle_wait_seconds': 0.0, 'failures': 0,
+                        'batched_requests': 0}
+        self._refresher = None
+        self._thread_local = threading.local()
 
         try:
+            started = time.perf_counter()
+
             # Load or refresh credentials
             self.creds = self._get_credentials()
             
-            # Build the Drive API service
-            self.service = build('drive', 'v3', credentials=self.creds)
-            print("[SUCCESS] Google Drive OAuth service initialized successfully")
+            # Build the Drive API service from the discovery document bundled with
+            # the client library instead of fetching and parsing it over the network
+            self.service = build('drive', 'v3', credentials=self.creds,
+                                 static_discovery=True, cache_discovery=False)
+            self.init_seconds = time.perf_counter() - started
+            print(f"[SUCCESS] Google Drive OAuth service initialized successfully in {self.init_seconds * 1000:.0f} ms",
+                  file=sys.stderr)
 
         except Exception as e:
-            print(f"[ERROR] Failed to initialize Google Drive OAuth service: {e}")
+            print(f"[ERROR] Failed to initialize Google Drive OAuth service: {e}", file=sys.stderr)
             raise
 
     def _get_credentials(self):
         """
         Get valid credentials, refreshing if necessary
         """
-        creds = None
-        
-        # Check if token file exists
-        if os.path.exists(self.token_file):
-            creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
-        
-        # If there are no (valid) credentials available, let the user log in
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_file, self.scopes)
-                creds = flow.run_local_server(port=0)
+        with _token_file_lock(self.token_file):
+            creds = None
             
-            # Save the credentials for the next run
-            with open(self.token_file, 'w') as token:
-                token.write(creds.to_json())
+            # Check if token file exists
+            if os.path.exists(self.token_file):
+                creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+            
+            # If there are no (valid) credentials available, let the user log in
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    creds.refresh(Request())
+                else:
+                    flow = InstalledAppFlow.from_client_secrets_file(
+                        self.credentials_file, self.scopes)
+                    creds = flow.run_local_server(port=0)
+                
+                # Save the credentials for the next run
+                self._save_token(creds)
         
         return creds
 
+    def _save_token(self, creds):
+        # Write to a temporary file first so readers never see a half-written token
+        tmp_file = f"{self.token_file}.tmp"
+        with open(tmp_file, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(tmp_file, self.token_file)
+
+    def start_token_refresher(self):
+        """
+        Refresh the access token in a background thread shortly before it expires,
+        so requests never pay for a token refresh themselves
+        """
+        if self._refresher is not None or not getattr(self.creds, 'refresh_token', None):
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name='drive-token-refresher', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            if self.creds.expiry is None:
+                return
+            # Credentials.expiry is a naive UTC datetime
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            wait = (self.creds.expiry - now).total_seconds() - TOKEN_REFRESH_MARGIN_SECONDS
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self._refresh_credentials()
+            except Exception as e:
+                print(f"[WARNING] Background token refresh failed: {e}", file=sys.stderr)
+                time.sleep(60)
+
+    def _refresh_credentials(self):
+        with _token_file_lock(self.token_file):
+            # Another process may already have refreshed and saved a newer token
+            if os.path.exists(self.token_file):
+                saved = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+                if saved.expiry and self.creds.expiry and saved.expiry > self.creds.expiry:
+                    self.creds.token = saved.token
+                    self.creds.expiry = saved.expiry
+                    return
+            self.creds.refresh(Request())
+            self._save_token(self.creds)
+        # Runs in the background: keep stdout clean for scripts that print JSON results
+        print("[INFO] Refreshed Google Drive access token", file=sys.stderr)
+
+    def execute(self, request, operation='read'):
+        """
+        Execute a Drive API request with rate limiting, retries and backoff
+
+        Args:
+            request: googleapiclient HttpRequest (e.g. service.files().list(...))
+            operation (str): Operation kind used to pick the retry budget
+                ('read', 'write', 'delete', 'upload' or 'download')
+
+        Returns:
+            dict: Response of the request
+
+        Raises:
+            HttpError or transport error once the retry budget is used up
+        """
+        http = self._http_for_thread()
+        if http is not None:
+            return self._call_with_retry(lambda: request.execute(http=http), operation)
+        return self._call_with_retry(request.execute, operation)
+
+    def execute_batch(self, requests, operation='write'):
+        """
+        Execute many Drive requests in HTTP batches of up to MAX_BATCH_SIZE
+
+        Every request in a batch takes a rate limiter token, so large batches
+        are paced like individual calls. Requests that fail with a retryable
+        error are retried together in a later batch.
+
+        Args:
+            requests (list): googleapiclient HttpRequests
+            operation (str): Operation kind used to pick the retry budget
+
+        Returns:
+            list: Response (or the exception that made it fail) per request, in order
+        """
+        results = [None] * len(requests)
+        budget = RETRY_BUDGETS.get(operation, RETRY_BUDGETS['read'])
+        pending = list(range(len(requests)))
+        attempt = 0
+        while pending:
+            retry = []
+            delay = 0.0
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                chunk = pending[start:start + MAX_BATCH_SIZE]
+                errors = {}
+
+                def callback(request_id, response, exception, errors=errors):
+                    if exception is None:
+                        results[int(request_id)] = response
+                    else:
+                        errors[int(request_id)] = exception
+
+                batch = self.service.new_batch_http_request(callback=callback)
+                for index in chunk:
+                    batch.add(requests[index], request_id=str(index))
+                if len(chunk) > 1:
+                    self._count('throttle_wait_seconds', self._rate_limiter.acquire(len(chunk) - 1))
+                self._count('batched_requests', len(chunk))
+                http = self._http_for_thread()
+                self._call_with_retry(lambda: batch.execute(http=http), operation)
+
+                for index, error in errors.items():
+                    error_delay, throttled = self._retry_delay(error, attempt)
+                    if error_delay is None or attempt >= budget:
+                        self._count('failures')
+                        results[index] = error
+                        continue
+                    retry.append(index)
+                    delay = max(delay, error_delay)
+                    if throttled:
+                        self._count('throttled')
+
+            if retry:
+                attempt += 1
+                self._count('retries', len(retry))
+                print(f"[RETRY] {len(retry)} batched Drive {operation} requests failed, "
+                      f"retry {attempt}/{budget} in {delay:.1f}s", file=sys.stderr)
+                time.sleep(delay)
+            pending = retry
+        return results
+
+    def _http_for_thread(self):
+        """
+        Authorized HTTP transport for the calling worker thread
+
+        httplib2 connections are not thread-safe, so requests issued from worker
+        threads get their own transport. The main thread keeps the service default.
+
+        Returns:
+            AuthorizedHttp for worker threads, None on the main thread
+        """
+        if threading.current_thread() is threading.main_thread():
+            return None
+        http = getattr(self._thread_local, 'http', None)
+        if http is None:
+            import httplib2
+            import google_auth_httplib2
+            http = google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._thread_local.http = http
+        return http
+
+    def _call_with_retry(self, call, operation):
+        """
+        Run a zero-argument Drive call, retrying transient failures
+
+        429/5xx responses, Drive rate limit 403s and dropped connections are
+        retried with exponential backoff plus jitter, honouring Retry-After.
+        """
+        budget = RETRY_BUDGETS.get(operation, RETRY_BUDGETS['read'])
+        attempt = 0
+        while True:
+            waited = self._rate_limiter.acquire()
+            self._count('calls')
+            if waited:
+                self._count('throttle_wait_seconds', waited)
+            try:
+                return call()
+            except Exception as e:
+                delay, throttled = self._retry_delay(e, attempt)
+                if delay is None or attempt >= budget:
+                    self._count('failures')
+                    raise
+                attempt += 1
+                self._count('retries')
+                if throttled:
+                    self._count('throttled')
+                print(f"[RETRY] Drive {operation} failed ({e}), retry {attempt}/{budget} in {delay:.1f}s",
+                      file=sys.stderr)
+                time.sleep(delay)
+
+    @staticmethod
+    def _retry_delay(error, attempt):
+        """
+        Decide whether an error is retryable
+
+        Returns:
+            tuple: (delay in seconds or None if not retryable, whether Drive throttled us)
+        """
+        throttled = False
+        retry_after = None
+        if isinstance(error, HttpError):
+            status = error.resp.status
+            if status == 403:
+                if not any(reason in str(error.content) for reason in RATE_LIMIT_REASONS):
+                    return None, False
+                throttled = True
+            elif status not in RETRYABLE_STATUS_CODES:
+                return None, False
+            throttled = throttled or status == 429
+            retry_after = error.resp.get('retry-after')
+        elif not isinstance(error, TRANSIENT_ERRORS):
+            return None, False
+
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX_SECONDS * 4), throttled
+            except ValueError:
+                pass
+        # Exponential backoff with equal jitter
+        backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return backoff / 2 + random.uniform(0, backoff / 2), throttled
+
+    def _count(self, metric, amount=1):
+        with self._metrics_lock:
+            self.metrics[metric] += amount
+
+    def get_metrics(self):
+        """
+        Snapshot of request counters (calls, retries, throttled, failures)
+        """
+        with self._metrics_lock:
+            return dict(self.metrics)
+
     def list_files(self, folder_id=None, query=None, page_size=100):
         """
         List files in Google Drive
@@ -81,36 +459,41 @@ class GoogleDriveOAuthService:
                 else:
                     query = "trashed=false"
 
-            results = self.service.files().list(
+            results = self.execute(self.service.files().list(
                 q=query,
                 pageSize=page_size,
                 fields="nextPageToken, files(id, name, mimeType, size, modifiedTime, parents)"
-            ).execute()
+            ))
 
             files = results.get('files', [])
-            print(f"[INFO] Found {len(files)} files")
+            print(f"[INFO] Found {len(files)} files", file=sys.stderr)
             return files
 
         except HttpError as e:
-            print(f"[ERROR] Error listing files: {e}")
+            print(f"[ERROR] Error listing files: {e}", file=sys.stderr)
             return []
 
-    def upload_file(self, file_path, file_name=None, folder_id=None, mime_type=None):
+    def upload_file(self, file_path, file_name=None, folder_id=None, mime_type=None, chunk_size=None):
         """
         Upload a file to Google Drive
 
+        The upload is sent in chunks through a resumable session. The session URI
+        is saved to the upload journal, so uploading the same file again after a
+        crash or dropped connection resumes from the last committed chunk.
+
         Args:
             file_path (str): Local path to the file
             file_name (str): Name for the file in Drive (optional)
             folder_id (str): ID of the folder to upload to (optional)
             mime_type (str): MIME type of the file (optional)
+            chunk_size (int): Chunk size in bytes (optional, defaults to upload_chunk_size)
 
         Returns:
             dict: File metadata if successful, None if failed
         """
         try:
             if not os.path.exists(file_path):
-                print(f"[ERROR] File not found: {file_path}")
+                print(f"[ERROR] File not found: {file_path}", file=sys.stderr)
                 return None
 
             # Get file name if not provided
@@ -133,42 +516,219 @@ class GoogleDriveOAuthService:
             if folder_id:
                 file_metadata['parents'] = [folder_id]
 
-            # Create media upload object
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+            chunk_size = self._align_chunk_size(chunk_size) if chunk_size else self.upload_chunk_size
+            journal_key = self._upload_journal_key(file_path, file_name, folder_id)
+            file_size = os.path.getsize(file_path)
+            started = time.time()
 
-            # Upload file
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,mimeType,size,modifiedTime,webViewLink'
-            ).execute()
+            try:
+                file = self._upload_resumable(file_path, file_metadata, mime_type, chunk_size, journal_key)
+            except HttpError as e:
+                # The saved session expired or was cancelled on the server: start a new one
+                if e.resp.status in (404, 410) and self._journal_pop(journal_key):
+                    print(f"[RESUME] Upload session for {file_name} expired, restarting from byte 0", file=sys.stderr)
+                    file = self._upload_resumable(file_path, file_metadata, mime_type, chunk_size, journal_key)
+                else:
+                    raise
 
-            print(f"[SUCCESS] File uploaded successfully: {file_name} (ID: {file.get('id')})")
+            elapsed = max(time.time() - started, 1e-6)
+            print(f"[SUCCESS] File uploaded successfully: {file_name} (ID: {file.get('id')}, "
+                  f"{file_size / 1024 / 1024:.2f} MB in {elapsed:.2f}s, {file_size / 1024 / 1024 / elapsed:.2f} MB/s)",
+                  file=sys.stderr)
             return file
 
         except HttpError as e:
-            print(f"[ERROR] Error uploading file: {e}")
+            print(f"[ERROR] Error uploading file: {e}", file=sys.stderr)
             return None
         except Exception as e:
-            print(f"[ERROR] Unexpected error uploading file: {e}")
+            print(f"[ERROR] Unexpected error uploading file: {e}", file=sys.stderr)
             return None
 
-    def download_file(self, file_id, local_path=None, file_name=None):
+    def _upload_resumable(self, file_path, file_metadata, mime_type, chunk_size, journal_key):
+        """
+        Drive a resumable upload chunk by chunk, recording the session URI in the journal
+        """
+        media = MediaFileUpload(file_path, mimetype=mime_type, chunksize=chunk_size, resumable=True)
+        request = self.service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id,name,mimeType,size,md5Checksum,modifiedTime,webViewLink'
+        )
+
+        session_uri = self._journal_get(journal_key)
+        if session_uri:
+            # Resume the saved session: in error state the client first asks the
+            # server which byte range is committed and continues from there
+            request.resumable_uri = session_uri
+            request._in_error_state = True
+            print(f"[RESUME] Resuming upload of {file_metadata['name']} from saved session", file=sys.stderr)
+
+        http = self._http_for_thread()
+        response = None
+        while response is None:
+            _, response = self._call_with_retry(lambda: request.next_chunk(http=http), 'upload')
+            if request.resumable_uri and request.resumable_uri != session_uri:
+                session_uri = request.resumable_uri
+                self._journal_put(journal_key, session_uri, file_path)
+
+        self._journal_pop(journal_key)
+        return response
+
+    @staticmethod
+    def _align_chunk_size(chunk_size):
+        """
+        Round a chunk size down to the 256 KiB multiple required by Drive
+        """
+        return max(UPLOAD_CHUNK_ALIGNMENT, int(chunk_size) // UPLOAD_CHUNK_ALIGNMENT * UPLOAD_CHUNK_ALIGNMENT)
+
+    @staticmethod
+    def _upload_journal_key(file_path, file_name, folder_id):
+        # Size and mtime are part of the key so a changed file never resumes a stale session
+        stat = os.stat(file_path)
+        return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{folder_id or ''}|{file_name}"
+
+    def _journal_load(self):
+        try:
+            with open(self.upload_journal_file, 'r') as journal:
+                return json.load(journal)
+        except (OSError, ValueError):
+            return {}
+
+    def _journal_save(self, entries):
+        # A unique temp file per write: another process may be saving at the same time
+        journal_dir = os.path.dirname(os.path.abspath(self.upload_journal_file))
+        fd, tmp_file = tempfile.mkstemp(
+            dir=journal_dir, prefix=f"{os.path.basename(self.upload_journal_file)}.", suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w') as journal:
+                json.dump(entries, journal, indent=2)
+            os.replace(tmp_file, self.upload_journal_file)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_file)
+            raise
+
+    def _journal_update(self, update):
+        """
+        Read-modify-write the journal under the thread and inter-process locks
+
+        The journal is shared by every process using the same token.json. It
+        only speeds up resuming, so a failure to read or write it is reported
+        and ignored and never fails the upload itself.
+
+        Args:
+            update (callable): Called with the entries dict; changes it in place and
+                returns (result, whether the entries changed)
+
+        Returns:
+            The result of update, or None if the journal could not be locked
+        """
+        try:
+            with self._journal_lock, _token_file_lock(self.upload_journal_file):
+                entries = self._journal_load()
+                result, changed = update(entries)
+                if changed:
+                    try:
+                        self._journal_save(entries)
+                    except OSError as e:
+                        print(f"[WARNING] Could not write upload journal {self.upload_journal_file}: {e}",
+                              file=sys.stderr)
+                return result
+        except OSError as e:
+            print(f"[WARNING] Could not lock upload journal {self.upload_journal_file}: {e}", file=sys.stderr)
+            return None
+
+    def _journal_get(self, key):
+        entry = self._journal_update(lambda entries: (entries.get(key), False))
+        if entry and time.time() - entry.get('started', 0) < UPLOAD_SESSION_MAX_AGE:
+            return entry['session_uri']
+        return None
+
+    def _journal_put(self, key, session_uri, file_path):
+        def put(entries):
+            # Drop sessions Drive has already expired
+            for expired in [k for k, v in entries.items()
+                            if time.time() - v.get('started', 0) >= UPLOAD_SESSION_MAX_AGE]:
+                del entries[expired]
+            entries[key] = {'session_uri': session_uri, 'file_path': file_path, 'started': time.time()}
+            return None, True
+        self._journal_update(put)
+
+    def _journal_pop(self, key):
+        def pop(entries):
+            entry = entries.pop(key, None)
+            return entry, entry is not None
+        return self._journal_update(pop)
+
+    def upload_bytes(self, data, file_name, folder_id=None, mime_type='application/octet-stream', file_id=None):
+        """
+        Upload in-memory content as a Drive file
+
+        Args:
+            data (bytes): File content
+            file_name (str): Name for the file in Drive
+            folder_id (str): ID of the folder to upload to (optional)
+            mime_type (str): MIME type of the content
+            file_id (str): Replace the content of this existing file instead of creating one (optional)
+
+        Returns:
+            dict: File metadata if successful, None if failed
+        """
+        try:
+            media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime_type)
+            fields = 'id,name,mimeType,size,md5Checksum,modifiedTime'
+            if file_id:
+                request = self.service.files().update(fileId=file_id, media_body=media, fields=fields)
+            else:
+                file_metadata = {'name': file_name}
+                if folder_id:
+                    file_metadata['parents'] = [folder_id]
+                request = self.service.files().create(body=file_metadata, media_body=media, fields=fields)
+
+            file = self.execute(request, 'write')
+            print(f"[SUCCESS] File uploaded successfully: {file_name} (ID: {file.get('id')}, {len(data)} bytes)",
+                  file=sys.stderr)
+            return file
+
+        except HttpError as e:
+            print(f"[ERROR] Error uploading {file_name}: {e}", file=sys.stderr)
+            return None
+
+    def download_file(self, file_id, local_path=None, file_name=None, chunk_size=None, verbose=False,
+                      metadata=None):
         """
         Download a file from Google Drive
 
+        Data is written to "<name>.part" with ranged requests and renamed into
+        place once complete. If a .part file is left over from an interrupted
+        download of the same file revision, the download continues after the
+        bytes it already holds. The revision (md5 and size) is recorded in a
+        "<name>.part.json" sidecar; a .part file of another revision is
+        discarded, and the finished file is checked against the md5.
+
         Args:
             file_id (str): ID of the file to download
             local_path (str): Local directory to save the file (optional)
-            file_name (str): Name for the downloaded file (optional)
+            file_name (str): Name for the downloaded file (optional, looked up when missing)
+            chunk_size (int): Bytes per ranged request (optional, defaults to download_chunk_size)
+            verbose (bool): Print progress after every chunk
+            metadata (dict): Drive metadata with size and md5Checksum if the caller
+                already listed the file (optional, looked up when missing)
 
         Returns:
             str: Path to downloaded file if successful, None if failed
         """
         try:
-            # Get file metadata
-            file_metadata = self.service.files().get(fileId=file_id).execute()
-            file_name = file_name or file_metadata.get('name', 'downloaded_file')
+            # Only ask Drive for metadata when the caller did not already pass it
+            if metadata is None or 'md5Checksum' not in metadata or (not file_name and 'name' not in metadata):
+                metadata = self.execute(self.service.files().get(fileId=file_id, fields='name, size, md5Checksum'))
+            file_name = file_name or metadata.get('name', 'downloaded_file')
+            revision = {
+                'file_id': file_id,
+                'md5Checksum': metadata.get('md5Checksum'),
+                'size': int(metadata['size']) if metadata.get('size') else None
+            }
 
             # Set download path
             if local_path:
@@ -177,22 +737,122 @@ class GoogleDriveOAuthService:
             else:
                 download_path = file_name
 
+            part_path = f"{download_path}.part"
+            sidecar_path = f"{part_path}.json"
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset and (self._read_sidecar(sidecar_path) != revision
+                           or (revision['size'] is not None and offset > revision['size'])):
+                print(f"[DOWNLOAD] Discarding partial {file_name}: it does not match the current Drive revision", file=sys.stderr)
+                os.remove(part_path)
+                offset = 0
+            if offset:
+                print(f"[DOWNLOAD] Resuming {file_name} from byte {offset}", file=sys.stderr)
+            else:
+                with open(sidecar_path, 'w', encoding='utf-8') as fh:
+                    json.dump(revision, fh)
+
             # Download file
-            request = self.service.files().get_media(fileId=file_id)
-            with io.FileIO(download_path, 'wb') as fh:
-                downloader = MediaIoBaseDownload(fh, request)
-                done = False
-                while done is False:
-                    status, done = downloader.next_chunk()
-                    print(f"[DOWNLOAD] Download {int(status.progress() * 100)}%.")
-
-            print(f"[SUCCESS] File downloaded successfully: {download_path}")
+            with open(part_path, 'ab') as fh:
+                size = self._download_into(fh, file_id, chunk_size, offset, verbose, file_name)
+
+            if revision['md5Checksum'] and _file_md5(part_path) != revision['md5Checksum']:
+                # Start from scratch next time instead of resuming corrupt data
+                os.remove(part_path)
+                os.remove(sidecar_path)
+                print(f"[ERROR] Downloaded {file_name} does not match its Drive md5", file=sys.stderr)
+                return None
+            os.replace(part_path, download_path)
+            os.remove(sidecar_path)
+
+            print(f"[SUCCESS] File downloaded successfully: {download_path} ({size} bytes)", file=sys.stderr)
             return download_path
 
         except HttpError as e:
-            print(f"[ERROR] Error downloading file: {e}")
+            print(f"[ERROR] Error downloading file: {e}", file=sys.stderr)
+            return None
+
+    @staticmethod
+    def _read_sidecar(sidecar_path):
+        try:
+            with open(sidecar_path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
             return None
 
+    def download_file_to_memory(self, file_id, buffer=None, chunk_size=None):
+        """
+        Download a file from Google Drive straight into memory
+
+        Args:
+            file_id (str): ID of the file to download
+            buffer: Writable file-like object to fill (optional, defaults to a new
+                io.BytesIO; a preallocated mmap.mmap also works)
+            chunk_size (int): Bytes per ranged request (optional, defaults to download_chunk_size)
+
+        Returns:
+            Buffer positioned at the start of the data if successful, None if failed
+        """
+        try:
+            if buffer is None:
+                buffer = io.BytesIO()
+            self._download_into(buffer, file_id, chunk_size, 0, False, file_id)
+            buffer.seek(0)
+            return buffer
+
+        except HttpError as e:
+            print(f"[ERROR] Error downloading file to memory: {e}", file=sys.stderr)
+            return None
+
+    def stream_file(self, file_id, fh, chunk_size=None):
+        """
+        Write a file's content to a stream (e.g. a pipe) chunk by chunk as it arrives
+
+        Unlike download_file_to_memory the stream is never rewound, so a
+        consumer reading the other end can process the data on the fly.
+
+        Args:
+            file_id (str): ID of the file to download
+            fh: Writable binary stream
+            chunk_size (int): Bytes per ranged request (optional, defaults to download_chunk_size)
+
+        Returns:
+            int: Number of bytes written
+
+        Raises:
+            HttpError: If the download fails
+        """
+        return self._download_into(fh, file_id, chunk_size, 0, False, file_id)
+
+    def _download_into(self, fh, file_id, chunk_size, offset, verbose, label):
+        """
+        Stream a file's content into fh with ranged requests starting at offset
+
+        Returns:
+            int: Total number of bytes of the file written so far (including offset)
+        """
+        request = self.service.files().get_media(fileId=file_id)
+        http = self._http_for_thread()
+        if http is not None:
+            request.http = http
+        downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size or self.download_chunk_size)
+        if offset:
+            # The Range header of every chunk starts at the downloader's progress
+            downloader._progress = offset
+
+        done = False
+        while not done:
+            try:
+                status, done = self._call_with_retry(downloader.next_chunk, 'download')
+            except HttpError as e:
+                # Range not satisfiable: the leftover .part file already holds the whole file
+                if offset and e.resp.status == 416:
+                    return offset
+                raise
+            if verbose:
+                print(f"[DOWNLOAD] {label}: {int(status.progress() * 100)}%", file=sys.stderr)
+
+        return downloader._progress
+
     def move_file(self, file_id, new_parent_id):
         """
         Move a file to a new parent folder
@@ -206,25 +866,25 @@ class GoogleDriveOAuthService:
         """
         try:
             # Get the current parents
-            file = self.service.files().get(fileId=file_id, fields='parents').execute()
+            file = self.execute(self.service.files().get(fileId=file_id, fields='parents'))
             previous_parents = ",".join(file.get('parents', []))
             
             # Move the file to the new parent
-            file = self.service.files().update(
+            file = self.execute(self.service.files().update(
                 fileId=file_id,
                 addParents=new_parent_id,
                 removeParents=previous_parents,
                 fields='id, parents'
-            ).execute()
+            ), 'write')
             
-            print(f"[MOVE] File moved successfully: {file_id}")
+            print(f"[MOVE] File moved successfully: {file_id}", file=sys.stderr)
             return file
             
         except HttpError as e:
-            print(f"[ERROR] Error moving file: {e}")
+            print(f"[ERROR] Error moving file: {e}", file=sys.stderr)
             return None
         except Exception as e:
-            print(f"[ERROR] Unexpected error downloading file: {e}")
+            print(f"[ERROR] Unexpected error moving file: {e}", file=sys.stderr)
             return None
 
     def create_folder(self, folder_name, parent_id=None):
@@ -247,16 +907,16 @@ class GoogleDriveOAuthService:
             if parent_id:
                 file_metadata['parents'] = [parent_id]
 
-            folder = self.service.files().create(
+            folder = self.execute(self.service.files().create(
                 body=file_metadata,
                 fields='id,name,mimeType,modifiedTime'
-            ).execute()
+            ), 'write')
 
-            print(f"[INFO] Folder created successfully: {folder_name} (ID: {folder.get('id')})")
+            print(f"[INFO] Folder created successfully: {folder_name} (ID: {folder.get('id')})", file=sys.stderr)
             return folder
 
         except HttpError as e:
-            print(f"[ERROR] Error creating folder: {e}")
+            print(f"[ERROR] Error creating folder: {e}", file=sys.stderr)
             return None
 
     def delete_file(self, file_id):
@@ -270,45 +930,204 @@ class GoogleDriveOAuthService:
             bool: True if successful, False if failed
         """
         try:
-            self.service.files().delete(fileId=file_id).execute()
-            print(f"[DELETE] File deleted successfully: {file_id}")
+            self.execute(self.service.files().delete(fileId=file_id), 'delete')
+            print(f"[DELETE] File deleted successfully: {file_id}", file=sys.stderr)
             return True
 
         except HttpError as e:
-            print(f"[ERROR] Error deleting file: {e}")
+            print(f"[ERROR] Error deleting file: {e}", file=sys.stderr)
             return False
 
-    def search_files(self, query, page_size=100):
+    def search_files(self, query, page_size=100, raise_errors=False):
         """
         Search for files in Google Drive
 
         Args:
             query (str): Search query
             page_size (int): Number of results to return
+            raise_errors (bool): Re-raise the error once retries are exhausted instead
+                of returning an empty list, so callers can tell "failed" from "not found"
 
         Returns:
             list: List of matching files
         """
         try:
-            results = self.service.files().list(
+            results = self.execute(self.service.files().list(
                 q=query,
                 pageSize=page_size,
                 fields="files(id, name, mimeType, size, modifiedTime, parents)"
-            ).execute()
+            ))
 
             files = results.get('files', [])
-            print(f"[SEARCH] Search found {len(files)} files")
+            print(f"[SEARCH] Search found {len(files)} files", file=sys.stderr)
             return files
 
         except HttpError as e:
-            print(f"[ERROR] Error searching files: {e}")
+            print(f"[ERROR] Error searching files: {e}", file=sys.stderr)
+            if raise_errors:
+                raise
             return []
 
+    def search_all_files(self, query, page_size=1000, fields=LISTING_FIELDS):
+        """
+        Search for files in Google Drive, following every result page
+
+        Unlike search_files this is not capped at one page, and errors are raised
+        once retries are exhausted.
+
+        Args:
+            query (str): Search query
+            page_size (int): Number of results per page
+            fields (str): File fields to return
+
+        Returns:
+            list: All matching files
+        """
+        files = []
+        page_token = None
+        while True:
+            results = self.execute(self.service.files().list(
+                q=query,
+                pageSize=page_size,
+                pageToken=page_token,
+                fields=f"nextPageToken, files({fields})"
+            ))
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+
+    def list_children(self, folder_ids, query=None, fields=LISTING_FIELDS):
+        """
+        List the children of many folders with batched parent queries
+
+        Folder IDs are combined into "'a' in parents or 'b' in parents ..." queries
+        of PARENTS_PER_QUERY IDs each, and the queries run concurrently, so the
+        number of round trips does not grow with the number of folders.
+
+        Args:
+            folder_ids (list): Parent folder IDs
+            query (str): Extra condition ANDed to the parent clause (optional)
+            fields (str): File fields to return
+
+        Returns:
+            dict: Parent folder ID -> list of child files (trashed items excluded)
+        """
+        folder_ids = list(dict.fromkeys(folder_ids))
+        children = {folder_id: [] for folder_id in folder_ids}
+        if not folder_ids:
+            return children
+
+        def list_chunk(chunk):
+            parents_clause = " or ".join(f"'{folder_id}' in parents" for folder_id in chunk)
+            chunk_query = f"({parents_clause}) and trashed=false"
+            if query:
+                chunk_query += f" and ({query})"
+            return self.search_all_files(chunk_query, fields=fields)
+
+        chunks = [folder_ids[i:i + PARENTS_PER_QUERY] for i in range(0, len(folder_ids), PARENTS_PER_QUERY)]
+        if len(chunks) == 1:
+            results = [list_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_QUERIES, len(chunks))) as executor:
+                results = list(executor.map(list_chunk, chunks))
+
+        for files in results:
+            for file in files:
+                for parent_id in file.get('parents', []):
+                    if parent_id in children:
+                        children[parent_id].append(file)
+        return children
+
+    def list_trees(self, root_ids, folders=None, fields=LISTING_FIELDS):
+        """
+        List every file below several folders, breadth first
+
+        Each level of all trees is listed together with list_children, so the
+        number of round trips grows with the depth of the trees, not with the
+        number of folders.
+
+        Args:
+            root_ids (list): Root folder IDs
+            folders (dict): If given, filled with root ID -> {relative folder path: folder ID}
+                ('' is the root itself)
+            fields (str): File fields to return
+
+        Returns:
+            dict: Root ID -> list of (relative path, file metadata)
+        """
+        trees = {root_id: [] for root_id in root_ids}
+        if folders is not None:
+            for root_id in root_ids:
+                folders[root_id] = {'': root_id}
+        if 'mimeType' not in fields:
+            fields = f"{fields}, mimeType"
+        level = [(root_id, root_id, '') for root_id in trees]
+        while level:
+            children = self.list_children([folder_id for folder_id, _, _ in level], fields=fields)
+            next_level = []
+            for folder_id, root_id, prefix in level:
+                for item in children[folder_id]:
+                    relative_path = f"{prefix}{item['name']}"
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        next_level.append((item['id'], root_id, f"{relative_path}/"))
+                        if folders is not None:
+                            folders[root_id][relative_path] = item['id']
+                    else:
+                        trees[root_id].append((relative_path, item))
+            level = next_level
+        return trees
+
+    def list_tree(self, folder_id, folders=None, fields=LISTING_FIELDS):
+        """
+        List every file below a folder, breadth first (see list_trees)
+
+        Args:
+            folders (dict): If given, filled with relative folder path -> folder ID
+
+        Returns:
+            list: (relative path, file metadata) for each file
+        """
+        tree_folders = {} if folders is not None else None
+        tree = self.list_trees([folder_id], tree_folders, fields)[folder_id]
+        if folders is not None:
+            folders.update(tree_folders[folder_id])
+        return tree
+
+
+_shared_services = {}
+_shared_services_lock = threading.Lock()
+
+def get_drive_service(credentials_file='credentials.json', token_file='token.json', **kwargs):
+    """
+    Get the process-wide GoogleDriveOAuthService for a credentials/token pair
+
+    The first call builds the client and starts the background token refresher;
+    later calls return the same instance, so credentials are read and the Drive
+    service is built only once per process.
+
+    Args:
+        credentials_file (str): Path to OAuth 2.0 client secrets JSON file
+        token_file (str): Path to token file for storing access tokens
+        **kwargs: Extra GoogleDriveOAuthService options, applied on first construction only
+
+    Returns:
+        GoogleDriveOAuthService: Shared service instance
+    """
+    key = (os.path.abspath(credentials_file), os.path.abspath(token_file))
+    with _shared_services_lock:
+        drive_service = _shared_services.get(key)
+        if drive_service is None:
+            drive_service = GoogleDriveOAuthService(credentials_file, token_file, **kwargs)
+            drive_service.start_token_refresher()
+            _shared_services[key] = drive_service
+    return drive_service
+
 
 # Example usage
 if __name__ == "__main__":
     # Initialize service
-    drive_service = GoogleDriveOAuthService()
+    drive_service = get_drive_service()
 
     # Example: List files in root
     files = drive_service.list_files()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Single-file bundles of a user's trained model folders
+
+Instead of one Drive folder per directory and one upload per file, bundle
+mode packs training_results/ and models/ into one compressed tar archive
+(zstd when the zstandard package is installed, gzip otherwise) and uploads
+it as one resumable file. The first archive member is a manifest listing
+every file with its size and md5; extraction checks the files against it.
+
+Downloading streams the archive through a pipe and extracts it while the
+bytes arrive, so the archive itself is never written to disk.
+
+Usage:
+    python model_bundle.py download --user-id 123 --dest ./user_123
+"""
+
+import os
+import sys
+import json
+import time
+import tarfile
+import hashlib
+import datetime
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BUNDLE_MANIFEST_NAME = 'bundle_manifest.json'
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_EXTENSIONS = {'zstd': '.tar.zst', 'gzip': '.tar.gz'}
+BUNDLE_BASENAME = 'model_bundle'
+ZSTD_LEVEL = 10
+HASH_BUFFER_SIZE = 1024 * 1024
+# Smaller ranged requests let extraction start sooner while the download continues
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
+def default_compression():
+    """
+    Returns: 'zstd' if the zstandard package is installed, else 'gzip'
+    """
+    return 'zstd' if zstandard is not None else 'gzip'
+
+def bundle_name(compression):
+    return f"{BUNDLE_BASENAME}{BUNDLE_EXTENSIONS[compression]}"
+
+def compression_of(file_name):
+    """
+    Returns: compression of a bundle file name, or None if it is not a bundle
+    """
+    for compression, extension in BUNDLE_EXTENSIONS.items():
+        if file_name.startswith(BUNDLE_BASENAME) and file_name.endswith(extension):
+            return compression
+    return None
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _collect_files(base_dir, folders):
+    files = []
+    for folder in folders:
+        root_dir = os.path.join(base_dir, folder)
+        for dirpath, dirnames, filenames in os.walk(root_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                files.append((os.path.relpath(path, base_dir).replace(os.sep, '/'), path))
+    return files
+
+def build_bundle(base_dir, folders, output_path, compression=None, info=None, files=None):
+    """
+    Pack folders of base_dir into one compressed tar archive
+
+    Args:
+        base_dir (str): Directory containing the folders (e.g. the user directory)
+        folders (list): Folder names relative to base_dir; missing ones are skipped
+        output_path (str): Archive file to write
+        compression (str): 'zstd' or 'gzip' (optional, default_compression())
+        info (dict): Extra fields for the manifest (optional)
+        files (list): Relative file paths to pack instead of everything below folders
+            (optional, e.g. the files of the artifact manifest)
+
+    Returns:
+        dict: Bundle manifest
+    """
+    compression = compression or default_compression()
+    if compression == 'zstd' and zstandard is None:
+        raise RuntimeError("zstd compression needs the zstandard package")
+
+    if files is None:
+        files = _collect_files(base_dir, [folder for folder in folders if os.path.isdir(os.path.join(base_dir, folder))])
+    else:
+        files = [(relative_path, os.path.join(base_dir, *relative_path.split('/'))) for relative_path in files]
+    manifest = dict(info or {}, **{
+        'bundle_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'compression': compression,
+        'folders': [folder for folder in folders if os.path.isdir(os.path.join(base_dir, folder))],
+        'total_size': sum(os.path.getsize(path) for _, path in files),
+        'files': [{'path': relative_path, 'size': os.path.getsize(path), 'md5': _file_md5(path)}
+                  for relative_path, path in files]
+    })
+    manifest_bytes = json.dumps(manifest, indent=2).encode('utf-8')
+
+    with open(output_path, 'wb') as raw:
+        if compression == 'zstd':
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+            tar = tarfile.open(fileobj=stream, mode='w|')
+        else:
+            stream = None
+            tar = tarfile.open(fileobj=raw, mode='w|gz')
+        with tar:
+            member = tarfile.TarInfo(BUNDLE_MANIFEST_NAME)
+            member.size = len(manifest_bytes)
+            member.mtime = int(time.time())
+            tar.addfile(member, fileobj=_BytesReader(manifest_bytes))
+            for relative_path, path in files:
+                tar.add(path, arcname=relative_path, recursive=False)
+        if stream is not None:
+            stream.close()
+    return manifest
+
+class _BytesReader:
+    """Minimal read() wrapper so tarfile can add in-memory content"""
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def read(self, size=-1):
+        end = len(self._data) if size is None or size < 0 else self._offset + size
+        chunk = self._data[self._offset:end].tobytes()
+        self._offset += len(chunk)
+        return chunk
+
+def _safe_target(dest_dir, member_name):
+    target = os.path.abspath(os.path.join(dest_dir, *member_name.split('/')))
+    if os.path.commonpath([target, os.path.abspath(dest_dir)]) != os.path.abspath(dest_dir):
+        raise ValueError(f"Refusing to extract {member_name} outside {dest_dir}")
+    return target
+
+def extract_bundle(stream, dest_dir, compression):
+    """
+    Extract a bundle from a non-seekable stream, checking files against its manifest
+
+    Args:
+        stream: Readable binary stream positioned at the start of the archive
+        dest_dir (str): Directory to extract into
+        compression (str): 'zstd' or 'gzip'
+
+    Returns:
+        dict: Bundle manifest
+
+    Raises:
+        ValueError: If the archive has no manifest or a file does not match it
+    """
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd bundles need the zstandard package")
+        tar = tarfile.open(fileobj=zstandard.ZstdDecompressor().stream_reader(stream), mode='r|')
+    else:
+        tar = tarfile.open(fileobj=stream, mode='r|gz')
+
+    manifest = None
+    extracted = {}
+    with tar:
+        for member in tar:
+            if member.name == BUNDLE_MANIFEST_NAME:
+                manifest = json.loads(tar.extractfile(member).read().decode('utf-8'))
+                continue
+            if manifest is None:
+                raise ValueError("Bundle does not start with a manifest")
+            if not member.isfile():
+                continue
+            target = _safe_target(dest_dir, member.name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            digest = hashlib.md5()
+            source = tar.extractfile(member)
+            with open(target, 'wb') as fh:
+                for block in iter(lambda: source.read(HASH_BUFFER_SIZE), b''):
+                    digest.update(block)
+                    fh.write(block)
+            extracted[member.name] = digest.hexdigest()
+
+    if manifest is None:
+        raise ValueError("Bundle does not contain a manifest")
+    expected = {entry['path']: entry['md5'] for entry in manifest['files']}
+    mismatched = sorted(path for path in expected.keys() | extracted.keys()
+                        if expected.get(path) != extracted.get(path))
+    if mismatched:
+        raise ValueError(f"Bundle content does not match its manifest: {', '.join(mismatched[:10])}")
+    return manifest
+
+class _ReaderClosed(Exception):
+    """
+    The extractor stopped reading the download pipe
+    """
+
+class _PipeWriter:
+    """
+    Write end of the download pipe
+
+    A write to a pipe whose reader is closed raises BrokenPipeError, which
+    the Drive layer cannot tell from a dropped connection and retries with
+    backoff. The wrapper raises _ReaderClosed instead, which is not retried,
+    so the download stops as soon as the extractor gives up.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, data):
+        try:
+            return self.writer.write(data)
+        except BrokenPipeError as e:
+            raise _ReaderClosed() from e
+
+def download_bundle(drive_service, file_id, dest_dir, compression, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Download a bundle from Drive and extract it while it downloads
+
+    The download runs in a thread writing into a pipe; the archive is
+    extracted from the other end, so it never touches the disk.
+
+    Args:
+        drive_service: GoogleDriveOAuthService instance
+        file_id (str): Drive ID of the bundle
+        dest_dir (str): Directory to extract into
+        compression (str): 'zstd' or 'gzip'
+        chunk_size (int): Bytes per ranged request
+
+    Returns:
+        dict: Bundle manifest
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, 'wb') as writer:
+                drive_service.stream_file(file_id, _PipeWriter(writer), chunk_size=chunk_size)
+        except (_ReaderClosed, BrokenPipeError):
+            pass  # the extractor stopped reading and reports its own error
+        except Exception as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        # Closing the reader on failure makes the producer's next write raise _ReaderClosed
+        with os.fdopen(read_fd, 'rb') as reader:
+            manifest = extract_bundle(reader, dest_dir, compression)
+    except Exception:
+        producer.join()
+        # A failed download shows up here as a truncated archive: report the download error
+        if errors:
+            raise errors[0]
+        raise
+    producer.join()
+    if errors:
+        raise errors[0]
+    return manifest
+
+def find_user_bundle(drive_service, user_id):
+    """
+    Find the bundle uploaded for a user under CustomGesture/user_<id>
+
+    Returns:
+        dict: Drive file metadata of the bundle, or None
+    """
+    custom_folders = drive_service.search_files("name='CustomGesture' and mimeType='application/vnd.google-apps.folder' and trashed=false")
+    if not custom_folders:
+        return None
+    user_folders = drive_service.search_files(
+        f"name='user_{user_id}' and '{custom_folders[0]['id']}' in parents "
+        f"and mimeType='application/vnd.google-apps.folder' and trashed=false")
+    if not user_folders:
+        return None
+    files = drive_service.search_files(
+        f"'{user_folders[0]['id']}' in parents and name contains '{BUNDLE_BASENAME}' and trashed=false")
+    bundles = [file for file in files if compression_of(file['name'])]
+    return bundles[0] if bundles else None
+
+if __name__ == "__main__":
+    import argparse
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from google_drive_oauth_service import get_drive_service
+
+    parser = argparse.ArgumentParser(description='Download and extract a user model bundle')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    download_parser = subparsers.add_parser('download', help='Stream a user bundle from CustomGesture and extract it')
+    download_parser.add_argument('--user-id', required=True, help='User ID')
+    download_parser.add_argument('--dest', required=True, help='Directory to extract into')
+    args = parser.parse_args()
+
+    drive_service = get_drive_service()
+    bundle = find_user_bundle(drive_service, args.user_id)
+    if not bundle:
+        print(f"[ERROR] No model bundle found for user_{args.user_id}")
+        sys.exit(1)
+    started = time.perf_counter()
+    try:
+        manifest = download_bundle(drive_service, bundle['id'], args.dest, compression_of(bundle['name']))
+    except Exception as e:
+        print(f"[ERROR] Failed to extract {bundle['name']}: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    print(f"[SUCCESS] Extracted {len(manifest['files'])} files "
+          f"({manifest['total_size'] / 1024 / 1024:.2f} MB) to {args.dest} in {elapsed:.2f}s")
@@ -10,6 +10,9 @@ Luồng cũ (tương thích) - chỉ tạo dữ liệu, không train:
 
 Để train luôn sau khi tạo dữ liệu:
     python prepare_user_data.py user_Khang --train
+
+Lấy CSV trực tiếp từ Drive vào bộ nhớ (bỏ bước download_user_data):
+    python prepare_user_data.py --user-id 123 --from-drive
 """
 
 from __future__ import annotations
@@ -117,28 +120,35 @@ def resolve_user_path(args: argparse.Namespace) -> Path:
     raise ValueError("Cần cung cấp --user-dir, --user-id hoặc đối số user_folder (legacy).")
 
 
-def merge_user_csvs(user_path: Path) -> Path | None:
-    """Gộp tất cả file CSV từ raw_data/ thành một file master, với logic đặc biệt cho user data"""
-    raw_data_path = user_path / "raw_data"
+def merge_user_csvs(user_path: Path, sources: list | None = None) -> Path | None:
+    """Gộp tất cả file CSV từ raw_data/ thành một file master, với logic đặc biệt cho user data
 
-    if not raw_data_path.exists():
-        return None
+    sources: danh sách (tên, file-like) đã tải sẵn vào bộ nhớ (xem --from-drive);
+    nếu None thì đọc raw_data/ trên đĩa.
+    """
+    if sources is None:
+        raw_data_path = user_path / "raw_data"
+
+        if not raw_data_path.exists():
+            return None
+
+        # Duyệt qua tất cả thư mục con trong raw_data, tìm file CSV trong thư mục con
+        sources = [
+            (csv_file, csv_file)
+            for subdir in raw_data_path.iterdir() if subdir.is_dir()
+            for csv_file in subdir.glob("gesture_data_custom_*.csv")
+        ]
 
     all_dfs = []
     instance_id = 1
 
-    # Duyệt qua tất cả thư mục con trong raw_data
-    for subdir in raw_data_path.iterdir():
-        if subdir.is_dir():
-            # Tìm file CSV trong thư mục con
-            csv_files = list(subdir.glob("gesture_data_custom_*.csv"))
-            for csv_file in csv_files:
-                print(f"[MERGE] Đọc file: {csv_file}")
-                df = pd.read_csv(csv_file)
-                # Cập nhật instance_id
-                df['instance_id'] = range(instance_id, instance_id + len(df))
-                instance_id += len(df)
-                all_dfs.append(df)
+    for label, source in sources:
+        print(f"[MERGE] Đọc file: {label}")
+        df = pd.read_csv(source)
+        # Cập nhật instance_id
+        df['instance_id'] = range(instance_id, instance_id + len(df))
+        instance_id += len(df)
+        all_dfs.append(df)
 
     if not all_dfs:
         return None
@@ -154,11 +164,20 @@ def merge_user_csvs(user_path: Path) -> Path | None:
     return master_csv
 
 
-def create_enhanced_user_dataset(user_path: Path, custom_csv: Path, reference_csv: Path) -> Path:
-    """Tạo dataset enhanced: loại bỏ custom gestures từ reference, tạo custom data với nhiễu thực tế."""
+def create_enhanced_user_dataset(
+    user_path: Path,
+    custom_csv: Path,
+    reference_csv: Path,
+    ref_df: pd.DataFrame | None = None,
+) -> Path:
+    """Tạo dataset enhanced: loại bỏ custom gestures từ reference, tạo custom data với nhiễu thực tế.
+
+    ref_df: reference data đã đọc sẵn (chỉ đọc, không bị sửa); nếu None thì đọc từ reference_csv.
+    """
     # Load user data và reference data
     user_df = pd.read_csv(custom_csv)
-    ref_df = pd.read_csv(reference_csv)
+    if ref_df is None:
+        ref_df = pd.read_csv(reference_csv)
 
     print(f"[ENHANCE] User data: {len(user_df)} samples")
     print(f"[ENHANCE] Reference data: {len(ref_df)} samples")
@@ -239,8 +258,30 @@ def create_enhanced_user_dataset(user_path: Path, custom_csv: Path, reference_cs
     print(f"[ENHANCE] Gestures: {sorted(final_df['pose_label'].unique())}")
 
     return enhanced_csv
-def ensure_custom_csv(user_path: Path, custom_csv: str | None) -> Path:
-    """Đảm bảo có file dữ liệu custom và copy vào folder user nếu cần."""
+def fetch_drive_sources(user_id: str, spill_mb: int) -> list:
+    """Tải các CSV raw_data của user từ Drive thẳng vào bộ nhớ (không ghi ra thư mục user).
+
+    Chỉ import thư viện Google Drive khi dùng --from-drive.
+    """
+    sys.path.insert(0, str(SCRIPT_DIR))
+    try:
+        from download_user_data import fetch_user_csvs
+    except ImportError as exc:
+        raise RuntimeError(f"--from-drive cần download_user_data.py và thư viện Google Drive: {exc}") from exc
+    return fetch_user_csvs(user_id, spill_threshold=spill_mb * 1024 * 1024)
+
+
+def ensure_custom_csv(user_path: Path, custom_csv: str | None, sources: list | None = None) -> Path:
+    """Đảm bảo có file dữ liệu custom và copy vào folder user nếu cần.
+
+    sources: CSV raw_data đã tải vào bộ nhớ (--from-drive), được gộp trực tiếp.
+    """
+    if sources is not None:
+        merged_csv = merge_user_csvs(user_path, sources)
+        if not merged_csv:
+            raise FileNotFoundError("Không có file gesture_data_custom_*.csv nào trong raw_data/ trên Drive")
+        return merged_csv
+
     if custom_csv:
         src = Path(custom_csv).resolve()
         if not src.exists():
@@ -269,6 +310,21 @@ def ensure_custom_csv(user_path: Path, custom_csv: str | None) -> Path:
     return candidates[0]
 
 
+def load_reference_data(base_path: Path, original_path: Path) -> dict:
+    """Đọc dữ liệu tham chiếu (compact + original) một lần để dùng chung cho nhiều user.
+
+    Raises FileNotFoundError nếu thiếu file compact; original có thể không có (None).
+    """
+    base_df = load_dataframe(base_path, "Base compact dataset")
+    if original_path.exists():
+        original_df = pd.read_csv(original_path)
+        print(f"[INFO] Original dataset: {len(original_df)} mẫu từ {original_path}")
+    else:
+        print(f"[WARN] Không tìm thấy original dataset ({original_path}). Sẽ sinh dữ liệu bằng noise.")
+        original_df = None
+    return {"base": base_df, "original": original_df, "original_path": original_path}
+
+
 def load_dataframe(path: Path, label: str) -> pd.DataFrame:
     if not path.exists():
         raise FileNotFoundError(f"{label} không tồn tại: {path}")
@@ -382,18 +438,28 @@ def create_balanced_dataset(
     return create_custom_dataset(compact_df, pd.DataFrame(), out_path)
 
 
-def run_training(custom_file: Path, user_path: Path, skip_training: bool) -> None:
+def run_training(
+    custom_file: Path,
+    user_path: Path,
+    skip_training: bool,
+    train_script: Path | None = None,
+    log_prefix: str = "",
+) -> bool:
+    """Copy train script gốc vào user folder, chỉnh đường dẫn rồi chạy. Trả về True nếu train thành công.
+
+    log_prefix: thêm vào đầu mỗi dòng log train (phân biệt user khi train song song).
+    """
     if skip_training:
         print("\n[TRAINING] Bỏ qua bước train (do dùng --skip-training).")
-        return
+        return True
 
     # Copy train_motion_svm_all_models.py vào user folder và chỉnh đường dẫn
     user_train_script = user_path / "train_motion_svm_all_models.py"
-    original_train_script = SCRIPT_DIR / "train_motion_svm_all_models.py"
+    original_train_script = train_script or SCRIPT_DIR / "train_motion_svm_all_models.py"
     
     if not original_train_script.exists():
         print(f"[ERROR] Không tìm thấy script train gốc: {original_train_script}")
-        return
+        return False
     
     # Copy script
     shutil.copy2(original_train_script, user_train_script)
@@ -453,7 +519,7 @@ def run_training(custom_file: Path, user_path: Path, skip_training: bool) -> Non
             break
         if line:
             clean = line.rstrip()
-            print(clean)
+            print(f"{log_prefix}{clean}")
             logs.append(clean)
 
     code = process.poll()
@@ -461,7 +527,7 @@ def run_training(custom_file: Path, user_path: Path, skip_training: bool) -> Non
     if code != 0:
         print(f"[ERROR] Train thất bại, exit code {code}")
         print(f"[HINT] Tự chạy lại: python {user_train_script}")
-        return
+        return False
 
     summary = [l for l in logs if "F1-score" in l or "accuracy" in l or "TRAINING COMPLETE" in l]
     if summary:
@@ -469,9 +535,37 @@ def run_training(custom_file: Path, user_path: Path, skip_training: bool) -> Non
         for item in summary:
             print("   " + item)
     print("[SUCCESS] Train hoàn tất.")
+    write_artifact_manifest(user_path)
+    return True
 
 
-def prepare_user_training(args: argparse.Namespace) -> bool:
+def write_artifact_manifest(user_path: Path) -> None:
+    """Ghi artifact_manifest.json: danh sách file model/kết quả cần upload (kèm size, md5).
+
+    upload_trained_model chỉ upload các file trong manifest. Nếu không ghi được thì uploader tự tạo lại.
+    """
+    sys.path.insert(0, str(SCRIPT_DIR))
+    try:
+        from artifact_manifest import ARTIFACT_MANIFEST_NAME, build_artifact_manifest
+    except ImportError as exc:
+        print(f"[WARNING] Không ghi được artifact manifest (thiếu artifact_manifest.py): {exc}")
+        return
+    manifest = build_artifact_manifest(str(user_path), info={"user_id": user_path.name.removeprefix("user_")})
+    print(f"[MANIFEST] {ARTIFACT_MANIFEST_NAME}: {len(manifest['files'])} file "
+          f"({manifest['total_size'] / 1024 / 1024:.2f} MB)")
+
+
+def prepare_user_training(
+    args: argparse.Namespace,
+    sources: list | None = None,
+    reference: dict | None = None,
+) -> bool:
+    """Chuẩn bị dataset cho user (và train nếu có --train).
+
+    sources: CSV raw_data đã tải sẵn vào bộ nhớ (ví dụ từ custom_gesture_pipeline); khi có thì
+    không tải lại từ Drive. Các buffer được đóng sau khi gộp.
+    reference: kết quả load_reference_data() dùng chung (batch nhiều user); nếu None thì đọc từ file.
+    """
     try:
         user_path = resolve_user_path(args)
     except ValueError as exc:
@@ -479,20 +573,33 @@ def prepare_user_training(args: argparse.Namespace) -> bool:
         return False
 
     user_path.mkdir(parents=True, exist_ok=True)
+    if sources is None and args.from_drive:
+        user_id = args.user_id or user_path.name.removeprefix("user_")
+        try:
+            sources = fetch_drive_sources(user_id, args.spill_mb)
+        except RuntimeError as exc:
+            print(f"[ERROR] {exc}")
+            return False
     try:
-        custom_csv = ensure_custom_csv(user_path, args.custom_csv)
+        custom_csv = ensure_custom_csv(user_path, args.custom_csv, sources)
     except FileNotFoundError as exc:
         print(f"[ERROR] {exc}")
         return False
+    finally:
+        for _, buffer in sources or []:
+            buffer.close()
 
     base_path = Path(args.base_compact).resolve() if args.base_compact else DEFAULT_BASE_COMPACT
     original_path = Path(args.original_data).resolve() if args.original_data else DEFAULT_ORIGINAL_DATA
 
-    try:
-        base_df = load_dataframe(base_path, "Base compact dataset")
-    except FileNotFoundError as exc:
-        print(f"[ERROR] {exc}")
-        return False
+    if reference is None:
+        try:
+            reference = load_reference_data(base_path, original_path)
+        except FileNotFoundError as exc:
+            print(f"[ERROR] {exc}")
+            return False
+    original_path = reference["original_path"]
+    original_df = reference["original"]
 
     try:
         user_df = load_dataframe(custom_csv, "Custom dataset")
@@ -500,19 +607,12 @@ def prepare_user_training(args: argparse.Namespace) -> bool:
         print(f"[ERROR] {exc}")
         return False
 
-    if original_path.exists():
-        original_df = pd.read_csv(original_path)
-        print(f"[INFO] Original dataset: {len(original_df)} mẫu từ {original_path}")
-    else:
-        print(f"[WARN] Không tìm thấy original dataset ({original_path}). Sẽ sinh dữ liệu bằng noise.")
-        original_df = None
-
     compact_file = user_path / "training_results" / "gesture_data_compact.csv"
     custom_file = user_path / "gesture_data_custom_full.csv"
 
     # Tạo enhanced dataset: duplicate user data + merge với reference
     if original_path.exists():
-        enhanced_file = create_enhanced_user_dataset(user_path, custom_csv, original_path)
+        enhanced_file = create_enhanced_user_dataset(user_path, custom_csv, original_path, original_df)
         if enhanced_file:
             custom_df = pd.read_csv(enhanced_file)
         else:
@@ -525,7 +625,9 @@ def prepare_user_training(args: argparse.Namespace) -> bool:
     # Mặc định LUÔN skip training, chỉ prepare dataset
     # Chỉ train khi user chỉ định --train
     if args.train:
-        run_training(custom_file, user_path, False)  # Chạy training nếu user muốn
+        train_script = Path(args.train_script).resolve() if args.train_script else None
+        if not run_training(custom_file, user_path, False, train_script):  # Chạy training nếu user muốn
+            return False
     else:
         print("\n[SKIP] Bỏ qua training. Chạy riêng sau:")
         print(f"   cd {user_path}")
@@ -553,6 +655,18 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--base-compact", help="Đường dẫn file compact gốc.")
     parser.add_argument("--original-data", help="Đường dẫn dataset mặc định đầy đủ.")
     parser.add_argument("--train", action="store_true", help="Chạy training sau khi tạo dữ liệu.")
+    parser.add_argument("--train-script", help="Đường dẫn train script gốc (mặc định: cùng thư mục script này).")
+    parser.add_argument(
+        "--from-drive",
+        action="store_true",
+        help="Tải CSV raw_data của user từ Drive thẳng vào bộ nhớ thay vì đọc từ đĩa (không cần download_user_data).",
+    )
+    parser.add_argument(
+        "--spill-mb",
+        type=int,
+        default=64,
+        help="Với --from-drive: mỗi file lớn hơn ngưỡng này (MB) được chuyển ra file tạm.",
+    )
     return parser
 
 
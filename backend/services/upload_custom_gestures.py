@@ -4,10 +4,11 @@ Upload custom gestures to Google Drive
 Creates AdminCustom folder and user subfolder, then uploads all gesture data files
 """
 
-import os
 import sys
-import shutil
+import time
+import hashlib
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import importlib.util
 
 # Dynamically import google_drive_oauth_service
@@ -15,7 +16,124 @@ oauth_service_path = Path(__file__).parent / "google_drive_oauth_service.py"
 spec = importlib.util.spec_from_file_location("google_drive_oauth_service", str(oauth_service_path))
 google_drive_oauth_service = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(google_drive_oauth_service)
-GoogleDriveOAuthService = google_drive_oauth_service.GoogleDriveOAuthService
+get_drive_service = google_drive_oauth_service.get_drive_service
+
+# Files uploaded at the same time
+MAX_PARALLEL_UPLOADS = 6
+HASH_BUFFER_SIZE = 1024 * 1024
+
+def file_md5(path):
+    """
+    Compute the md5 hex digest of a local file
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ensure_folder_hierarchy(drive_service, folder_ids, relative_dirs):
+    """
+    Create the Drive folders for local directories that do not exist yet
+
+    Folders are created level by level, the folders of one level in parallel,
+    so every parent exists before its children.
+
+    Args:
+        drive_service: GoogleDriveOAuthService instance
+        folder_ids (dict): Relative folder path -> Drive folder ID ('' is the
+            user folder); updated with the created folders
+        relative_dirs (iterable): Relative directory paths ('a/b') needed for the upload
+
+    Returns:
+        int: Number of folders created
+    """
+    needed = set()
+    for relative_dir in relative_dirs:
+        parts = relative_dir.split('/')
+        needed.update('/'.join(parts[:depth]) for depth in range(1, len(parts) + 1))
+    missing = sorted(path for path in needed if path not in folder_ids)
+
+    def create(relative_dir):
+        parent, _, name = relative_dir.rpartition('/')
+        folder = drive_service.create_folder(name, folder_ids[parent])
+        if not folder:
+            raise RuntimeError(f"Failed to create folder {relative_dir}")
+        return relative_dir, folder['id']
+
+    for depth in sorted({path.count('/') for path in missing}):
+        level = [path for path in missing if path.count('/') == depth]
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_UPLOADS) as executor:
+            folder_ids.update(executor.map(create, level))
+    return len(missing)
+
+def upload_tree(drive_service, local_root, drive_root_id):
+    """
+    Upload a local directory into a Drive folder, keeping its folder structure
+
+    The Drive side is listed once; files whose md5 matches the copy already
+    in Drive are skipped, changed files are uploaded and their old copy is
+    deleted. Older uploads stored files under one flat name such as
+    "raw_data/x/file.csv"; once a file is in place in the folder layout, its
+    flat-named copy is deleted.
+
+    Args:
+        drive_service: GoogleDriveOAuthService instance
+        local_root (Path): Local directory
+        drive_root_id (str): Drive folder that mirrors local_root
+
+    Returns:
+        dict: Counts of uploaded, skipped and failed files, flat-named copies
+            removed, bytes uploaded and elapsed seconds
+    """
+    started = time.perf_counter()
+    folder_ids = {}
+    remote_files = {}
+    legacy_files = {}
+    for relative_path, file in drive_service.list_tree(drive_root_id, folder_ids):
+        if '/' in file['name']:
+            legacy_files.setdefault(relative_path, []).append(file)
+        else:
+            remote_files[relative_path] = file
+    local_files = sorted(
+        (file_path.relative_to(local_root).as_posix(), file_path)
+        for file_path in local_root.rglob('*') if file_path.is_file()
+    )
+    created = ensure_folder_hierarchy(
+        drive_service, folder_ids,
+        {relative_path.rpartition('/')[0] for relative_path, _ in local_files if '/' in relative_path}
+    )
+
+    def upload(entry):
+        relative_path, file_path = entry
+        existing = remote_files.get(relative_path)
+        if existing and existing.get('md5Checksum') == file_md5(file_path):
+            return 'skipped', 0
+        parent, _, name = relative_path.rpartition('/')
+        if not drive_service.upload_file(str(file_path), name, folder_ids[parent]):
+            print(f"[UPLOAD] ERROR: Failed to upload {relative_path}")
+            return 'failed', 0
+        if existing:
+            drive_service.delete_file(existing['id'])
+        print(f"[UPLOAD] SUCCESS: Uploaded {relative_path}")
+        return 'uploaded', file_path.stat().st_size
+
+    report = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'folders_created': created,
+              'legacy_removed': 0}
+    in_place = []
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_UPLOADS) as executor:
+        for (relative_path, _), (status, size) in zip(local_files, executor.map(upload, local_files)):
+            report[status] += 1
+            report['bytes'] += size
+            if status != 'failed':
+                in_place.append(relative_path)
+
+        # Flat-named copies of files that now exist in the folder layout
+        legacy = [file for relative_path in in_place for file in legacy_files.get(relative_path, [])]
+        for removed in executor.map(lambda file: drive_service.delete_file(file['id']), legacy):
+            report['legacy_removed'] += 1 if removed else 0
+    report['elapsed'] = time.perf_counter() - started
+    return report
 
 def upload_custom_gestures(admin_id):
     """
@@ -33,7 +151,7 @@ def upload_custom_gestures(admin_id):
         # Initialize Google Drive service with credentials path
         credentials_path = Path(__file__).parent.parent.parent.parent / "credentials.json"
         token_path = Path(__file__).parent.parent.parent.parent / "token.json"
-        drive_service = GoogleDriveOAuthService(credentials_file=str(credentials_path), token_file=str(token_path))
+        drive_service = get_drive_service(credentials_file=str(credentials_path), token_file=str(token_path))
 
         # Define folder structure
         admin_custom_folder_name = "AdminCustom"
@@ -50,10 +168,10 @@ def upload_custom_gestures(admin_id):
 
         # Check if AdminCustom folder exists, create if not
         admin_custom_query = f"name='{admin_custom_folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-        admin_custom_results = drive_service.service.files().list(
+        admin_custom_results = drive_service.execute(drive_service.service.files().list(
             q=admin_custom_query,
             fields="files(id, name)"
-        ).execute()
+        ))
 
         if admin_custom_results.get('files'):
             admin_custom_folder_id = admin_custom_results['files'][0]['id']
@@ -69,10 +187,10 @@ def upload_custom_gestures(admin_id):
 
         # Check if user folder exists in AdminCustom, create if not
         user_folder_query = f"name='{user_folder_name}' and '{admin_custom_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
-        user_folder_results = drive_service.service.files().list(
+        user_folder_results = drive_service.execute(drive_service.service.files().list(
             q=user_folder_query,
             fields="files(id, name)"
-        ).execute()
+        ))
 
         if user_folder_results.get('files'):
             user_folder_id = user_folder_results['files'][0]['id']
@@ -88,41 +206,22 @@ def upload_custom_gestures(admin_id):
 
         # Get and print user folder link
         try:
-            user_folder_metadata = drive_service.service.files().get(fileId=user_folder_id, fields='webViewLink').execute()
+            user_folder_metadata = drive_service.execute(drive_service.service.files().get(fileId=user_folder_id, fields='webViewLink'))
             folder_link = user_folder_metadata.get('webViewLink')
             print(f"[UPLOAD] User folder link: {folder_link}")
         except Exception as e:
             print(f"[UPLOAD] Could not get folder link: {e}")
 
-        # Upload all files from local user folder
-        uploaded_count = 0
-        for file_path in local_user_path.rglob('*'):
-            if file_path.is_file():
-                try:
-                    # Get relative path for folder structure preservation
-                    relative_path = file_path.relative_to(local_user_path)
-                    file_name = str(relative_path)
-
-                    print(f"[UPLOAD] Uploading: {file_name}")
-
-                    # Upload file
-                    uploaded_file = drive_service.upload_file(
-                        str(file_path),
-                        file_name,
-                        user_folder_id
-                    )
-
-                    if uploaded_file:
-                        uploaded_count += 1
-                        print(f"[UPLOAD] SUCCESS: Uploaded {file_name}")
-                    else:
-                        print(f"[UPLOAD] ERROR: Failed to upload {file_name}")
-
-                except Exception as e:
-                    print(f"[UPLOAD] ERROR uploading {file_path}: {e}")
-
-        print(f"[UPLOAD] Successfully uploaded {uploaded_count} files")
-        return True
+        # Upload all files from local user folder, keeping the folder structure
+        report = upload_tree(drive_service, local_user_path, user_folder_id)
+        elapsed = max(report['elapsed'], 1e-6)
+        print(f"[UPLOAD] Uploaded {report['uploaded']} files, skipped {report['skipped']} unchanged, "
+              f"{report['failed']} failed, {report['folders_created']} folders created, "
+              f"{report['legacy_removed']} flat-named copies removed")
+        print(f"[UPLOAD] Throughput: {report['uploaded'] / elapsed:.1f} files/s, "
+              f"{report['bytes'] / 1024 / 1024 / elapsed:.2f} MB/s ({elapsed:.2f}s)")
+        # Local files are deleted after a successful run, so any failed file fails the run
+        return report['failed'] == 0
 
     except Exception as e:
         print(f"[UPLOAD] ERROR: {e}")
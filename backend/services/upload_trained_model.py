@@ -1,122 +1,242 @@
 #!/usr/bin/env python3
 """
 Upload trained model results to CustomGesture folder and cleanup
+
+Only the files listed in the artifact manifest written by training (see
+artifact_manifest.py) are uploaded, together with the manifest itself;
+everything else in the user directory stays where it is until cleanup.
 """
 
 import sys
 import os
-import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 # Import from current directory first
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from google_drive_oauth_service import GoogleDriveOAuthService
+from google_drive_oauth_service import get_drive_service
+from workspace_manager import WorkspaceManager
+from artifact_manifest import (ARTIFACT_MANIFEST_NAME, build_artifact_manifest, load_artifact_manifest,
+                               verify_artifacts, skipped_files)
+
+# Folders of the user directory the trained artifacts live in
+TRANSFER_FOLDERS = ('training_results', 'models')
+BUNDLE_MIME_TYPES = {'zstd': 'application/zstd', 'gzip': 'application/gzip'}
+# Artifact files uploaded at the same time
+MAX_PARALLEL_UPLOADS = 4
 
-def upload_folder_recursive(drive_service, local_path, drive_parent_id, max_retries=3):
+def plan_artifact_upload(user_dir, user_id):
     """
-    Recursively upload a local folder to Google Drive with retry logic
-    
+    Load the artifact manifest written by training and check the files against it
+
+    If training did not write a manifest (e.g. the training script was run
+    by hand), one is built from the allowlist now.
+
+    Args:
+        user_dir (str): User directory
+        user_id (str): User ID
+
+    Returns:
+        tuple: (artifact manifest, list of (relative path, size) of the skipped files)
+
+    Raises:
+        RuntimeError: If there are no artifacts or they changed since training
+    """
+    manifest = load_artifact_manifest(user_dir)
+    if manifest is None:
+        print(f"[WARNING] No {ARTIFACT_MANIFEST_NAME} from training, building one from the allowlist")
+        manifest = build_artifact_manifest(user_dir, info={'user_id': str(user_id)})
+    if not manifest['files']:
+        raise RuntimeError(f"No trained artifacts found in {user_dir}")
+    problems = verify_artifacts(user_dir, manifest)
+    if problems:
+        raise RuntimeError(f"Artifacts do not match {ARTIFACT_MANIFEST_NAME}: {'; '.join(problems)}")
+
+    skipped = skipped_files(user_dir, manifest, TRANSFER_FOLDERS)
+    print(f"[INFO] Uploading {len(manifest['files'])} artifacts ({manifest['total_size'] / 1024 / 1024:.2f} MB), "
+          f"skipping {len(skipped)} other files in {' and '.join(TRANSFER_FOLDERS)} "
+          f"({sum(size for _, size in skipped) / 1024 / 1024:.2f} MB)")
+    return manifest, skipped
+
+def upload_artifacts(drive_service, user_dir, user_folder_id, user_id, manifest):
+    """
+    Upload the files of the artifact manifest and the manifest itself, keeping their folders
+
+    Transient errors (429/5xx, dropped SSL connections) are retried with backoff
+    inside GoogleDriveOAuthService, and interrupted uploads resume from the
+    last committed chunk, so no retry loop is needed here.
+
     Args:
         drive_service: GoogleDriveOAuthService instance
-        local_path (str): Local path to upload
-        drive_parent_id (str): Parent folder ID in Google Drive
-        max_retries (int): Maximum number of retries for failed operations
-    
+        user_dir (str): User directory
+        user_folder_id (str): user_<id> folder ID in Google Drive
+        user_id (str): User ID
+        manifest (dict): Artifact manifest
+
     Returns:
-        bool: True if successful
+        bool: True if every file was uploaded
     """
-    for attempt in range(max_retries):
-        try:
-            folder_name = os.path.basename(local_path)
-            
-            # Create folder in Google Drive
-            folder_metadata = drive_service.create_folder(folder_name, drive_parent_id)
-            if not folder_metadata:
-                print(f"[ERROR] Failed to create folder {folder_name}")
-                if attempt < max_retries - 1:
-                    print(f"[RETRY] Retrying folder creation (attempt {attempt + 2}/{max_retries})")
-                    continue
+    paths = [entry['path'] for entry in manifest['files']] + [ARTIFACT_MANIFEST_NAME]
+    try:
+        folder_ids = {'': user_folder_id}
+        relative_dirs = {'/'.join(path.split('/')[:depth]) for path in paths
+                         for depth in range(1, path.count('/') + 1)}
+        # Parents sort before their children
+        for relative_dir in sorted(relative_dirs, key=lambda path: (path.count('/'), path)):
+            parent, _, name = relative_dir.rpartition('/')
+            folder = drive_service.create_folder(name, folder_ids[parent])
+            if not folder:
+                print(f"[ERROR] Failed to create folder {relative_dir}")
                 return False
-            
-            drive_folder_id = folder_metadata['id']
-            print(f"[SUCCESS] Created folder {folder_name} (ID: {drive_folder_id})")
-            
-            # Upload files and subfolders
-            for item in os.listdir(local_path):
-                item_path = os.path.join(local_path, item)
-                
-                if os.path.isdir(item_path):
-                    # Recurse for subfolders
-                    if not upload_folder_recursive(drive_service, item_path, drive_folder_id, max_retries):
-                        return False
-                else:
-                    # Upload file with retry
-                    for file_attempt in range(max_retries):
-                        try:
-                            result = drive_service.upload_file(
-                                file_path=item_path,
-                                file_name=item,
-                                folder_id=drive_folder_id
-                            )
-                            if not result:
-                                if file_attempt < max_retries - 1:
-                                    print(f"[RETRY] Retrying file upload {item} (attempt {file_attempt + 2}/{max_retries})")
-                                    continue
-                                print(f"[ERROR] Failed to upload file {item}")
-                                return False
-                            print(f"[SUCCESS] Uploaded file {item}")
-                            break
-                        except Exception as e:
-                            if "SSL" in str(e) or "EOF" in str(e):
-                                if file_attempt < max_retries - 1:
-                                    print(f"[RETRY] SSL error uploading {item}, retrying (attempt {file_attempt + 2}/{max_retries})")
-                                    continue
-                            raise e
-            
-            return True
-            
+            folder_ids[relative_dir] = folder['id']
+            print(f"[SUCCESS] Created folder {relative_dir} (ID: {folder['id']})")
+    except Exception as e:
+        print(f"[ERROR] Failed to create folders for user_{user_id}: {e}")
+        return False
+
+    def upload(path):
+        parent, _, name = path.rpartition('/')
+        try:
+            result = drive_service.upload_file(
+                file_path=os.path.join(user_dir, *path.split('/')),
+                file_name=name,
+                folder_id=folder_ids[parent]
+            )
         except Exception as e:
-            if ("SSL" in str(e) or "EOF" in str(e)) and attempt < max_retries - 1:
-                print(f"[RETRY] SSL error in folder {local_path}, retrying (attempt {attempt + 2}/{max_retries})")
-                continue
-            print(f"[ERROR] Failed to upload folder {local_path}: {e}")
+            print(f"[ERROR] Failed to upload file {path}: {e}")
             return False
-    
-    return False
+        if not result:
+            print(f"[ERROR] Failed to upload file {path}")
+            return False
+        print(f"[SUCCESS] Uploaded file {path}")
+        return True
 
-def cleanup_user_directory(user_id):
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_UPLOADS) as executor:
+        results = list(executor.map(upload, paths))
+    if all(results):
+        print(f"[SUCCESS] Uploaded {len(paths)} files for user_{user_id}")
+    return all(results)
+
+def upload_bundle(drive_service, user_dir, user_folder_id, user_id, manifest, compression=None):
+    """
+    Pack the files of the artifact manifest into one compressed archive and upload it
+
+    The archive carries its own manifest of every file (see model_bundle.py)
+    and is sent as a single resumable upload; it is removed locally afterwards.
+
+    Returns:
+        bool: True if the bundle was uploaded
+    """
+    # Only needed in bundle mode
+    from model_bundle import build_bundle, bundle_name, default_compression
+
+    compression = compression or default_compression()
+    bundle_path = os.path.join(user_dir, bundle_name(compression))
+    started = time.perf_counter()
+    try:
+        bundle_manifest = build_bundle(user_dir, TRANSFER_FOLDERS, bundle_path, compression,
+                                       info={'user_id': str(user_id)},
+                                       files=[entry['path'] for entry in manifest['files']] + [ARTIFACT_MANIFEST_NAME])
+    except Exception as e:
+        print(f"[ERROR] Failed to build model bundle: {e}")
+        return False
+    pack_seconds = time.perf_counter() - started
+    bundle_size = os.path.getsize(bundle_path)
+    print(f"[INFO] Packed {len(bundle_manifest['files'])} files ({bundle_manifest['total_size'] / 1024 / 1024:.2f} MB) "
+          f"into {os.path.basename(bundle_path)} ({bundle_size / 1024 / 1024:.2f} MB, {compression}) "
+          f"in {pack_seconds:.2f}s")
+
+    try:
+        result = drive_service.upload_file(
+            file_path=bundle_path,
+            file_name=os.path.basename(bundle_path),
+            folder_id=user_folder_id,
+            mime_type=BUNDLE_MIME_TYPES[compression]
+        )
+    finally:
+        os.remove(bundle_path)
+    if not result:
+        print("[ERROR] Failed to upload model bundle")
+        return False
+    print(f"[SUCCESS] Uploaded model bundle for user_{user_id}")
+    return True
+
+def timed_transfer(drive_service, mode, user_dir, user_folder_id, user_id, manifest):
+    """
+    Run one transfer mode and measure it
+
+    Returns:
+        tuple: (success, wall time in seconds, Drive calls made)
+    """
+    calls_before = drive_service.get_metrics()['calls']
+    started = time.perf_counter()
+    if mode == 'bundle':
+        success = upload_bundle(drive_service, user_dir, user_folder_id, user_id, manifest)
+    else:
+        success = upload_artifacts(drive_service, user_dir, user_folder_id, user_id, manifest)
+    elapsed = time.perf_counter() - started
+    calls = drive_service.get_metrics()['calls'] - calls_before
+    print(f"[TIMING] {mode} transfer: {elapsed:.2f}s, {calls} Drive calls")
+    return success, elapsed, calls
+
+def compare_transfer(drive_service, mode, measured, user_dir, custom_folder_id, user_id, manifest):
+    """
+    Time the other transfer mode into a scratch folder and print both results
+
+    The scratch folder is deleted afterwards; the real upload is not touched.
+    """
+    other_mode = 'files' if mode == 'bundle' else 'bundle'
+    scratch = drive_service.create_folder(f"user_{user_id}_transfer_compare", custom_folder_id)
+    if not scratch:
+        print("[WARNING] Could not create scratch folder for the comparison")
+        return
+    try:
+        _, other_seconds, other_calls = timed_transfer(drive_service, other_mode, user_dir, scratch['id'], user_id,
+                                                       manifest)
+    finally:
+        drive_service.delete_file(scratch['id'])
+    results = {mode: measured, other_mode: (other_seconds, other_calls)}
+    print("[TIMING] Transfer comparison:")
+    for name in ('files', 'bundle'):
+        seconds, calls = results[name]
+        print(f"[TIMING]   {name:<6} {seconds:8.2f}s  {calls:5d} Drive calls")
+    if results['bundle'][0] > 0:
+        print(f"[TIMING]   bundle speedup: {results['files'][0] / results['bundle'][0]:.1f}x")
+
+def cleanup_user_directory(user_id, workspace_root=None):
     """
     Cleanup user directory after upload
     
     Args:
         user_id (str): User ID
+        workspace_root (str): Root of the user_<id> work directories (default: DEFAULT_WORKSPACE_ROOT)
     """
     try:
-        # Calculate correct path from project root
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        backend_dir = os.path.dirname(current_dir)  # go up from services to backend
-        project_root = os.path.dirname(backend_dir)  # go up from backend to project root
-        user_dir = os.path.join(project_root, "hybrid_realtime_pipeline", "code", f"user_{user_id}")
-        
-        if os.path.exists(user_dir):
-            shutil.rmtree(user_dir)
+        # Moved aside at once, deleted by a background janitor
+        workspace = WorkspaceManager(workspace_root)
+        user_dir = workspace.path(user_id)
+        if workspace.release(user_id):
             print(f"[SUCCESS] Cleaned up entire local user directory: {user_dir}")
             return True
-        else:
-            print(f"[WARNING] User directory {user_dir} not found for cleanup")
-            return False
+        print(f"[WARNING] User directory {user_dir} not found for cleanup")
+        return False
     except Exception as e:
         print(f"[ERROR] Failed to cleanup local directory: {e}")
         return False
 
-def upload_trained_model(user_id):
+def upload_trained_model(user_id, chunk_size=None, bundle=False, compare=False, workspace_root=None):
     """
     Upload trained model results to CustomGesture folder and cleanup local data
 
     Args:
         user_id (str): User ID
+        chunk_size (int): Resumable upload chunk size in bytes (optional)
+        bundle (bool): Upload one compressed archive instead of the folder tree
+        compare (bool): Also time the other transfer mode into a scratch folder
+        workspace_root (str): Root of the user_<id> work directories (default: DEFAULT_WORKSPACE_ROOT)
     """
     try:
-        drive_service = GoogleDriveOAuthService()
+        drive_service = get_drive_service(upload_chunk_size=chunk_size)
 
         # Find CustomGesture folder
         custom_folders = drive_service.search_files("name='CustomGesture' and mimeType='application/vnd.google-apps.folder' and trashed=false")
@@ -125,36 +245,19 @@ def upload_trained_model(user_id):
             return False
         custom_folder_id = custom_folders[0]['id']
 
-        # User directory
-        user_dir = os.path.join("..", "..", "..", "hybrid_realtime_pipeline", "code", f"user_{user_id}")
+        # User directory, from the same root the pipeline allocated it in
+        user_dir = WorkspaceManager(workspace_root).path(user_id)
 
         if not os.path.exists(user_dir):
             print(f"[ERROR] User directory {user_dir} not found!")
             return False
 
-        # Cleanup before upload: remove training script, raw_data, and CSV files
+        # Only the artifacts listed by training are uploaded; nothing is deleted before the upload
         try:
-            # Remove training script if exists
-            train_script = os.path.join(user_dir, "train_motion_svm_all_models.py")
-            if os.path.exists(train_script):
-                os.remove(train_script)
-                print("[CLEANUP] Removed training script")
-            
-            # Remove raw_data folder
-            raw_data_dir = os.path.join(user_dir, "raw_data")
-            if os.path.exists(raw_data_dir):
-                shutil.rmtree(raw_data_dir)
-                print("[CLEANUP] Removed raw_data folder")
-            
-            # Remove CSV files
-            import glob
-            csv_files = glob.glob(os.path.join(user_dir, "gesture_data_custom_*.csv"))
-            for csv_file in csv_files:
-                os.remove(csv_file)
-                print(f"[CLEANUP] Removed {os.path.basename(csv_file)}")
-                
+            manifest, skipped = plan_artifact_upload(user_dir, user_id)
         except Exception as e:
-            print(f"[WARNING] Some cleanup failed: {e}")
+            print(f"[ERROR] {e}")
+            return False
 
         # Check if user folder already exists under CustomGesture, if yes, delete it
         user_folder_name = f"user_{user_id}"
@@ -176,32 +279,19 @@ def upload_trained_model(user_id):
         user_folder_id = user_folder_metadata['id']
         print(f"[SUCCESS] Created user folder {user_folder_name} (ID: {user_folder_id})")
 
-        # Upload only training_results and models folders
-        training_results_dir = os.path.join(user_dir, "training_results")
-        models_dir = os.path.join(user_dir, "models")
-        
-        success = True
-        
-        # Upload training_results folder
-        if os.path.exists(training_results_dir):
-            result = upload_folder_recursive(drive_service, training_results_dir, user_folder_id)
-            if result:
-                print(f"[SUCCESS] Uploaded training_results for user_{user_id}")
-            else:
-                print(f"[ERROR] Failed to upload training_results")
-                success = False
-        
-        # Upload models folder  
-        if os.path.exists(models_dir):
-            result = upload_folder_recursive(drive_service, models_dir, user_folder_id)
-            if result:
-                print(f"[SUCCESS] Uploaded models for user_{user_id}")
-            else:
-                print(f"[ERROR] Failed to upload models")
-                success = False
+        mode = 'bundle' if bundle else 'files'
+        success, elapsed, calls = timed_transfer(drive_service, mode, user_dir, user_folder_id, user_id, manifest)
+        if compare and success:
+            compare_transfer(drive_service, mode, (elapsed, calls), user_dir, custom_folder_id, user_id, manifest)
+
+        metrics = drive_service.get_metrics()
+        print(f"[INFO] Drive requests: {metrics['calls']} calls, {metrics['retries']} retries, "
+              f"{metrics['throttled']} throttled")
 
         if success:
-            print(f"[SUCCESS] Uploaded trained model folders for user_{user_id} to CustomGesture")
+            print(f"[SUCCESS] Uploaded trained model for user_{user_id} to CustomGesture "
+                  f"({manifest['total_size'] / 1024 / 1024:.2f} MB, "
+                  f"{sum(size for _, size in skipped) / 1024 / 1024:.2f} MB saved by skipping {len(skipped)} files)")
             return True
         else:
             print(f"[ERROR] Failed to upload trained model folder for user_{user_id}")
@@ -215,7 +305,17 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='Upload trained model to CustomGesture and cleanup')
     parser.add_argument('--user-id', required=True, help='User ID')
+    parser.add_argument('--chunk-size-mb', type=float, help='Resumable upload chunk size in MB (default 8)')
+    parser.add_argument('--bundle', action='store_true',
+                        help='Upload the trained artifacts as one compressed archive (see model_bundle.py)')
+    parser.add_argument('--compare', action='store_true',
+                        help='Also time the other transfer mode into a scratch folder and print both')
+    parser.add_argument('--workspace-root',
+                        help='Root of the user_<id> work directories (default: $GESTURE_WORKSPACE_ROOT or '
+                             'hybrid_realtime_pipeline/code)')
     args = parser.parse_args()
 
-    success = upload_trained_model(args.user_id)
+    chunk_size = int(args.chunk_size_mb * 1024 * 1024) if args.chunk_size_mb else None
+    success = upload_trained_model(args.user_id, chunk_size, bundle=args.bundle, compare=args.compare,
+                                   workspace_root=args.workspace_root)
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Scratch space for user_<id> work directories
+
+All pipeline steps get a user's work directory from here instead of
+computing hybrid_realtime_pipeline/code/user_<id> themselves:
+    - allocate() creates the directory after checking the quota and the
+      free space of the file system
+    - release() renames the directory into <root>/.reclaim, which is
+      instant, and leaves the deletion to a background janitor, so cleanup
+      never blocks the caller
+    - the janitor also moves work directories it allocated that nobody
+      touched for a while into .reclaim; allocations are recorded in
+      <root>/.workspaces, outside the user directories, so directories
+      created by other code (e.g. raw uploads waiting for approval) are
+      never collected
+
+The root is configurable (e.g. a tmpfs mount such as /dev/shm/gestpipe) with
+$GESTURE_WORKSPACE_ROOT; the quota with $GESTURE_WORKSPACE_QUOTA_MB.
+
+Usage:
+    python workspace_manager.py status
+    python workspace_manager.py janitor [--max-age-hours 6]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+# services -> backend -> dashboard_web -> project root
+DEFAULT_WORKSPACE_ROOT = os.environ.get(
+    'GESTURE_WORKSPACE_ROOT',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(SERVICES_DIR))), 'hybrid_realtime_pipeline', 'code')
+)
+DEFAULT_QUOTA_BYTES = int(float(os.environ.get('GESTURE_WORKSPACE_QUOTA_MB', 10 * 1024)) * 1024 * 1024)
+RECLAIM_DIR_NAME = '.reclaim'
+REGISTRY_DIR_NAME = '.workspaces'
+WORKSPACE_PREFIX = 'user_'
+# Work directories untouched for this long are treated as abandoned by the janitor
+DEFAULT_MAX_AGE_SECONDS = 6 * 60 * 60
+
+class WorkspaceQuotaExceeded(RuntimeError):
+    """Allocating a work directory would exceed the quota or the free space"""
+
+def directory_size(path):
+    """
+    Returns: total size in bytes of the files below path (0 if it does not exist)
+    """
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass  # removed while walking
+    return total
+
+def newest_mtime(path):
+    """
+    Returns: newest modification time of path or anything below it
+    """
+    newest = os.path.getmtime(path)
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in dirnames + filenames:
+            try:
+                newest = max(newest, os.path.getmtime(os.path.join(dirpath, name)))
+            except OSError:
+                pass
+    return newest
+
+class WorkspaceManager:
+    def __init__(self, root=None, quota_bytes=None):
+        """
+        Initialize the workspace manager
+
+        Args:
+            root (str): Directory holding the user_<id> work directories
+                (default: $GESTURE_WORKSPACE_ROOT or hybrid_realtime_pipeline/code)
+            quota_bytes (int): Maximum bytes all work directories may use (default: $GESTURE_WORKSPACE_QUOTA_MB or 10 GB)
+        """
+        self.root = os.path.abspath(root or DEFAULT_WORKSPACE_ROOT)
+        self.quota_bytes = quota_bytes if quota_bytes is not None else DEFAULT_QUOTA_BYTES
+        self.reclaim_dir = os.path.join(self.root, RECLAIM_DIR_NAME)
+        self.registry_dir = os.path.join(self.root, REGISTRY_DIR_NAME)
+
+    def path(self, user_id):
+        return os.path.join(self.root, f"{WORKSPACE_PREFIX}{user_id}")
+
+    def workspaces(self):
+        """
+        Returns: paths of the existing user_<id> work directories
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return [os.path.join(self.root, name) for name in sorted(os.listdir(self.root))
+                if name.startswith(WORKSPACE_PREFIX) and os.path.isdir(os.path.join(self.root, name))]
+
+    def usage(self):
+        """
+        Returns:
+            dict: Bytes used by work directories ('active') and awaiting deletion ('reclaiming')
+        """
+        return {
+            'active': sum(directory_size(path) for path in self.workspaces()),
+            'reclaiming': directory_size(self.reclaim_dir)
+        }
+
+    def allocate(self, user_id, expected_bytes=0):
+        """
+        Create (or reuse) a user's work directory
+
+        Directories waiting in .reclaim are deleted first if they are what
+        stands between the request and the quota.
+
+        Args:
+            user_id (str): User ID
+            expected_bytes (int): Space the job is expected to need
+
+        Returns:
+            str: Work directory path
+
+        Raises:
+            WorkspaceQuotaExceeded: If the quota or the free space would be exceeded
+        """
+        os.makedirs(self.root, exist_ok=True)
+        usage = self.usage()
+        if usage['active'] + usage['reclaiming'] + expected_bytes > self.quota_bytes and usage['reclaiming']:
+            self.reclaim()
+            usage['reclaiming'] = 0
+        if usage['active'] + expected_bytes > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Workspace quota exceeded: {usage['active'] / 1024 / 1024:.1f} MB in use, "
+                f"{expected_bytes / 1024 / 1024:.1f} MB requested, quota {self.quota_bytes / 1024 / 1024:.1f} MB")
+        free = shutil.disk_usage(self.root).free
+        if expected_bytes > free:
+            raise WorkspaceQuotaExceeded(
+                f"Not enough free space in {self.root}: {free / 1024 / 1024:.1f} MB free, "
+                f"{expected_bytes / 1024 / 1024:.1f} MB requested")
+
+        path = self.path(user_id)
+        os.makedirs(path, exist_ok=True)
+        os.makedirs(self.registry_dir, exist_ok=True)
+        with open(self._registry_file(user_id), 'w', encoding='utf-8') as fh:
+            json.dump({'user_id': str(user_id), 'allocated_at': time.time(), 'pid': os.getpid()}, fh)
+        return path
+
+    def _registry_file(self, user_id):
+        return os.path.join(self.registry_dir, f"{WORKSPACE_PREFIX}{user_id}.json")
+
+    def _unregister(self, user_id):
+        try:
+            os.remove(self._registry_file(user_id))
+        except FileNotFoundError:
+            pass
+
+    def release(self, user_id, background=True):
+        """
+        Give up a user's work directory
+
+        The directory is renamed into .reclaim right away and deleted by a
+        detached janitor process, so the caller does not wait for the
+        deletion. If the rename fails (e.g. a file is still open on
+        Windows), the directory is deleted in place instead.
+
+        Args:
+            user_id (str): User ID
+            background (bool): Delete in a detached process (False: delete before returning)
+
+        Returns:
+            bool: True if the directory existed
+        """
+        path = self.path(user_id)
+        self._unregister(user_id)
+        if not os.path.exists(path):
+            return False
+        os.makedirs(self.reclaim_dir, exist_ok=True)
+        target = os.path.join(self.reclaim_dir, f"{os.path.basename(path)}-{time.time_ns()}-{os.getpid()}")
+        try:
+            os.rename(path, target)
+        except OSError as e:
+            print(f"[WARNING] Could not move {path} to {RECLAIM_DIR_NAME} ({e}), deleting in place")
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        if background:
+            self.start_janitor()
+        else:
+            self.reclaim()
+        return True
+
+    def reclaim(self):
+        """
+        Delete everything waiting in .reclaim
+
+        Returns:
+            int: Number of directories deleted
+        """
+        if not os.path.isdir(self.reclaim_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(self.reclaim_dir):
+            # Several janitors may run at once; whoever gets there first deletes
+            shutil.rmtree(os.path.join(self.reclaim_dir, name), ignore_errors=True)
+            removed += 1
+        return removed
+
+    def collect_stale(self, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        """
+        Move allocated work directories nothing was written to for max_age_seconds into .reclaim
+
+        Only directories allocated through this manager are considered.
+
+        Returns:
+            list: User directory names that were moved
+        """
+        cutoff = time.time() - max_age_seconds
+        moved = []
+        names = sorted(os.listdir(self.registry_dir)) if os.path.isdir(self.registry_dir) else []
+        for name in names:
+            user_id = name[len(WORKSPACE_PREFIX):-len('.json')]
+            path = self.path(user_id)
+            try:
+                if not os.path.exists(path):
+                    self._unregister(user_id)
+                    continue
+                if newest_mtime(path) >= cutoff:
+                    continue
+                os.makedirs(self.reclaim_dir, exist_ok=True)
+                os.rename(path, os.path.join(self.reclaim_dir, f"{os.path.basename(path)}-{time.time_ns()}-stale"))
+                self._unregister(user_id)
+                moved.append(os.path.basename(path))
+            except OSError as e:
+                print(f"[WARNING] Could not reclaim {path}: {e}")
+        return moved
+
+    def start_janitor(self):
+        """
+        Run the janitor in a detached process that outlives the caller
+        """
+        command = [sys.executable, os.path.abspath(__file__), 'janitor', '--root', self.root, '--reclaim-only']
+        options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+        if os.name == 'nt':
+            options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            options['start_new_session'] = True
+        try:
+            subprocess.Popen(command, **options)
+        except OSError as e:
+            print(f"[WARNING] Could not start janitor ({e}), reclaiming now")
+            self.reclaim()
+
+    def status(self):
+        usage = self.usage()
+        return {
+            'root': self.root,
+            'workspaces': [os.path.basename(path) for path in self.workspaces()],
+            'allocated': sorted(name[:-len('.json')] for name in os.listdir(self.registry_dir))
+            if os.path.isdir(self.registry_dir) else [],
+            'active_bytes': usage['active'],
+            'reclaiming_bytes': usage['reclaiming'],
+            'quota_bytes': self.quota_bytes,
+            'free_bytes': shutil.disk_usage(self.root).free if os.path.isdir(self.root) else None
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage user_<id> work directories')
+    parser.add_argument('command', choices=['status', 'janitor'])
+    parser.add_argument('--root', help='Workspace root (default: $GESTURE_WORKSPACE_ROOT or hybrid_realtime_pipeline/code)')
+    parser.add_argument('--max-age-hours', type=float, default=DEFAULT_MAX_AGE_SECONDS / 3600,
+                        help='janitor: reclaim work directories untouched for this long')
+    parser.add_argument('--reclaim-only', action='store_true', help='janitor: only delete what is in .reclaim')
+    args = parser.parse_args()
+
+    manager = WorkspaceManager(args.root)
+    if args.command == 'janitor':
+        stale = [] if args.reclaim_only else manager.collect_stale(args.max_age_hours * 3600)
+        removed = manager.reclaim()
+        print(f"[CLEANUP] Reclaimed {removed} directories ({len(stale)} stale: {', '.join(stale) or 'none'})")
+    print(json.dumps(manager.status()))
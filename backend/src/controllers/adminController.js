@@ -425,57 +425,14 @@ exports.approveGestureRequest = async (req, res) => {
     );
 
     try {
-      // Step 0: Check if user data exists on Google Drive
-      console.log('[approveGestureRequest] Step 0: Checking user data on Google Drive...');
-      await runPythonScript('check_drive_data.py', [userId], BACKEND_SERVICES_DIR);
-
-      // Step 1: Download user data from Google Drive
-      console.log('[approveGestureRequest] Step 1: Downloading user data...');
-      await runPythonScript('download_user_data.py', ['--user-id', userId], BACKEND_SERVICES_DIR);
-
-      // Step 2: Prepare user data
-      console.log('[approveGestureRequest] Step 2: Preparing user data...');
-      await runPythonScript('prepare_user_data.py', [`user_${userId}`], CODE_DIR);
-
-      // Step 3: Train model
-      console.log('[approveGestureRequest] Step 3: Training model...');
-      const userFolderPath = path.join(CODE_DIR, `user_${userId}`);
-      
-      // Copy training script to user folder
-      const trainScriptSrc = path.join(CODE_DIR, 'train_motion_svm_all_models.py');
-      const trainScriptDst = path.join(userFolderPath, 'train_motion_svm_all_models.py');
-      await fs.promises.copyFile(trainScriptSrc, trainScriptDst);
-      
-      // Run training with dataset parameter
-      await runPythonScript('train_motion_svm_all_models.py', ['--dataset', 'gesture_data_custom_full.csv'], userFolderPath);
-
-      // Step 4: Upload trained model and cleanup
-      console.log('[approveGestureRequest] Step 4: Uploading trained model and cleanup...');
-      
-      // Copy upload script to user folder
-      const uploadScriptSrc = path.join(BACKEND_SERVICES_DIR, 'upload_trained_model.py');
-      const uploadScriptDst = path.join(userFolderPath, 'upload_trained_model.py');
-      await fs.promises.copyFile(uploadScriptSrc, uploadScriptDst);
-      
-      // Copy required dependencies for upload script
-      const oauthServiceSrc = path.join(BACKEND_SERVICES_DIR, 'google_drive_oauth_service.py');
-      const oauthServiceDst = path.join(userFolderPath, 'google_drive_oauth_service.py');
-      await fs.promises.copyFile(oauthServiceSrc, oauthServiceDst);
-      
-      const credentialsSrc = path.join(BACKEND_SERVICES_DIR, 'credentials.json');
-      const credentialsDst = path.join(userFolderPath, 'credentials.json');
-      await fs.promises.copyFile(credentialsSrc, credentialsDst);
-      
-      const tokenSrc = path.join(BACKEND_SERVICES_DIR, 'token.json');
-      const tokenDst = path.join(userFolderPath, 'token.json');
-      await fs.promises.copyFile(tokenSrc, tokenDst);
-      
-      await runPythonScript('upload_trained_model.py', ['--user-id', userId], userFolderPath);
-
-      // Step 5: Cleanup local user directory
-      console.log('[approveGestureRequest] Step 5: Cleaning up local user directory...');
-      
-      await runPythonScript('cleanup_user_directory.py', ['--user-id', userId], BACKEND_SERVICES_DIR);
+      // Check, download, prepare, train, upload and clean up in one Python process
+      // sharing one Drive client (see services/custom_gesture_pipeline.py)
+      console.log('[approveGestureRequest] Running custom gesture pipeline...');
+      await runPythonScript(
+        'custom_gesture_pipeline.py',
+        ['--user-id', userId, '--code-dir', CODE_DIR],
+        BACKEND_SERVICES_DIR
+      );
 
       // Update user status to 'pending' after successful training
       await User.updateOne({ _id: userId }, { 